@@ -0,0 +1,313 @@
+"""
+Benchmarks del pipeline de señales y de la API, sin red (velas del
+simulador con semilla y reloj fijos).
+
+    python bench/run.py                 # compara con bench/baselines.json
+    python bench/run.py --guardar       # reescribe las líneas base
+    python bench/run.py --solo update   # solo las etapas que contienen "update"
+
+Sale con código 1 si alguna etapa es más lenta que su línea base por
+encima del umbral (--umbral, 30% por defecto) o que su límite absoluto
+en LIMITES (el presupuesto de arranque de la API y del productor).
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import subprocess
+import atexit
+import argparse
+import platform
+import tempfile
+import contextlib
+import statistics
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(ROOT, "bench", "baselines.json")
+TMP = tempfile.mkdtemp(prefix="binarias-bench-")
+# Se registra antes de importar boot: atexit corre en orden inverso y el
+# log de señales se cierra primero
+atexit.register(shutil.rmtree, TMP, ignore_errors=True)
+
+# Sin red y con los logs fuera del repo (antes de importar boot/main)
+os.environ["BINARIAS_OFFLINE"] = "1"
+os.environ["BINARIAS_DATA_DIR"] = TMP
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "core"))
+
+with contextlib.redirect_stdout(open(os.devnull, "w")):
+    import boot  # noqa: E402
+    import main  # noqa: E402
+from data_fetcher import FetcherConcurrente  # noqa: E402
+from signal_cache import BinarySignalCache, ResultCache  # noqa: E402
+from signal_db import SignalDB  # noqa: E402
+from signal_log import SignalLogWriter  # noqa: E402
+from resample import Remuestreador  # noqa: E402
+from simulator import Simulador  # noqa: E402
+
+SEMILLA = 1234
+# Reloj fijo: cada repetición ve exactamente las mismas velas
+AHORA = 1_790_000_000
+
+# ---------------- DATOS ----------------
+simulador = Simulador(SEMILLA, reloj=lambda: AHORA)
+
+
+def simbolos(n):
+    base = list(boot.ACTIVOS)
+    return (base * (n // len(base) + 1))[:n] if n <= len(base) else \
+        base + [f"SYM{i:03d}USDT" for i in range(n - len(base))]
+
+
+def log_sintetico(path, filas):
+    """Log binario con `filas` señales deterministas."""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(SEMILLA)
+    writer = SignalLogWriter(path, max_batch=4096)
+    inicio = 1_700_000_000
+    for i in range(filas):
+        label = rng.choice(["ALTA", "MEDIA", "BAJA"])
+        writer.append({
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(inicio + i * 60)),
+            "symbol": rng.choice(boot.ACTIVOS),
+            "timeframe": rng.choice(["3m", "5m"]),
+            "direction": rng.choice(["CALL", "PUT"]),
+            "confidence_label": label,
+            "confidence_pct": {"ALTA": 0.9, "MEDIA": 0.7, "BAJA": 0.5}[label],
+            "confidence_display": label,
+            "score": rng.randint(3, 9),
+            "patterns": "Martillo" if rng.random() < 0.2 else "",
+            "divergences": "",
+            "trend": rng.choice(["ALCISTA", "BAJISTA", "LATERAL"]),
+            "price": round(rng.uniform(1, 60000), 6),
+            "duration_candles": rng.randint(1, 10),
+            "duration_minutes": rng.randint(3, 50),
+            "mtf_ok": True,
+        })
+    writer.close()
+
+
+# ---------------- ETAPAS ----------------
+# Cada etapa: nombre -> (escalas, preparar(escala) -> (fn, unidades))
+def etapa_simulador(velas):
+    def generar():
+        # Simulador nuevo: incluye el estado por bloque y sin LRU caliente
+        return Simulador(SEMILLA).arrays("BTCUSDT", "1m", AHORA - velas * 60, AHORA)
+
+    return generar, velas
+
+
+def etapa_add_indicators(barras):
+    df = simulador.klines("BTCUSDT", "3m", barras)
+    return lambda: boot.add_indicators(df), barras
+
+
+def etapa_construir_senal(barras):
+    df = boot.add_indicators(simulador.klines("BTCUSDT", "3m", barras))
+    return lambda: boot.construir_senal(df, "BTCUSDT", "3m"), 1
+
+
+def etapa_update_signals(n):
+    boot.ACTIVOS = simbolos(n)
+    boot.fetcher = FetcherConcurrente(simulador.klines)
+    boot.remuestreo = Remuestreador(boot.LIMIT, sin_volumen=boot.remuestreo.sin_volumen)
+
+    def ciclo():
+        boot.MOTORES.clear()
+        boot.ULTIMAS_SENALES.clear()
+        boot.update_signals()
+
+    return ciclo, n * len(boot.TIMEFRAMES)
+
+
+def _api(filas):
+    path = os.path.join(TMP, f"signals_{filas}.bin")
+    if not os.path.exists(path):
+        log_sintetico(path, filas)
+    main.LOG_BIN = path
+    main.result_cache = ResultCache(os.path.join(TMP, "signal_results.csv"))
+    return path
+
+
+def etapa_get_signals_frio(filas):
+    path = _api(filas)
+
+    def pedir():
+        main.signal_cache = BinarySignalCache(path, maxlen=main.SIGNALS_LIMIT * 4)
+        main._payload = {"etag": None, "rows": []}
+        return main.get_signals(if_none_match=None)
+
+    return pedir, 1
+
+
+def etapa_get_signals(filas):
+    path = _api(filas)
+    main.signal_cache = BinarySignalCache(path, maxlen=main.SIGNALS_LIMIT * 4)
+    main.get_signals(if_none_match=None)
+    return lambda: main.get_signals(if_none_match=None), 1
+
+
+def etapa_get_signals_304(filas):
+    path = _api(filas)
+    main.signal_cache = BinarySignalCache(path, maxlen=main.SIGNALS_LIMIT * 4)
+    etag = main.get_signals(if_none_match=None).headers["ETag"]
+    return lambda: main.get_signals(if_none_match=etag), 1
+
+
+def etapa_get_signals_db(filas):
+    path = _api(filas)
+    db_path = os.path.join(TMP, f"signals_{filas}.db")
+    if not os.path.exists(db_path):
+        db = SignalDB(db_path)
+        db.sincronizar(path)
+        db.close()
+    main.signal_db = SignalDB(db_path, solo_lectura=True)
+    return lambda: main.get_signals(
+        if_none_match=None, symbol="BTCUSDT", timeframe="3m", min_confidence=0.7
+    ), 1
+
+
+# Importar main (API) no debe cargar el stack de datos ni tocar la red;
+# boot sí carga pandas pero no el cliente de Binance (se conecta al primer uso)
+PROHIBIDOS = {"main": ["pandas", "numpy", "ta", "binance"], "boot": ["ta", "binance"]}
+
+
+def etapa_arranque(modulo):
+    """Arranque en frío en un proceso nuevo, como tras un reinicio en Render."""
+    codigo = (
+        f"import sys; sys.path[:0] = {[ROOT, os.path.join(ROOT, 'core')]!r}; import {modulo}; "
+        f"cargados = [m for m in {PROHIBIDOS[modulo]!r} if m in sys.modules]; "
+        "sys.exit(f'importó {cargados}' if cargados else 0)"
+    )
+    # Sin BINARIAS_OFFLINE: se mide el arranque real (el de producción)
+    env = {k: v for k, v in os.environ.items() if k != "BINARIAS_OFFLINE"}
+
+    def arrancar():
+        r = subprocess.run([sys.executable, "-c", codigo], env=env, cwd=TMP,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if r.returncode:
+            raise RuntimeError(f"import {modulo}: {r.stderr.strip().splitlines()[-1]}")
+
+    return arrancar, 1
+
+
+ETAPAS = {
+    "simulador": ([10_000, 100_000, 1_000_000], etapa_simulador),
+    "add_indicators": ([200, 1000, 5000], etapa_add_indicators),
+    "construir_senal": ([200, 1000], etapa_construir_senal),
+    "update_signals": ([6, 24, 96], etapa_update_signals),
+    "get_signals_frio": ([1000, 10000, 100000], etapa_get_signals_frio),
+    "get_signals": ([1000, 10000, 100000], etapa_get_signals),
+    "get_signals_304": ([1000, 10000, 100000], etapa_get_signals_304),
+    "get_signals_db": ([1000, 10000, 100000], etapa_get_signals_db),
+    "arranque": (["main", "boot"], etapa_arranque),
+}
+
+# Presupuestos absolutos (segundos), se comprueban haya o no línea base
+LIMITES = {"arranque@main": 1.5, "arranque@boot": 3.0}
+
+
+# ---------------- MEDICIÓN ----------------
+def medir(fn, unidades, presupuesto=1.0, min_rep=5, max_rep=1000):
+    """Mediana por llamada tras un calentamiento, más el pico de memoria."""
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        fn()
+        tiempos = []
+        limite = time.perf_counter() + presupuesto
+        while len(tiempos) < min_rep or (time.perf_counter() < limite and len(tiempos) < max_rep):
+            t0 = time.perf_counter()
+            fn()
+            tiempos.append(time.perf_counter() - t0)
+
+        tracemalloc.start()
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    seg = statistics.median(tiempos)
+    return {
+        "seg": seg,
+        "por_seg": unidades / seg if seg > 0 else None,
+        "mem_kb": round(pico / 1024, 1),
+        "rep": len(tiempos),
+    }
+
+
+def entorno():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": boot.pd.__version__,
+        "maquina": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def comparar(resultados, base, umbral, minimo):
+    """Lista de (etapa, actual, base, ratio) más lentas que la base o que su límite."""
+    peores = []
+    for clave, r in resultados.items():
+        limite = LIMITES.get(clave)
+        if limite is not None and r["seg"] > limite:
+            peores.append((clave, r["seg"], limite, r["seg"] / limite))
+            continue
+        b = base.get("etapas", {}).get(clave)
+        if not b:
+            continue
+        ratio = r["seg"] / b["seg"]
+        if ratio > 1 + umbral and r["seg"] - b["seg"] > minimo:
+            peores.append((clave, r["seg"], b["seg"], ratio))
+    return peores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline de señales")
+    parser.add_argument("--guardar", action="store_true", help="reescribe baselines.json")
+    parser.add_argument("--umbral", type=float, default=0.30, help="regresión tolerada (0.30 = 30%%)")
+    parser.add_argument("--minimo", type=float, default=0.0005,
+                        help="ignora diferencias menores a estos segundos")
+    parser.add_argument("--solo", default=None, help="filtra etapas por nombre")
+    parser.add_argument("--presupuesto", type=float, default=1.0, help="segundos por medición")
+    args = parser.parse_args()
+
+    base = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES, encoding="utf-8") as f:
+            base = json.load(f)
+    if base.get("entorno") and base["entorno"] != entorno() and not args.guardar:
+        print(f"⚠️ Línea base tomada en otro entorno: {base['entorno']}")
+
+    resultados = {}
+    for nombre, (escalas, preparar) in ETAPAS.items():
+        if args.solo and args.solo not in nombre:
+            continue
+        for escala in escalas:
+            clave = f"{nombre}@{escala}"
+            fn, unidades = preparar(escala)
+            r = resultados[clave] = medir(fn, unidades, args.presupuesto)
+            b = base.get("etapas", {}).get(clave)
+            delta = f"{(r['seg'] / b['seg'] - 1) * 100:+6.1f}%" if b else "   nuevo"
+            print(f"{clave:<28} {r['seg'] * 1000:10.3f} ms  {r['por_seg'] or 0:12,.1f}/s  "
+                  f"{r['mem_kb']:10,.1f} KB  {delta}")
+
+    if args.guardar:
+        etapas = dict(base.get("etapas", {}))
+        etapas.update({k: {"seg": v["seg"], "mem_kb": v["mem_kb"]} for k, v in resultados.items()})
+        with open(BASELINES, "w", encoding="utf-8") as f:
+            json.dump({"entorno": entorno(), "etapas": etapas}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"💾 Líneas base guardadas en {BASELINES}")
+        sys.exit(0)
+
+    peores = comparar(resultados, base, args.umbral, args.minimo)
+    for clave, actual, anterior, ratio in peores:
+        print(f"❌ {clave}: {actual * 1000:.3f} ms vs {anterior * 1000:.3f} ms (x{ratio:.2f})")
+    if peores:
+        sys.exit(1)
+    print("✅ Sin regresiones" if base else "ℹ️ Sin líneas base (usa --guardar)")
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from candle_store import segundos_tf
+from data_fetcher import fuente_de
+
+# ---------------- FORMATO ----------------
+# {directorio}/{symbol}/{timeframe}/
+#   meta.json         filas confirmadas, primera/última vela
+#   timestamp.i8      epoch en segundos (int64, little endian)
+#   open.f8 ... volume.f8
+# Cada columna es un array plano de ancho fijo: la vela i está en el byte
+# i * itemsize de cada archivo, así que np.memmap la abre sin copiar nada.
+COLUMNAS = {
+    "timestamp": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+EXT = {"<i8": "i8", "<f8": "f8"}
+
+# Velas por petición: Binance admite 1000 en get_klines, Deriv 5000 en ticks_history
+PAGINA = {"binance": 1000, "deriv": 5000}
+
+
+def _epoch(ts) -> int:
+    """Epoch en segundos de un int o de cualquier fecha (naive = UTC)."""
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    return int(pd.Timestamp(ts).timestamp())
+
+
+def _epochs(serie) -> np.ndarray:
+    return pd.to_datetime(serie).to_numpy().astype("datetime64[s]").astype(np.int64)
+
+
+class OHLCVArchive:
+    """
+    Archivo columnar de velas en disco, una carpeta por símbolo/timeframe.
+
+    Solo se añaden velas posteriores a la última guardada. Las columnas se
+    escriben primero y meta.json (con el número de filas) se reemplaza al
+    final de forma atómica: si el proceso muere a medias, al reabrir se
+    recortan las columnas a las filas confirmadas y la descarga se reanuda
+    desde ahí.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    # ---------------- RUTAS ----------------
+    def _carpeta(self, symbol, interval):
+        return os.path.join(self.directorio, symbol, interval)
+
+    def _columna(self, symbol, interval, col):
+        return os.path.join(self._carpeta(symbol, interval), f"{col}.{EXT[COLUMNAS[col].str]}")
+
+    def series(self):
+        """[(symbol, timeframe)] presentes en el archivo."""
+        out = []
+        for sym in sorted(os.listdir(self.directorio)):
+            base = os.path.join(self.directorio, sym)
+            if not os.path.isdir(base):
+                continue
+            for tf in sorted(os.listdir(base)):
+                if os.path.exists(os.path.join(base, tf, "meta.json")):
+                    out.append((sym, tf))
+        return out
+
+    # ---------------- META ----------------
+    def meta(self, symbol, interval):
+        ruta = os.path.join(self._carpeta(symbol, interval), "meta.json")
+        if not os.path.exists(ruta):
+            return {"symbol": symbol, "timeframe": interval, "filas": 0,
+                    "primera": None, "ultima": None}
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _guardar_meta(self, meta):
+        ruta = os.path.join(self._carpeta(meta["symbol"], meta["timeframe"]), "meta.json")
+        tmp = ruta + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, ruta)
+
+    def _reparar(self, symbol, interval, filas):
+        """Recorta columnas con filas sin confirmar (escritura interrumpida)."""
+        for col, dtype in COLUMNAS.items():
+            ruta = self._columna(symbol, interval, col)
+            esperado = filas * dtype.itemsize
+            if not os.path.exists(ruta):
+                open(ruta, "wb").close()
+            elif os.path.getsize(ruta) != esperado:
+                os.truncate(ruta, esperado)
+
+    # ---------------- ESCRITURA ----------------
+    def ultima(self, symbol, interval):
+        """Epoch de la última vela guardada (None si la serie está vacía)."""
+        return self.meta(symbol, interval)["ultima"]
+
+    def append(self, symbol, interval, df: pd.DataFrame) -> int:
+        """Añade las velas de `df` posteriores a la última. Devuelve cuántas."""
+        if df is None or df.empty:
+            return 0
+        os.makedirs(self._carpeta(symbol, interval), exist_ok=True)
+        meta = self.meta(symbol, interval)
+        self._reparar(symbol, interval, meta["filas"])
+
+        ts = _epochs(df["timestamp"])
+        orden = np.argsort(ts, kind="stable")
+        ts = ts[orden]
+        nuevas = np.ones(len(ts), dtype=bool)
+        nuevas[1:] = ts[1:] != ts[:-1]
+        if meta["ultima"] is not None:
+            nuevas &= ts > meta["ultima"]
+        if not nuevas.any():
+            return 0
+        sel = orden[nuevas]
+
+        for col, dtype in COLUMNAS.items():
+            valores = ts[nuevas] if col == "timestamp" else df[col].to_numpy()[sel]
+            with open(self._columna(symbol, interval, col), "ab") as f:
+                f.write(np.ascontiguousarray(valores, dtype=dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        n = int(nuevas.sum())
+        meta["filas"] += n
+        meta["ultima"] = int(ts[nuevas][-1])
+        if meta["primera"] is None:
+            meta["primera"] = int(ts[nuevas][0])
+        self._guardar_meta(meta)
+        return n
+
+    # ---------------- LECTURA ----------------
+    def abrir(self, symbol, interval, desde=None, hasta=None) -> dict:
+        """
+        Vistas np.memmap (solo lectura) de cada columna, recortadas a
+        [desde, hasta). Los límites aceptan epoch o cualquier fecha que
+        entienda pandas. No se lee nada del disco hasta que se usan.
+        """
+        filas = self.meta(symbol, interval)["filas"]
+        if filas == 0:
+            return {col: np.empty(0, dtype=dtype) for col, dtype in COLUMNAS.items()}
+        cols = {
+            col: np.memmap(self._columna(symbol, interval, col), dtype=dtype,
+                           mode="r", shape=(filas,))
+            for col, dtype in COLUMNAS.items()
+        }
+        ts = cols["timestamp"]
+        i = 0 if desde is None else int(np.searchsorted(ts, _epoch(desde), side="left"))
+        j = filas if hasta is None else int(np.searchsorted(ts, _epoch(hasta), side="left"))
+        return {col: arr[i:j] for col, arr in cols.items()}
+
+    def dataframe(self, symbol, interval, desde=None, hasta=None) -> pd.DataFrame:
+        """Copia en memoria del tramo pedido, con el formato de safe_get_klines."""
+        vista = self.abrir(symbol, interval, desde, hasta)
+        df = pd.DataFrame({col: np.array(arr) for col, arr in vista.items()})
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+        return df
+
+
+# ---------------- DESCARGA ----------------
+def descargar(archivo: OHLCVArchive, fetch_fn, symbol, interval, desde, hasta=None,
+              pagina=None, pausa=0.2):
+    """
+    Pagina la historia de `symbol`/`interval` desde `desde` (o desde la
+    última vela guardada, para reanudar) hasta `hasta` (por defecto ahora).
+
+    `fetch_fn(symbol, interval, limit, start=None)` es la misma función de
+    descarga que usa CandleStore. Solo se guardan velas ya cerradas.
+    """
+    tf = segundos_tf(interval)
+    pagina = pagina or PAGINA[fuente_de(symbol)]
+    fin = _epoch(hasta) if hasta is not None else int(time.time())
+    ultima = archivo.ultima(symbol, interval)
+    inicio = ultima + tf if ultima is not None else _epoch(desde) // tf * tf
+
+    total = 0
+    while inicio + tf <= fin:
+        df = fetch_fn(symbol, interval, pagina, start=inicio)
+        if df is None or df.empty:
+            # Sin datos en esta página (antes del listado, mercado cerrado): saltarla
+            inicio += pagina * tf
+            continue
+        ts = _epochs(df["timestamp"])
+        df = df[(ts >= inicio) & (ts + tf <= fin)]
+        n = archivo.append(symbol, interval, df)
+        total += n
+
+        ultima = archivo.ultima(symbol, interval)
+        siguiente = ultima + tf if ultima is not None and ultima >= inicio else inicio + pagina * tf
+        if n:
+            hora = datetime.fromtimestamp(ultima, timezone.utc).strftime("%Y-%m-%d %H:%M")
+            print(f"📥 {symbol} {interval}: +{n} velas (hasta {hora}, total {total})")
+        inicio = max(siguiente, inicio + tf)
+        if pausa:
+            time.sleep(pausa)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Descarga masiva de velas al archivo local")
+    parser.add_argument("--desde", default="2017-01-01", help="fecha inicial (si no hay datos)")
+    parser.add_argument("--hasta", default=None)
+    parser.add_argument("--timeframes", nargs="+", default=["1m", "3m", "5m"])
+    parser.add_argument("--simbolos", nargs="+", default=None, help="por defecto ACTIVOS")
+    parser.add_argument("--dir", default=os.path.join(os.path.dirname(__file__), "archive"))
+    args = parser.parse_args()
+
+    from boot import ACTIVOS, fetch_klines
+
+    archivo = OHLCVArchive(args.dir)
+    for sym in args.simbolos or ACTIVOS:
+        for tf in args.timeframes:
+            try:
+                n = descargar(archivo, fetch_klines, sym, tf, args.desde, args.hasta)
+                print(f"✅ {sym} {tf}: {n} velas nuevas, {archivo.meta(sym, tf)['filas']} en total")
+            except KeyboardInterrupt:
+                print("⏸️ Interrumpido: se reanuda desde la última vela guardada")
+                raise SystemExit(1)
+            except Exception as e:
+                print(f"⚠️ Error descargando {sym} {tf}: {e}")
@@ -0,0 +1,346 @@
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import patterns
+from candle_store import segundos_tf
+from simulator import Simulador
+
+# ---------------- PARÁMETROS ----------------
+# Pesos de score_avanzado (boot.py) por componente
+PESOS = {
+    "ema": 1,
+    "macd": 1,
+    "divergencia": 2,
+    # Divergencias de pivotes: no puntúan en vivo, solo para barridos
+    "pivote": 0,
+    "obv": 1,
+    "mom": 1,
+    "vela_poder": 1,
+    "adx": 1,
+}
+# Cortes de classify_signal: ALTA >= 7, MEDIA >= 4
+UMBRALES = (7, 4)
+# Confirmación multi-timeframe (validar_multitimeframe)
+SCORE_MIN_MTF = 3
+# Velas iniciales descartadas (las mismas que ve el sistema en vivo)
+WARMUP = 200
+
+ETIQUETAS = np.array(["BAJA", "MEDIA", "ALTA"])
+PCT = np.array([0.5, 0.7, 0.9])
+TENDENCIAS = np.array(["INDEFINIDA", "LATERAL", "ALCISTA", "BAJISTA"])
+
+
+# ---------------- INDICADORES ----------------
+def _wilder(x: pd.Series, n: int, inicio: int) -> pd.Series:
+    """
+    Suavizado de Wilder sembrado con la media de x[inicio-n+1 : inicio+1],
+    igual que los bucles de `ta` pero con ewm (en C).
+    """
+    semilla = x.iloc[inicio - n + 1:inicio + 1].mean()
+    s = x.copy()
+    s.iloc[:inicio] = np.nan
+    s.iloc[inicio] = semilla
+    return s.ewm(alpha=1 / n, adjust=False).mean()
+
+
+def indicadores(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mismas columnas que add_indicators, calculadas de una vez sobre toda la
+    historia. Los suavizados de Wilder (ATR, ADX) usan ewm en lugar de los
+    bucles Python de `ta`; coinciden salvo redondeo (~1e-12).
+    """
+    df = df.reset_index(drop=True).copy()
+    c, h, l, v = df["close"], df["high"], df["low"], df["volume"]
+
+    for n in (9, 21, 50, 200):
+        df[f"EMA{n}"] = c.ewm(span=n, min_periods=n, adjust=False).mean()
+
+    diff = c.diff()
+    up = diff.where(diff > 0, 0.0).ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    dn = (-diff.where(diff < 0, 0.0)).ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    df["RSI"] = np.where(dn == 0, 100, 100 - (100 / (1 + up / dn)))
+
+    fast = c.ewm(span=12, min_periods=12, adjust=False).mean()
+    slow = c.ewm(span=26, min_periods=26, adjust=False).mean()
+    df["MACD"] = fast - slow
+    df["MACD_SIG"] = df["MACD"].ewm(span=9, min_periods=9, adjust=False).mean()
+
+    pc = c.shift(1)
+    tr = pd.concat([h, pc], axis=1).max(axis=1) - pd.concat([l, pc], axis=1).min(axis=1)
+    df["ATR"] = _wilder(tr, 14, 13).fillna(0.0)
+
+    # ADX: +DM/-DM y TR suavizados desde la vela 14, DX suavizado desde la 27
+    up_m, dn_m = h - h.shift(1), l.shift(1) - l
+    pos = up_m.where((up_m > dn_m) & (up_m > 0), 0.0)
+    neg = dn_m.where((dn_m > up_m) & (dn_m > 0), 0.0)
+    s = _wilder(tr, 14, 14)
+    dip = (100 * _wilder(pos, 14, 14) / s).where(s != 0, 0.0)
+    din = (100 * _wilder(neg, 14, 14) / s).where(s != 0, 0.0)
+    dx = (100 * (dip - din).abs() / (dip + din)).where(dip + din != 0, 0.0)
+    dx[:14] = np.nan
+    df["ADX"] = _wilder(dx, 14, 27).fillna(0.0) if len(df) > 27 else 0.0
+
+    df["OBV"] = np.where(c < pc, -v, v).cumsum()
+    df["MOM"] = (c - c.shift(5)) / c.shift(5) * 100
+    df["VELA_PODER"] = (c - df["open"]).abs() / (df["ATR"] + 1e-9)
+    return df
+
+
+# ---------------- REGLAS ----------------
+def divergencias(ind: pd.DataFrame) -> dict:
+    """Divergencias de 3 velas (las que puntúan) y de pivotes, por nombre."""
+    c, l, h = ind["close"], ind["low"], ind["high"]
+    out = {}
+    for osc in ("RSI", "MACD"):
+        out.update(patterns.divergencias(c, ind[osc], osc))
+    for osc in ("RSI", "MACD"):
+        out.update(patterns.divergencias_pivote(l, h, ind[osc], osc))
+    return out
+
+
+def componentes(ind: pd.DataFrame, divs=None) -> dict:
+    """
+    Cada regla de score_avanzado como máscara booleana sobre toda la serie
+    (iloc[-3] en vivo equivale a shift(2) aquí). Claves: (componente, dir).
+    """
+    divs = divergencias(ind) if divs is None else divs
+    m = ind["MACD"].to_numpy()
+    obv, obv2 = ind["OBV"].to_numpy(), ind["OBV"].shift(2).to_numpy()
+    e9, e21 = ind["EMA9"].to_numpy(), ind["EMA21"].to_numpy()
+    sig = ind["MACD_SIG"].to_numpy()
+    mom = ind["MOM"].to_numpy()
+
+    def suma(*nombres):
+        return sum(divs[n].astype(np.int8) for n in nombres)
+
+    vela = ind["VELA_PODER"].to_numpy() > 0.7
+    adx = ind["ADX"].to_numpy() >= 25
+    return {
+        ("ema", "CALL"): e9 > e21,
+        ("ema", "PUT"): e9 < e21,
+        ("macd", "CALL"): m > sig,
+        ("macd", "PUT"): m < sig,
+        # Cada divergencia suma por separado (RSI y MACD)
+        ("divergencia", "CALL"): suma("Divergencia RSI Alcista", "Divergencia MACD Alcista"),
+        ("divergencia", "PUT"): suma("Divergencia RSI Bajista", "Divergencia MACD Bajista"),
+        ("pivote", "CALL"): suma("Divergencia RSI Alcista (pivote)",
+                                 "Divergencia MACD Alcista (pivote)"),
+        ("pivote", "PUT"): suma("Divergencia RSI Bajista (pivote)",
+                                "Divergencia MACD Bajista (pivote)"),
+        ("obv", "CALL"): obv > obv2,
+        ("obv", "PUT"): obv < obv2,
+        ("mom", "CALL"): mom > 0,
+        ("mom", "PUT"): mom < 0,
+        ("vela_poder", "CALL"): vela,
+        ("vela_poder", "PUT"): vela,
+        ("adx", "CALL"): adx,
+        ("adx", "PUT"): adx,
+    }
+
+
+def _etiquetas(mascaras: dict, idx) -> pd.Categorical:
+    """
+    Une con '|' los nombres activos en cada índice (como en el log). Cada
+    combinación es un código de bits, así no se construyen strings por fila.
+    """
+    nombres = list(mascaras)
+    codigos = np.zeros(len(idx), dtype=np.int64)
+    for bit, nombre in enumerate(nombres):
+        codigos |= mascaras[nombre][idx].astype(np.int64) << bit
+    combinaciones = [
+        "|".join(n for bit, n in enumerate(nombres) if k >> bit & 1)
+        for k in range(1 << len(nombres))
+    ]
+    return pd.Categorical.from_codes(codigos, combinaciones)
+
+
+def tendencia(ind: pd.DataFrame) -> np.ndarray:
+    """Índice en TENDENCIAS, como calcular_tendencia."""
+    e50, e200 = ind["EMA50"].to_numpy(), ind["EMA200"].to_numpy()
+    out = np.where(e50 > e200, 2, 3)
+    out = np.where(ind["ADX"].to_numpy() < 20, 1, out)
+    return np.where(np.isnan(e50) | np.isnan(e200), 0, out).astype(np.int8)
+
+
+def duracion(ind: pd.DataFrame) -> np.ndarray:
+    """Velas de expiración, como estimar_duracion."""
+    c = ind["close"].to_numpy()
+    vel = np.abs(c - ind["close"].shift(4).to_numpy()) / 5
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = np.floor(ind["ATR"].to_numpy() / vel)
+    d = np.where(vel > 0, d, 1)
+    return np.clip(np.nan_to_num(d, nan=1), 1, 10).astype(np.int16)
+
+
+def preparar(df: pd.DataFrame) -> dict:
+    """Todo lo que no depende de pesos/umbrales, calculado una sola vez."""
+    ind = indicadores(df)
+    divs = divergencias(ind)
+    return {
+        "timestamp": ind["timestamp"].to_numpy(),
+        "close": ind["close"].to_numpy(),
+        "componentes": componentes(ind, divs),
+        "patrones": patterns.patrones(ind["open"], ind["high"], ind["low"], ind["close"]),
+        "divergencias": divs,
+        "tendencia": tendencia(ind),
+        "duracion": duracion(ind),
+    }
+
+
+def evaluar(prep: dict, pesos=PESOS, umbrales=UMBRALES):
+    """
+    Score CALL/PUT de cada vela con los pesos dados. Devuelve
+    (direccion, score, nivel): direccion 1=CALL, -1=PUT, 0=sin señal;
+    nivel 0=BAJA, 1=MEDIA, 2=ALTA.
+    """
+    comp = prep["componentes"]
+    n = len(prep["close"])
+    sc_call = np.zeros(n, dtype=np.int16)
+    sc_put = np.zeros(n, dtype=np.int16)
+    for k, w in pesos.items():
+        if w:
+            sc_call += w * comp[(k, "CALL")].astype(np.int16)
+            sc_put += w * comp[(k, "PUT")].astype(np.int16)
+    direccion = np.sign(sc_call - sc_put).astype(np.int8)
+    score = np.maximum(sc_call, sc_put)
+    alta, media = umbrales
+    nivel = np.where(score >= alta, 2, np.where(score >= media, 1, 0)).astype(np.int8)
+    return direccion, score, nivel
+
+
+def _alinear(ts_a, tf_a, ts_b, tf_b):
+    """
+    Para cada vela de A, índice de la última vela de B cerrada cuando cierra
+    la de A (-1 si ninguna). Así se ve la otra temporalidad en vivo.
+    """
+    cierre_a = ts_a + np.timedelta64(tf_a, "s")
+    cierre_b = ts_b + np.timedelta64(tf_b, "s")
+    return np.searchsorted(cierre_b, cierre_a, side="right") - 1
+
+
+def resultado(close, idx, direccion, dur):
+    """1=gana, -1=pierde, 0=empate, -2=sin datos al vencimiento."""
+    salida = idx + dur
+    ok = salida < len(close)
+    out = np.full(len(idx), -2, dtype=np.int8)
+    delta = close[salida[ok]] - close[idx[ok]]
+    out[ok] = np.sign(delta * direccion[ok]).astype(np.int8)
+    return out
+
+
+def senales_mtf(prep_a, prep_b, tf_a, tf_b, pesos=PESOS, umbrales=UMBRALES,
+                score_min=SCORE_MIN_MTF, warmup=WARMUP, evaluados=None, j=None):
+    """
+    Señales de la temporalidad A que confirma B (validar_multitimeframe).
+    `evaluados` permite pasar (direccion, score, nivel) ya calculados y `j`
+    la alineación de _alinear. Devuelve dict de arrays, uno por señal.
+    """
+    dir_a, sc_a, niv_a = evaluados[0] if evaluados else evaluar(prep_a, pesos, umbrales)
+    dir_b, sc_b, _ = evaluados[1] if evaluados else evaluar(prep_b, pesos, umbrales)
+
+    if j is None:
+        j = _alinear(prep_a["timestamp"], tf_a, prep_b["timestamp"], tf_b)
+    jj = np.clip(j, 0, None)
+    ok = (
+        (j >= 0)
+        & (dir_a != 0)
+        & (dir_a == dir_b[jj])
+        & (sc_a >= score_min)
+        & (sc_b[jj] >= score_min)
+        & (prep_a["tendencia"] == prep_b["tendencia"][jj])
+    )
+    ok[:warmup] = False
+    idx = np.flatnonzero(ok)
+
+    dur = prep_a["duracion"][idx].astype(np.int64)
+    return {
+        "idx": idx,
+        "direccion": dir_a[idx],
+        "score": sc_a[idx],
+        "nivel": niv_a[idx],
+        "duracion": dur,
+        "resultado": resultado(prep_a["close"], idx, dir_a[idx], dur),
+    }
+
+
+# ---------------- BACKTEST ----------------
+def backtest(datos: dict, pesos=PESOS, umbrales=UMBRALES) -> pd.DataFrame:
+    """
+    datos: {symbol: {"3m": df, "5m": df}} con columnas OHLCV.
+    Devuelve una fila por señal con su resultado tras `duration_candles`.
+    """
+    tablas = []
+    for sym, frames in datos.items():
+        prep = {tf: preparar(df) for tf, df in frames.items()}
+        (tf_a, tf_b) = sorted(prep, key=segundos_tf)[:2]
+        for tf, otro in ((tf_a, tf_b), (tf_b, tf_a)):
+            s = senales_mtf(prep[tf], prep[otro], segundos_tf(tf), segundos_tf(otro),
+                            pesos, umbrales)
+            p = prep[tf]
+            n = len(s["idx"])
+            tablas.append(pd.DataFrame({
+                "timestamp": p["timestamp"][s["idx"]],
+                "symbol": pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), [sym]),
+                "timeframe": pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), [tf]),
+                "direction": pd.Categorical.from_codes((s["direccion"] < 0).astype(np.int8),
+                                                       ["CALL", "PUT"]),
+                "confidence_label": pd.Categorical.from_codes(s["nivel"], ETIQUETAS),
+                "confidence_pct": PCT[s["nivel"]],
+                "score": s["score"],
+                "patterns": _etiquetas(p["patrones"], s["idx"]),
+                "divergences": _etiquetas(p["divergencias"], s["idx"]),
+                "trend": pd.Categorical.from_codes(p["tendencia"][s["idx"]], TENDENCIAS),
+                "price": p["close"][s["idx"]],
+                "duration_candles": s["duracion"],
+                "resultado": s["resultado"],
+            }))
+    if not tablas:
+        return pd.DataFrame()
+    # Categorías: concatenar sin convertir a texto fila a fila
+    return pd.concat(tablas, ignore_index=True).astype(
+        {c: "category" for c in ("symbol", "timeframe", "direction", "confidence_label",
+                                 "patterns", "divergences", "trend")}
+    )
+
+
+def reporte(senales: pd.DataFrame) -> pd.DataFrame:
+    """Win rate por símbolo, timeframe y nivel de confianza."""
+    s = senales[senales["resultado"] != -2]
+    claves = [s["symbol"], s["timeframe"], s["confidence_label"]]
+    r = s["resultado"]
+    rep = pd.DataFrame({
+        "senales": r.groupby(claves, observed=True).size(),
+        "ganadas": (r == 1).groupby(claves, observed=True).sum(),
+        "perdidas": (r == -1).groupby(claves, observed=True).sum(),
+        "empates": (r == 0).groupby(claves, observed=True).sum(),
+    })
+    rep["win_rate"] = rep["ganadas"] / (rep["ganadas"] + rep["perdidas"]).replace(0, np.nan)
+    return rep.reset_index()
+
+
+# ---------------- DATOS DE PRUEBA ----------------
+def historia_sintetica(symbol, dias, seed=0):
+    """`dias` de velas 3m y 5m del simulador desde 2024-01-01 (misma serie de 1m)."""
+    desde = int(pd.Timestamp("2024-01-01").timestamp())
+    return Simulador(seed).historia(symbol, desde, desde + dias * 86400)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest vectorizado de construir_senal")
+    parser.add_argument("--dias", type=int, default=365, help="días de historia sintética")
+    parser.add_argument("--simbolos", nargs="+", default=["BTCUSDT", "ETHUSDT", "SOLUSDT"])
+    args = parser.parse_args()
+
+    datos = {sym: historia_sintetica(sym, args.dias) for sym in args.simbolos}
+    barras = sum(len(df) for frames in datos.values() for df in frames.values())
+
+    t0 = time.perf_counter()
+    senales = backtest(datos)
+    dt = time.perf_counter() - t0
+
+    print(f"📊 {barras:,} velas en {dt:.2f}s ({barras / dt:,.0f} velas/s), {len(senales):,} señales")
+    pd.set_option("display.width", 200)
+    print(reporte(senales).to_string(index=False))
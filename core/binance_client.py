@@ -0,0 +1,87 @@
+import time
+import threading
+
+from rate_limit import peso_klines
+
+# Segundos máximos por petición HTTP a Binance (conexión + lectura)
+TIMEOUT = 10
+
+
+class BinanceClient:
+    """
+    Cliente de Binance que se crea en la primera petición.
+
+    - `binance.client` (lento de importar) y el `Client`, que hace un ping
+      al construirse, no se cargan hasta que se pide la primera vela:
+      importar boot no toca la red.
+    - Todas las peticiones llevan timeout, así una red caída no bloquea el
+      ciclo.
+    - Si no se puede crear el cliente, los siguientes intentos esperan con
+      backoff exponencial y mientras tanto las peticiones fallan al
+      instante con ConnectionError (el llamador pasa a DEMO).
+    - Con `limitador` (rate_limit.LimitadorPeso) cada petición espera su
+      peso en el presupuesto y cada respuesta (cabeceras de peso usado,
+      429/418) lo actualiza.
+    """
+
+    def __init__(self, api_key, api_secret, timeout=TIMEOUT, backoff_inicial=1, backoff_max=60,
+                 limitador=None):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.timeout = timeout
+        self.backoff_inicial = backoff_inicial
+        self.backoff_max = backoff_max
+        self.limitador = limitador
+
+        self._client = None
+        self._lock = threading.Lock()
+        self._fallos = 0
+        self._proximo_intento = 0.0
+
+    def _conectar(self):
+        ahora = time.monotonic()
+        if ahora < self._proximo_intento:
+            raise ConnectionError(
+                f"Binance: reconexión en {self._proximo_intento - ahora:.1f}s"
+            )
+        try:
+            from binance.client import Client
+
+            client = Client(
+                self.api_key, self.api_secret, requests_params={"timeout": self.timeout}
+            )
+        except Exception as e:
+            self._fallos += 1
+            espera = min(self.backoff_max, self.backoff_inicial * 2 ** (self._fallos - 1))
+            self._proximo_intento = time.monotonic() + espera
+            print(f"⚠️ Sin conexión Binance (reintento en {espera}s): {e}")
+            raise
+
+        if self.limitador is not None:
+            # Cada respuesta de la sesión, también las de error
+            client.session.hooks["response"].append(self._al_responder)
+        self._fallos = 0
+        self._proximo_intento = 0.0
+        print("✅ Conectado a Binance.")
+        return client
+
+    def _al_responder(self, resp, *args, **kwargs):
+        self.limitador.observar(resp.status_code, resp.headers)
+
+    def cliente(self):
+        """El `binance.client.Client`, creándolo si hace falta."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._conectar()
+        return self._client
+
+    @property
+    def conectado(self):
+        return self._client is not None
+
+    def get_klines(self, **kwargs):
+        client = self.cliente()
+        if self.limitador is not None:
+            self.limitador.adquirir(peso_klines(kwargs.get("limit", 500)))
+        return client.get_klines(**kwargs)
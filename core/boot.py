@@ -1,15 +1,25 @@
 import os
 import time
+import atexit
 import warnings
-import random
-import json
-from datetime import datetime, timedelta
+from datetime import datetime
 
 import pandas as pd
-import numpy as np
-import ta
-from binance.client import Client
-import websocket
+
+from binance_client import BinanceClient
+from candle_store import CandleStore, segundos_tf
+from data_fetcher import FetcherConcurrente, ERRORES_FETCH, fuente_de
+from deriv_client import DerivClient
+from indicator_engine import MotorIndicadores
+import metrics
+import patterns
+from rate_limit import PESO_MINUTO, LimitadorPeso, PresupuestoAgotado
+from resample import BASE as BASE_TF, Remuestreador
+from resolver import SignalResolver
+from scheduler import CandleScheduler
+from signal_log import SignalLogWriter
+from simulator import Simulador
+from sources import BinanceKlineStream, DerivTickStream, FuenteREST
 
 warnings.filterwarnings("ignore")
 
@@ -22,12 +32,47 @@ DERIV_API_TOKEN = "ppYrssajXSvgXpo"  # ⚠️ Usa uno nuevo y no lo compartas
 ACTIVOS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "frxEURUSD", "frxGBPJPY", "frxEURJPY"]
 TIMEFRAMES = ["3m", "5m"]
 LIMIT = 200
+# Segundos respecto al cierre de vela en que se calculan las señales
+# (negativo = antes del cierre)
+OFFSET_CIERRE = 0
+
+# BINARIAS_OFFLINE=1: sin red (benchmarks), todas las velas salen del simulador
+OFFLINE = os.environ.get("BINARIAS_OFFLINE") == "1"
+# BINARIAS_DEMO=1: si no hay velas reales se usan las del simulador (pruebas
+# locales). Por defecto el símbolo se pospone al próximo ciclo
+DEMO = os.environ.get("BINARIAS_DEMO") == "1"
+# BINARIAS_STREAM: velas por push en vez de sondeo. "1" activa todas las
+# fuentes; también "binance", "deriv" o "binance,deriv"
+_STREAM = os.environ.get("BINARIAS_STREAM", "")
+STREAM = set() if OFFLINE else (
+    {"binance", "deriv"} if _STREAM == "1" else {f for f in _STREAM.split(",") if f}
+)
+# Segundos que el ciclo espera a que el stream entregue las velas cerradas
+STREAM_ESPERA = 3
+# BINARIAS_REMUESTREO=0: descarga cada timeframe por separado en vez de
+# derivarlos todos de las velas de 1m
+REMUESTREO = os.environ.get("BINARIAS_REMUESTREO", "1") == "1"
+# BINARIAS_WORKER=1: proceso worker de core/workers.py. No abre el log: sus
+# señales van al coordinador, que es el único que escribe
+WORKER = os.environ.get("BINARIAS_WORKER") == "1"
+# Semilla del mercado simulado (modo DEMO): misma semilla, mismas velas
+SEMILLA_DEMO = int(os.environ.get("BINARIAS_SEED", "0"))
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-LOG_CSV = os.path.join(BASE_DIR, "binary_signals_log_optimizado.csv")
+# BINARIAS_DATA_DIR permite escribir logs y velas fuera del repo
+DATA_DIR = os.environ.get("BINARIAS_DATA_DIR", BASE_DIR)
+LOG_CSV = os.path.join(DATA_DIR, "binary_signals_log_optimizado.csv")
+LOG_BIN = os.path.join(DATA_DIR, "binary_signals.bin")
+LOG_RESULTADOS = os.path.join(DATA_DIR, "signal_results.csv")
+# Índice SQLite de las señales para las consultas filtradas de /signals
+LOG_DB = os.path.join(DATA_DIR, "signals.db")
+CANDLES_DIR = os.path.join(DATA_DIR, "candles")
+# Métricas del productor (formato Prometheus); main.py las sirve en /metrics
+METRICAS_PROM = os.path.join(DATA_DIR, "metrics.prom")
+os.makedirs(DATA_DIR, exist_ok=True)
 
 # Crear CSV si no existe
-if not os.path.exists(LOG_CSV):
+if not WORKER and not os.path.exists(LOG_CSV):
     with open(LOG_CSV, "w", encoding="utf-8") as f:
         f.write(
             "timestamp,symbol,timeframe,direction,confidence_label,confidence_pct,"
@@ -36,15 +81,31 @@ if not os.path.exists(LOG_CSV):
         )
     print("🆕 Archivo CSV creado automáticamente:", LOG_CSV)
 
+# Log binario con commit agrupado (un fsync por lote); el CSV queda como
+# copia y cada lote se importa también en SQLite. En un worker lo asigna
+# workers.py (las filas se envían al coordinador)
+signal_log = None
+if not WORKER:
+    signal_log = SignalLogWriter(LOG_BIN, csv_path=LOG_CSV, db_path=LOG_DB)
+    atexit.register(signal_log.close)
+
+# ---------------- LÍMITES DE PESO ----------------
+# Presupuesto por exchange: las descargas esperan su turno (primero las que
+# antes vencen) y se descartan si no caben, sin llegar a un 429/418
+LIMITADORES = {fuente: LimitadorPeso(fuente, peso) for fuente, peso in PESO_MINUTO.items()}
+
 # ---------------- CLIENTE BINANCE ----------------
-usar_binance = False
-client = None
-try:
-    client = Client(API_KEY, API_SECRET)
-    usar_binance = True
-    print("✅ Conectado a Binance.")
-except Exception as e:
-    print("⚠️ Modo DEMO: sin conexión Binance (se usan datos simulados). Error:", e)
+# Se conecta en la primera descarga (con timeout y backoff), no al importar:
+# sin red el productor arranca igual y pospone los símbolos hasta que
+# Binance responda
+client = BinanceClient(API_KEY, API_SECRET, limitador=LIMITADORES["binance"])
+if OFFLINE:
+    print("⚠️ Modo DEMO: BINARIAS_OFFLINE activo (sin red).")
+
+
+# ---------------- CLIENTE DERIV ----------------
+# Una sola conexión autorizada y multiplexada para todas las peticiones
+deriv = DerivClient(token=DERIV_API_TOKEN)
 
 
 # ---------------- FUNCIONES AUX ----------------
@@ -52,19 +113,18 @@ def now_utc():
     return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
 
 
-def safe_get_klines_deriv(symbol, granularity=60, limit=200):
+def safe_get_klines_deriv(symbol, granularity=60, limit=200, start=None):
     """
-    Pide velas OHLC a Deriv vía WebSocket.
+    Pide velas OHLC a Deriv por la conexión WebSocket compartida.
     Usa estilo 'candles' y maneja errores de respuesta.
+    Con `start` (epoch) pide `limit` velas a partir de ese instante.
     """
     try:
-        ws = websocket.create_connection(
-            "wss://ws.derivws.com/websockets/v3?app_id=1089",
-            header=[f"Authorization: Bearer {DERIV_API_TOKEN}"],
-        )
-
-        end = int(datetime.utcnow().timestamp())
-        start = end - granularity * limit
+        if start is None:
+            end = int(datetime.utcnow().timestamp())
+            start = end - granularity * limit
+        else:
+            end = start + granularity * limit
 
         request = {
             "ticks_history": symbol,
@@ -73,17 +133,20 @@ def safe_get_klines_deriv(symbol, granularity=60, limit=200):
             "start": start,
             "end": end,
         }
-        ws.send(json.dumps(request))
-        response = json.loads(ws.recv())
-        ws.close()
+        LIMITADORES["deriv"].adquirir()
+        response = deriv.request(request)
 
         # Manejo de error explícito
         if "error" in response:
+            if response["error"].get("code") == "RateLimit":
+                LIMITADORES["deriv"].observar(429, {})
+            ERRORES_FETCH.inc("deriv")
             print(f"⚠️ Deriv error {symbol}: {response['error']}")
             return pd.DataFrame()
 
         # Deriv devuelve 'candles' a nivel raíz
         if "candles" not in response:
+            ERRORES_FETCH.inc("deriv")
             print(f"⚠️ Deriv no devolvió 'candles' para {symbol}: {response}")
             return pd.DataFrame()
 
@@ -107,89 +170,189 @@ def safe_get_klines_deriv(symbol, granularity=60, limit=200):
 
         return df[["timestamp", "open", "high", "low", "close", "volume"]]
 
+    except PresupuestoAgotado:
+        raise
     except Exception as e:
+        ERRORES_FETCH.inc("deriv")
         print(f"⚠️ Error al obtener datos Deriv para {symbol}: {e}")
         return pd.DataFrame()
 
 
-def demo_data(symbol, interval, limit=200):
+# Mercado simulado para el modo DEMO: series continuas y reproducibles
+simulador = Simulador(SEMILLA_DEMO)
+
+
+def safe_get_klines_binance(symbol, interval, limit=200, start=None):
     """
-    Genera datos DEMO si no hay datos reales.
+    Pide velas a Binance. Con `start` (epoch) pide `limit` velas a partir
+    de ese instante. Devuelve un DataFrame vacío si falla.
     """
-    end = datetime.utcnow()
-    tf_min = int(interval[:-1])
-    times = [end - timedelta(minutes=i * tf_min) for i in range(limit)][::-1]
-
-    base = 30000 + random.uniform(-2000, 2000)
-    noise = np.random.normal(0, 0.002, size=limit).cumsum()
-    close = base * (1 + noise)
-    high = close * (1 + np.random.uniform(0.0002, 0.0015, size=limit))
-    low = close * (1 - np.random.uniform(0.0002, 0.0015, size=limit))
-    openp = close * (1 + np.random.uniform(-0.0008, 0.0008, size=limit))
-    volume = np.random.uniform(10, 1000, size=limit)
-
-    return pd.DataFrame(
-        {
-            "timestamp": times,
-            "open": openp,
-            "high": high,
-            "low": low,
-            "close": close,
-            "volume": volume,
-        }
-    )
+    try:
+        kwargs = {"startTime": int(start) * 1000} if start is not None else {}
+        kl = client.get_klines(symbol=symbol, interval=interval, limit=limit, **kwargs)
+        df = pd.DataFrame(
+            kl,
+            columns=[
+                "ts",
+                "open",
+                "high",
+                "low",
+                "close",
+                "volume",
+                "close_time",
+                "qv",
+                "nt",
+                "tb",
+                "tq",
+                "i",
+            ],
+        )
+        df["timestamp"] = pd.to_datetime(df["ts"], unit="ms")
+        df[["open", "high", "low", "close", "volume"]] = df[
+            ["open", "high", "low", "close", "volume"]
+        ].astype(float)
+        return df[["timestamp", "open", "high", "low", "close", "volume"]]
+    except PresupuestoAgotado:
+        raise
+    except Exception as e:
+        ERRORES_FETCH.inc("binance")
+        if getattr(e, "status_code", None) in (418, 429):
+            # El limitador ya está en pausa: no es un fallo de datos
+            raise PresupuestoAgotado(f"binance: HTTP {e.status_code}") from e
+        print(f"⚠️ Error Binance {symbol}: {e}")
+        return pd.DataFrame()
+
+
+def fetch_klines(symbol, interval, limit=200, start=None):
+    """Descarga real (sin DEMO): 'frx*' => Deriv, resto => Binance."""
+    if symbol.startswith("frx"):
+        return safe_get_klines_deriv(symbol, segundos_tf(interval), limit, start=start)
+    return safe_get_klines_binance(symbol, interval, limit, start=start)
+
+
+# Ventanas locales de velas: tras la primera carga solo se piden las nuevas
+velas = CandleStore(fetch_klines, CANDLES_DIR, LIMIT)
+
+# Fuente de velas por exchange (mismo criterio 'frx*' que fetch_klines).
+# En modo stream, Binance llega por klines y forex por ticks agregados en
+# local; el REST queda de respaldo. Con remuestreo solo hace falta 1m.
+fuente_rest = FuenteREST(velas)
+TF_FUENTE = [BASE_TF] if REMUESTREO else TIMEFRAMES
+
+
+def crear_fuentes(activos):
+    """
+    (FUENTES, FLUJOS) para `activos`: la fuente de cada exchange y las que
+    son por push (el ciclo espera a que entreguen las velas cerradas).
+    """
+    fuentes = {"binance": fuente_rest, "deriv": fuente_rest}
+    if "binance" in STREAM:
+        fuentes["binance"] = BinanceKlineStream(
+            [(s, tf) for s in activos if fuente_de(s) == "binance" for tf in TF_FUENTE],
+            respaldo=fuente_rest,
+            limit=LIMIT,
+        )
+    if "deriv" in STREAM:
+        fuentes["deriv"] = DerivTickStream(
+            [s for s in activos if fuente_de(s) == "deriv"],
+            sorted({BASE_TF, *TF_FUENTE}, key=segundos_tf),
+            deriv,
+            respaldo=fuente_rest,
+            limit=LIMIT,
+        )
+    flujos = [f for f in fuentes.values() if f is not fuente_rest]
+    return fuentes, flujos
+
+
+FUENTES, FLUJOS = crear_fuentes(ACTIVOS)
+
+
+def cerrar_flujos():
+    """Cierra los flujos vigentes (un worker los reemplaza al cambiar de símbolos)."""
+    for flujo in FLUJOS:
+        flujo.close()
+
+
+atexit.register(cerrar_flujos)
+
+
+def ventana_local(symbol, interval):
+    """Última ventana de velas del símbolo, sin red."""
+    if REMUESTREO:
+        return remuestreo.ventana(symbol, interval)
+    return FUENTES[fuente_de(symbol)].ventana(symbol, interval)
+
+
+# Resultado de las señales vencidas: se buscan primero en las ventanas locales
+# (el coordinador de workers usa las que le envían los workers) y si no, red
+resolver = SignalResolver(
+    LOG_BIN, LOG_RESULTADOS, ventana_local, simulador.klines if OFFLINE else fetch_klines,
+    desde=signal_log.fin_importacion if signal_log else None,
+)
+
+
+VELAS_DEMO = metrics.contador(
+    "binarias_velas_demo_total", "Ventanas servidas con datos DEMO por falta de datos reales",
+    ("symbol", "timeframe"),
+)
+VELAS_POSPUESTAS = metrics.contador(
+    "binarias_velas_pospuestas_total", "Ventanas sin datos reales pospuestas al próximo ciclo",
+    ("symbol", "timeframe"),
+)
 
 
 def safe_get_klines(symbol, interval, limit=200):
     """
     Router:
     - Si el símbolo empieza por 'frx' => Deriv.
-    - Si no => Binance o DEMO.
+    - Si no => Binance.
+    Las velas reales salen de la fuente del exchange (FUENTES): el almacén
+    local con descarga incremental o, en modo stream, el WebSocket.
+    Sin velas reales (fallo, sin presupuesto de peso o respuesta vacía) se
+    devuelve vacío y el símbolo espera al próximo ciclo; solo con
+    BINARIAS_DEMO=1 se usan velas simuladas.
     """
-    if symbol.startswith("frx"):
-        tf_map = {"3m": 180, "5m": 300}
-        granularity = tf_map.get(interval, 60)
-        df = safe_get_klines_deriv(symbol, granularity, limit)
-        return df
+    if OFFLINE:
+        return simulador.klines(symbol, interval, limit)
 
-    if usar_binance:
-        try:
-            kl = client.get_klines(symbol=symbol, interval=interval, limit=limit)
-            df = pd.DataFrame(
-                kl,
-                columns=[
-                    "ts",
-                    "open",
-                    "high",
-                    "low",
-                    "close",
-                    "volume",
-                    "close_time",
-                    "qv",
-                    "nt",
-                    "tb",
-                    "tq",
-                    "i",
-                ],
-            )
-            df["timestamp"] = pd.to_datetime(df["ts"], unit="ms")
-            df[["open", "high", "low", "close", "volume"]] = df[
-                ["open", "high", "low", "close", "volume"]
-            ].astype(float)
-            return df[["timestamp", "open", "high", "low", "close", "volume"]]
-        except Exception as e:
-            print(f"⚠️ Error Binance {symbol}: {e}")
+    df = None
+    try:
+        df = FUENTES[fuente_de(symbol)].velas(symbol, interval, limit)
+    except PresupuestoAgotado as e:
+        print(f"⏳ {symbol} {interval} pospuesto: {e}")
+    except Exception as e:
+        print(f"⚠️ {symbol} {interval} sin velas reales: {e}")
+    if df is not None and not df.empty:
+        return df
+    if not DEMO:
+        VELAS_POSPUESTAS.inc(symbol, interval)
+        return pd.DataFrame()
 
-    # Si falla todo, usar DEMO
+    VELAS_DEMO.inc(symbol, interval)
     print(f"⚠️ Usando datos DEMO para {symbol} {interval}")
-    return demo_data(symbol, interval, limit)
+    return simulador.klines(symbol, interval, limit)
 
 
 # ---------------- INDICADORES Y ESTRATEGIA ----------------
+# Estado incremental de indicadores por (símbolo, timeframe)
+MOTORES = {}
+
+
+def motor_indicadores(symbol: str, timeframe: str) -> MotorIndicadores:
+    key = (symbol, timeframe)
+    if key not in MOTORES:
+        MOTORES[key] = MotorIndicadores()
+    return MOTORES[key]
+
+
 def add_indicators(df: pd.DataFrame) -> pd.DataFrame:
     """
     Añade EMAs, RSI, MACD, ADX, ATR, OBV, MOM, fuerza de vela, etc.
+    Versión de referencia (el ciclo usa MotorIndicadores): `ta` se importa
+    aquí para no cargarlo al arrancar.
     """
+    import ta
+
     df = df.copy()
     if df.empty:
         return df
@@ -218,53 +381,21 @@ def add_indicators(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def detectar_patrones(df: pd.DataFrame):
-    patrones = []
     if len(df) < 3:
-        return patrones
-
-    o, c, h, l = df["open"], df["close"], df["high"], df["low"]
-    body = abs(c.iloc[-1] - o.iloc[-1])
-
-    if c.iloc[-1] >= o.iloc[-1]:
-        lw = o.iloc[-1] - l.iloc[-1]
-        uw = h.iloc[-1] - c.iloc[-1]
-    else:
-        lw = c.iloc[-1] - l.iloc[-1]
-        uw = h.iloc[-1] - o.iloc[-1]
-
-    if (lw > body * 2) and (uw < body * 0.5):
-        patrones.append(("Martillo", "CALL"))
-    if (uw > body * 2) and (lw < body * 0.5):
-        patrones.append(("Shooting Star", "PUT"))
-
-    if len(df) >= 2:
-        if (c.iloc[-1] > o.iloc[-1]) and (c.iloc[-2] < o.iloc[-2]):
-            patrones.append(("Bullish Engulfing", "CALL"))
-        if (c.iloc[-1] < o.iloc[-1]) and (c.iloc[-2] > o.iloc[-2]):
-            patrones.append(("Bearish Engulfing", "PUT"))
-
-    return patrones
+        return []
+    t = df.iloc[-patterns.VELAS_PATRON:]
+    mascaras = patterns.patrones(t["open"], t["high"], t["low"], t["close"])
+    return [(p, patterns.PATRONES[p]) for p in patterns.activos(mascaras)]
 
 
 def detectar_divergencias(df: pd.DataFrame):
-    divergencias = []
     if len(df) < 4:
-        return divergencias
-
-    c = df["close"]
-    r = df["RSI"]
-    m = df["MACD"]
-
-    if c.iloc[-1] < c.iloc[-3] and r.iloc[-1] > r.iloc[-3]:
-        divergencias.append(("Divergencia RSI Alcista", "CALL"))
-    if c.iloc[-1] > c.iloc[-3] and r.iloc[-1] < r.iloc[-3]:
-        divergencias.append(("Divergencia RSI Bajista", "PUT"))
-    if c.iloc[-1] < c.iloc[-3] and m.iloc[-1] > m.iloc[-3]:
-        divergencias.append(("Divergencia MACD Alcista", "CALL"))
-    if c.iloc[-1] > c.iloc[-3] and m.iloc[-1] < m.iloc[-3]:
-        divergencias.append(("Divergencia MACD Bajista", "PUT"))
-
-    return divergencias
+        return []
+    t = df.iloc[-3:]
+    mascaras = {}
+    for osc in ("RSI", "MACD"):
+        mascaras.update(patterns.divergencias(t["close"], t[osc], osc))
+    return [(d, patterns.direccion(d)) for d in patterns.activos(mascaras)]
 
 
 def estimar_duracion(df: pd.DataFrame) -> int:
@@ -397,58 +528,186 @@ def validar_multitimeframe(sig3, sig5):
 
 
 # ---------------- LÓGICA PRINCIPAL ----------------
-def update_signals():
-    for sym in ACTIVOS:
-        try:
-            senales = {}
-
-            for tf in TIMEFRAMES:
-                df_raw = safe_get_klines(sym, tf, LIMIT)
-                if df_raw is None or df_raw.empty:
-                    print(f"[{now_utc()}] {sym} {tf} -> ⚠️ Sin datos útiles.")
-                    senales[tf] = None
-                    continue
-
-                df_ind = add_indicators(df_raw)
-                senal = construir_senal(df_ind, sym, tf)
-                senales[tf] = senal
-
-            sig3 = senales.get("3m")
-            sig5 = senales.get("5m")
-
-            valid = validar_multitimeframe(sig3, sig5)
-            if not valid:
-                print(f"[{now_utc()}] {sym} -> ❌ 3m y 5m no confirman.")
-                continue
-
-            sig3, sig5 = valid
-            sig3["mtf_ok"] = True
-            sig5["mtf_ok"] = True
-
-            filas_log = [sig3, sig5]
-            with open(LOG_CSV, "a", newline="", encoding="utf-8") as f:
-                for row in filas_log:
-                    df_row = pd.DataFrame([row])
-                    df_row.to_csv(f, header=False, index=False)
-                f.flush()
-                os.fsync(f.fileno())
-
-            for row in filas_log:
-                print(
-                    f"[{row['timestamp']}] {row['symbol']} {row['timeframe']} "
-                    f"MTF_OK ✅ -> {row['direction']} | {row['confidence_display']} | "
-                    f"score={row['score']} | trend={row['trend']} | "
-                    f"patrones={row['patterns']} | divs={row['divergences']} | "
-                    f"duración≈{row['duration_candles']} velas (~{row['duration_minutes']} min)"
-                )
+# Descarga concurrente de velas (límite de peticiones por exchange)
+fetcher = FetcherConcurrente(safe_get_klines)
+# Timeframes derivados de 1m
+remuestreo = Remuestreador(LIMIT, sin_volumen=lambda symbol: fuente_de(symbol) == "deriv")
+
+
+def semilla_klines(symbol, interval, limit=200):
+    """
+    Siembra del remuestreo: descarga directa del timeframe desde la fuente
+    del exchange. Nunca DEMO: sin datos reales el timeframe espera al
+    próximo ciclo en vez de mezclar velas simuladas con las reales.
+    """
+    if OFFLINE:
+        return simulador.klines(symbol, interval, limit)
+    return FUENTES[fuente_de(symbol)].velas(symbol, interval, limit)
+
+
+# Última señal calculada por (símbolo, timeframe), para validar MTF cuando
+# solo cierra una de las temporalidades
+ULTIMAS_SENALES = {}
+
+# ---------------- MÉTRICAS ----------------
+DURACION_ETAPA = metrics.histograma(
+    "binarias_etapa_seconds", "Duración de cada etapa del cálculo de señales",
+    ("etapa", "symbol", "timeframe"),
+)
+DURACION_CICLO = metrics.histograma(
+    "binarias_ciclo_seconds", "Duración de update_signals completo",
+)
+DURACION_RESOLVER = metrics.histograma(
+    "binarias_resolver_seconds", "Duración de la resolución de señales vencidas",
+)
+SENALES = metrics.contador(
+    "binarias_senales_total", "Señales con MTF confirmado enviadas al log",
+    ("symbol", "timeframe", "direction"),
+)
+ERRORES_CICLO = metrics.contador(
+    "binarias_ciclo_errores_total", "Errores al procesar un símbolo dentro del ciclo",
+)
+ULTIMO_CICLO = metrics.medidor(
+    "binarias_ultimo_ciclo_timestamp_seconds", "Epoch del último ciclo terminado",
+)
+
+
+def senal_timeframe(sym, tf, df_raw, cierre=None):
+    if df_raw is not None and cierre is not None:
+        # Descartar la vela que abre en el cierre: se evalúa la que termina
+        df_raw = df_raw[df_raw["timestamp"] < pd.to_datetime(cierre, unit="s")]
+
+    if df_raw is None or df_raw.empty:
+        print(f"[{now_utc()}] {sym} {tf} -> ⚠️ Sin datos útiles.")
+        return None
+
+    with DURACION_ETAPA.medir("indicadores", sym, tf):
+        df_ind = motor_indicadores(sym, tf).actualizar(df_raw)
+    with DURACION_ETAPA.medir("score", sym, tf):
+        return construir_senal(df_ind, sym, tf)
+
+
+def procesar_simbolo(sym, senales):
+    """Valida MTF con las señales nuevas y loguea solo esas."""
+    for tf, senal in senales.items():
+        ULTIMAS_SENALES[(sym, tf)] = senal
+
+    sig3 = ULTIMAS_SENALES.get((sym, "3m"))
+    sig5 = ULTIMAS_SENALES.get((sym, "5m"))
+
+    valid = validar_multitimeframe(sig3, sig5)
+    if not valid:
+        print(f"[{now_utc()}] {sym} -> ❌ 3m y 5m no confirman.")
+        return
+
+    filas_log = []
+    for sig in valid:
+        if sig is senales.get(sig["timeframe"]):
+            sig["mtf_ok"] = True
+            filas_log.append(sig)
+
+    for row in filas_log:
+        signal_log.append(row)
+        SENALES.inc(sym, row["timeframe"], row["direction"])
+
+    for row in filas_log:
+        print(
+            f"[{row['timestamp']}] {row['symbol']} {row['timeframe']} "
+            f"MTF_OK ✅ -> {row['direction']} | {row['confidence_display']} | "
+            f"score={row['score']} | trend={row['trend']} | "
+            f"patrones={row['patterns']} | divs={row['divergences']} | "
+            f"duración≈{row['duration_candles']} velas (~{row['duration_minutes']} min)"
+        )
+
 
+def update_signals(timeframes=None, cierre=None, simbolos=None):
+    """
+    Descarga los (símbolo, timeframe) pedidos en paralelo y procesa cada
+    símbolo en cuanto llegan todas sus temporalidades (con REMUESTREO se
+    descarga solo 1m y el resto se deriva). Con `cierre` (epoch) se evalúa
+    la vela que cierra en ese instante. `simbolos` limita el ciclo a una
+    parte de ACTIVOS.
+    """
+    t0 = time.perf_counter()
+    timeframes = list(timeframes or TIMEFRAMES)
+    simbolos = list(ACTIVOS if simbolos is None else simbolos)
+    if REMUESTREO:
+        # Una descarga de 1m por símbolo: todas sus temporalidades salen de
+        # la misma foto
+        jobs = [(sym, BASE_TF) for sym in simbolos]
+    else:
+        jobs = [(sym, tf) for sym in simbolos for tf in timeframes]
+    pendientes = {sym: {} for sym in simbolos}
+    # Una descarga que llegue después del próximo cierre ya no sirve
+    limite = None
+    if cierre is not None:
+        limite = cierre + min(segundos_tf(tf) for tf in timeframes)
+
+    def procesar(sym, tf, df_raw, semillas=None):
+        try:
+            if REMUESTREO:
+                frames = remuestreo.derivar(sym, df_raw, timeframes, semillas)
+            else:
+                frames = {tf: df_raw}
+            for tf, df in frames.items():
+                pendientes[sym][tf] = senal_timeframe(sym, tf, df, cierre)
+            if len(pendientes[sym]) == len(timeframes):
+                procesar_simbolo(sym, pendientes.pop(sym))
         except Exception as e:
+            pendientes.pop(sym, None)
+            ERRORES_CICLO.inc()
             print("⚠️ Error en", sym, ":", e)
 
+    # Los símbolos cuyo remuestreo necesita semilla esperan a descargarla
+    # (en paralelo y con el mismo plazo, tras las de 1m)
+    sin_semilla = {}
+    for sym, tf, df_raw in fetcher.fetch(jobs, LIMIT, limite):
+        faltan = remuestreo.sin_semilla(sym, df_raw, timeframes) if REMUESTREO else []
+        if faltan:
+            sin_semilla[sym] = (df_raw, faltan, {})
+            continue
+        procesar(sym, tf, df_raw)
+
+    semillas = [(sym, tf) for sym, (_, faltan, _) in sin_semilla.items() for tf in faltan]
+    for sym, tf, df in fetcher.fetch(semillas, LIMIT, limite, fetch_fn=semilla_klines):
+        df_raw, faltan, recibidas = sin_semilla[sym]
+        recibidas[tf] = df
+        if len(recibidas) == len(faltan):
+            procesar(sym, BASE_TF, df_raw, recibidas)
+
+    DURACION_CICLO.observe(time.perf_counter() - t0)
+    ULTIMO_CICLO.set(time.time())
+
+
+def esperar_flujos(timeframes=None, cierre=None):
+    """Las velas cerradas llegan por push poco después del cierre: se esperan."""
+    if not FLUJOS or cierre is None:
+        return
+    limite = time.monotonic() + STREAM_ESPERA
+    esperados = [BASE_TF] if REMUESTREO else (timeframes or TIMEFRAMES)
+    for flujo in FLUJOS:
+        restante = max(0.0, limite - time.monotonic())
+        if not flujo.esperar_cierre(esperados, cierre, restante):
+            print(f"⚠️ {type(flujo).__name__}: faltan velas cerradas, se usan las disponibles")
+
+
+def ciclo(timeframes=None, cierre=None):
+    """Un ciclo del scheduler: señales nuevas y resultado de las vencidas."""
+    esperar_flujos(timeframes, cierre)
+    update_signals(timeframes, cierre)
+    try:
+        with DURACION_RESOLVER.medir():
+            resolver.resolver()
+    except Exception as e:
+        print("⚠️ Error al resolver señales:", e)
+    try:
+        metrics.volcar(METRICAS_PROM)
+    except OSError as e:
+        print("⚠️ No se pudieron guardar las métricas:", e)
+
 
 # ---------------- LOOP PRINCIPAL ----------------
 if __name__ == "__main__":
     print("🚀 Iniciando sistema BINARIAS + Deriv (MTF + Divergencias + Volumen)...")
-    while True:
-        update_signals()
-        time.sleep(20)
+    # Se recalcula al cierre de cada vela de 3m/5m (no cada 20 s)
+    CandleScheduler(TIMEFRAMES, offset=OFFSET_CIERRE).run(ciclo)
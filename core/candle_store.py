@@ -0,0 +1,172 @@
+import os
+import time
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+import metrics
+
+VELA_COLS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+
+# origen: memoria / disco (ventana ya cargada) o descarga (ventana completa)
+VENTANAS = metrics.contador(
+    "binarias_velas_ventana_total", "Actualizaciones de ventana de velas por origen", ("origen",),
+)
+VELAS_DESCARGADAS = metrics.contador(
+    "binarias_velas_descargadas_total", "Velas recibidas del exchange", ("symbol", "timeframe"),
+)
+
+
+def segundos_tf(interval: str) -> int:
+    """'3m' -> 180, '1h' -> 3600, '1d' -> 86400."""
+    unidades = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    return int(interval[:-1]) * unidades[interval[-1]]
+
+
+def _epoch(ts) -> int:
+    return int(pd.Timestamp(ts).timestamp())
+
+
+def _merge(viejo: pd.DataFrame, nuevo: pd.DataFrame) -> pd.DataFrame:
+    """Las velas nuevas reemplazan a las guardadas desde su primer timestamp."""
+    if nuevo is None or nuevo.empty:
+        return viejo
+    if viejo is None or viejo.empty:
+        return nuevo[VELA_COLS].reset_index(drop=True)
+    df = pd.concat([viejo, nuevo[VELA_COLS]], ignore_index=True)
+    df = df.drop_duplicates("timestamp", keep="last").sort_values("timestamp")
+    return df.reset_index(drop=True)
+
+
+class CandleStore:
+    """
+    Ventana local de velas OHLCV por (símbolo, timeframe).
+
+    La primera vez descarga `limit` velas (o las carga del disco); después
+    solo pide al exchange las velas desde la última guardada, que es la que
+    aún se estaba formando y se reemplaza. Si falta un tramo dentro de la
+    ventana se intenta rellenar una vez; si el hueco es mayor que la
+    ventana se descarga completa.
+
+    `fetch_fn(symbol, interval, limit, start=None)` debe devolver un
+    DataFrame con VELA_COLS; `start` es un epoch en segundos y pide `limit`
+    velas a partir de ese instante.
+    """
+
+    def __init__(self, fetch_fn, directorio=None, limit=200):
+        self.fetch_fn = fetch_fn
+        self.directorio = directorio
+        self.limit = limit
+
+        self._ventanas = {}
+        self._locks = defaultdict(threading.Lock)
+        self._huecos_vistos = defaultdict(set)
+        self.velas_descargadas = 0
+
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    # ---------------- DISCO ----------------
+    def _ruta(self, symbol, interval):
+        return os.path.join(self.directorio, f"{symbol}_{interval}.csv")
+
+    def _cargar(self, symbol, interval):
+        if not self.directorio:
+            return None
+        ruta = self._ruta(symbol, interval)
+        if not os.path.exists(ruta):
+            return None
+        try:
+            df = pd.read_csv(ruta)
+            df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+            return df[VELA_COLS]
+        except Exception as e:
+            print(f"⚠️ Velas en disco ilegibles {ruta}: {e}")
+            return None
+
+    def _guardar(self, symbol, interval, df):
+        if not self.directorio:
+            return
+        ruta = self._ruta(symbol, interval)
+        out = df.copy()
+        out["timestamp"] = out["timestamp"].map(_epoch)
+        tmp = ruta + ".tmp"
+        out.to_csv(tmp, index=False)
+        os.replace(tmp, ruta)
+
+    # ---------------- DESCARGA ----------------
+    def _descargar(self, symbol, interval, limit, start=None):
+        df = self.fetch_fn(symbol, interval, limit, start=start)
+        if df is not None and not df.empty:
+            self.velas_descargadas += len(df)
+            VELAS_DESCARGADAS.inc(symbol, interval, n=len(df))
+        return df
+
+    def _rellenar_huecos(self, symbol, interval, df, tf):
+        epochs = df["timestamp"].map(_epoch)
+        saltos = epochs.diff()
+        for i in saltos.index[saltos > tf]:
+            desde, hasta = int(epochs[i - 1]) + tf, int(epochs[i])
+            # Mercado cerrado (p. ej. forex en fin de semana): se intenta una vez
+            if desde in self._huecos_vistos[(symbol, interval)]:
+                continue
+            self._huecos_vistos[(symbol, interval)].add(desde)
+            faltan = (hasta - desde) // tf
+            df = _merge(df, self._descargar(symbol, interval, faltan, start=desde))
+        return df
+
+    def _actualizar(self, symbol, interval):
+        key = (symbol, interval)
+        tf = segundos_tf(interval)
+        df = self._ventanas.get(key)
+        origen = "memoria"
+        if df is None:
+            df = self._cargar(symbol, interval)
+            origen = "disco"
+
+        if df is None or df.empty:
+            VENTANAS.inc("descarga")
+            merged = self._descargar(symbol, interval, self.limit)
+        else:
+            ultimo = _epoch(df["timestamp"].iloc[-1])
+            faltan = int((time.time() - ultimo) // tf) + 1
+            if faltan >= self.limit:
+                VENTANAS.inc("descarga")
+                merged = self._descargar(symbol, interval, self.limit)
+            else:
+                VENTANAS.inc(origen)
+                nuevo = self._descargar(symbol, interval, faltan + 1, start=ultimo)
+                merged = _merge(df, nuevo)
+
+        if merged is None or merged.empty:
+            return df if df is not None else pd.DataFrame(columns=VELA_COLS)
+
+        merged = self._rellenar_huecos(symbol, interval, merged, tf)
+        merged = merged.iloc[-self.limit:].reset_index(drop=True)
+
+        # Persistir solo cuando cierra una vela nueva
+        cerrada = merged["timestamp"].iloc[-2] if len(merged) > 1 else None
+        cerrada_previa = df["timestamp"].iloc[-2] if df is not None and len(df) > 1 else None
+        if cerrada != cerrada_previa:
+            self._guardar(symbol, interval, merged)
+
+        self._ventanas[key] = merged
+        return merged
+
+    def olvidar(self, symbol):
+        """Libera las ventanas en memoria de `symbol` (el disco se conserva)."""
+        for key in [k for k in self._ventanas if k[0] == symbol]:
+            with self._locks[key]:
+                self._ventanas.pop(key, None)
+
+    def ventana(self, symbol, interval):
+        """Última ventana descargada, sin ir al exchange (None si no hay)."""
+        with self._locks[(symbol, interval)]:
+            return self._ventanas.get((symbol, interval))
+
+    def get(self, symbol, interval):
+        """Ventana actualizada de `limit` velas (la última puede estar abierta)."""
+        with self._locks[(symbol, interval)]:
+            return self._actualizar(symbol, interval)
@@ -0,0 +1,81 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import metrics
+import rate_limit
+
+# Peticiones simultáneas permitidas por exchange
+LIMITES_POR_FUENTE = {"binance": 8, "deriv": 4}
+
+DURACION_FETCH = metrics.histograma(
+    "binarias_fetch_seconds", "Duración de la descarga de velas (incluye la espera del semáforo)",
+    ("fuente", "symbol", "timeframe"),
+)
+ERRORES_FETCH = metrics.contador(
+    "binarias_fetch_errores_total", "Descargas de velas fallidas", ("fuente",),
+)
+
+
+def fuente_de(symbol: str) -> str:
+    """Mismo criterio que safe_get_klines: 'frx*' va a Deriv."""
+    return "deriv" if symbol.startswith("frx") else "binance"
+
+
+class FetcherConcurrente:
+    """
+    Descarga en paralelo las velas de varios (símbolo, timeframe).
+
+    Usa un pool de hilos persistente y un semáforo por exchange para no
+    superar su límite de concurrencia. `fetch` entrega cada resultado en
+    cuanto llega, así el cálculo de señales empieza sin esperar al resto y
+    el ciclo dura lo que la petición más lenta, no la suma de todas.
+    """
+
+    def __init__(self, fetch_fn, limites=None, max_workers=None):
+        self.fetch_fn = fetch_fn
+        self.limites = dict(limites or LIMITES_POR_FUENTE)
+        self._semaforos = {
+            fuente: threading.BoundedSemaphore(n) for fuente, n in self.limites.items()
+        }
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or sum(self.limites.values()),
+            thread_name_prefix="fetch",
+        )
+
+    def _descargar(self, symbol, interval, limit, limite=None, fetch_fn=None):
+        fetch_fn = fetch_fn or self.fetch_fn
+        fuente = fuente_de(symbol)
+        sem = self._semaforos.get(fuente)
+        t0 = time.perf_counter()
+        try:
+            with rate_limit.plazo(limite):
+                if sem is None:
+                    return fetch_fn(symbol, interval, limit)
+                with sem:
+                    return fetch_fn(symbol, interval, limit)
+        except Exception as e:
+            ERRORES_FETCH.inc(fuente)
+            print(f"⚠️ Error al descargar {symbol} {interval}: {e}")
+            return None
+        finally:
+            DURACION_FETCH.observe(time.perf_counter() - t0, fuente, symbol, interval)
+
+    def fetch(self, jobs, limit=200, limite=None, fetch_fn=None):
+        """
+        jobs: iterable de (symbol, interval). Genera (symbol, interval, df)
+        en orden de llegada; df es None si la descarga falló. `limite`
+        (epoch) es el plazo de las peticiones ante el límite de peso del
+        exchange (ver rate_limit.plazo). `fetch_fn` sustituye a la del
+        constructor para estas descargas (con los mismos semáforos).
+        """
+        futuros = {
+            self._pool.submit(self._descargar, sym, tf, limit, limite, fetch_fn): (sym, tf)
+            for sym, tf in jobs
+        }
+        for fut in as_completed(futuros):
+            sym, tf = futuros[fut]
+            yield sym, tf, fut.result()
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
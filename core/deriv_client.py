@@ -0,0 +1,293 @@
+import json
+import time
+import itertools
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import websocket
+
+DERIV_URL = "wss://ws.derivws.com/websockets/v3?app_id=1089"
+
+
+class DerivClient:
+    """
+    Conexión WebSocket persistente con Deriv compartida por todos los hilos.
+
+    - Una sola conexión autorizada, abierta en la primera petición.
+    - Peticiones concurrentes multiplexadas: cada una lleva un `req_id` y un
+      hilo lector entrega cada respuesta a quien la pidió.
+    - Si la conexión cae, las peticiones en vuelo fallan y la siguiente
+      reconecta, esperando entre intentos con backoff exponencial.
+    - Un hilo de heartbeat envía `ping` periódicamente para que Deriv no
+      cierre la conexión por inactividad y para detectar conexiones muertas.
+    - Las suscripciones (`suscribir`) entregan cada mensaje a su callback y
+      se renuevan solas al reconectar; si hay suscripciones, el heartbeat
+      reconecta aunque no llegue ninguna petición. `conexiones` cuenta las
+      conexiones abiertas (cambia en cada reconexión).
+    """
+
+    def __init__(self, token=None, url=DERIV_URL, timeout=10, ping_interval=30,
+                 backoff_inicial=1, backoff_max=60):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.backoff_inicial = backoff_inicial
+        self.backoff_max = backoff_max
+
+        self._ws = None
+        self._pending = {}
+        self._suscripciones = {}  # req_id -> (payload, callback)
+        self._ids_servidor = {}  # req_id -> id de la suscripción en Deriv
+        self.conexiones = 0
+        self._ids = itertools.count(1)
+        self._conn_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._fallos = 0
+        self._proximo_intento = 0.0
+        self._cerrado = False
+        self._heartbeat = None
+
+    # ---------------- CONEXIÓN ----------------
+    def _fallo(self):
+        self._fallos += 1
+        espera = min(self.backoff_max, self.backoff_inicial * 2 ** (self._fallos - 1))
+        self._proximo_intento = time.monotonic() + espera
+
+    def _autorizar(self, ws):
+        """Envía `authorize` y espera la respuesta. Lanza ConnectionError si falla."""
+        fut = self._enviar(ws, {"authorize": self.token})
+        try:
+            resp = fut.result(self.timeout)
+        except FutureTimeout:
+            with self._pending_lock:
+                self._pending.pop(fut.req_id, None)
+            raise ConnectionError("Deriv: sin respuesta a authorize")
+        if "error" in resp:
+            raise ConnectionError(
+                f"Deriv: autorización rechazada: {resp['error'].get('message')}"
+            )
+
+    def _conectar(self):
+        """
+        Abre y autoriza una conexión nueva. Solo se publica en `_ws` cuando
+        está lista: hasta entonces el lector puede descartarla sin esperar
+        a `_conn_lock`.
+        """
+        ahora = time.monotonic()
+        if ahora < self._proximo_intento:
+            raise ConnectionError(
+                f"Deriv: reconexión en {self._proximo_intento - ahora:.1f}s"
+            )
+        try:
+            ws = websocket.create_connection(self.url, timeout=self.timeout)
+        except Exception:
+            self._fallo()
+            raise
+
+        ws.settimeout(None)  # el lector bloquea; el heartbeat vigila la conexión
+        threading.Thread(target=self._leer, args=(ws,), name="deriv-reader", daemon=True).start()
+
+        if self.token:
+            try:
+                self._autorizar(ws)
+            except Exception as e:
+                self._fallo()
+                self._descartar(ws, e)
+                print(f"⚠️ {e}")
+                raise ConnectionError(str(e)) from e
+
+        # Las suscripciones de la conexión anterior se renuevan con ids nuevos
+        with self._pending_lock:
+            viejas, self._suscripciones = self._suscripciones, {}
+            self._ids_servidor = {}
+        for payload, callback in viejas.values():
+            try:
+                self._suscribir_en(ws, payload, callback)
+            except Exception as e:
+                # El lector descarta la conexión; se renueva en la siguiente
+                print(f"⚠️ Deriv: no se pudo renovar la suscripción {payload}: {e}")
+
+        self._ws = ws
+        if getattr(ws, "descartada", False):
+            # El lector la cerró antes de publicarla
+            self._ws = None
+            self._fallo()
+            raise ConnectionError("Deriv: conexión perdida al conectar")
+        self.conexiones += 1
+        self._fallos = 0
+        self._proximo_intento = 0.0
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(
+                target=self._latir, name="deriv-heartbeat", daemon=True
+            )
+            self._heartbeat.start()
+        return ws
+
+    def _conexion(self):
+        with self._conn_lock:
+            if self._cerrado:
+                raise ConnectionError("Deriv: cliente cerrado")
+            if self._ws is None:
+                self._conectar()
+            return self._ws
+
+    def _descartar(self, ws, error):
+        """Cierra `ws` y hace fallar las peticiones pendientes."""
+        # Una conexión aún sin publicar (en _conectar, con _conn_lock tomado)
+        # se marca y se descarta sin esperar al lock
+        ws.descartada = True
+        if self._ws is ws:
+            with self._conn_lock:
+                if self._ws is ws:
+                    self._ws = None
+        try:
+            ws.close()
+        except Exception:
+            pass
+        with self._pending_lock:
+            pendientes, self._pending = self._pending, {}
+        for fut in pendientes.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError(f"Deriv: conexión perdida ({error})"))
+
+    # ---------------- HILOS ----------------
+    def _leer(self, ws):
+        while True:
+            try:
+                raw = ws.recv()
+            except Exception as e:
+                self._descartar(ws, e)
+                return
+            if not raw:
+                self._descartar(ws, "cerrada por el servidor")
+                return
+            try:
+                msg = json.loads(raw)
+            except ValueError:
+                continue
+            with self._pending_lock:
+                fut = self._pending.pop(msg.get("req_id"), None)
+                sub = self._suscripciones.get(msg.get("req_id"))
+                if sub is not None and msg.get("subscription"):
+                    self._ids_servidor.setdefault(msg["req_id"], msg["subscription"].get("id"))
+            if fut is not None and not fut.done():
+                fut.set_result(msg)
+            if sub is not None:
+                try:
+                    sub[1](msg)
+                except Exception as e:
+                    print(f"⚠️ Deriv: error en el callback de suscripción: {e}")
+
+    def _latir(self):
+        while not self._cerrado:
+            time.sleep(self.ping_interval)
+            ws = self._ws
+            if ws is None:
+                if self._suscripciones:
+                    try:
+                        self._conexion()
+                    except Exception:
+                        pass
+                continue
+            try:
+                self._enviar(ws, {"ping": 1}).result(self.timeout)
+            except FutureTimeout:
+                self._descartar(ws, "sin respuesta al ping")
+            except Exception:
+                pass
+
+    # ---------------- PETICIONES ----------------
+    def _enviar(self, ws, payload):
+        req_id = next(self._ids)
+        fut = Future()
+        with self._pending_lock:
+            self._pending[req_id] = fut
+        try:
+            with self._send_lock:
+                ws.send(json.dumps(dict(payload, req_id=req_id)))
+        except Exception as e:
+            with self._pending_lock:
+                self._pending.pop(req_id, None)
+            self._descartar(ws, e)
+            raise
+        fut.req_id = req_id
+        return fut
+
+    def request(self, payload, timeout=None):
+        """Envía `payload` y espera su respuesta (dict)."""
+        fut = self._enviar(self._conexion(), payload)
+        try:
+            return fut.result(timeout or self.timeout)
+        except FutureTimeout:
+            with self._pending_lock:
+                self._pending.pop(fut.req_id, None)
+            raise TimeoutError(f"Deriv: sin respuesta a {list(payload)[0]}")
+
+    def _suscribir_en(self, ws, payload, callback):
+        """
+        Registra la suscripción y la envía. Si el envío falla queda
+        registrada y se renueva con la siguiente conexión.
+        """
+        req_id = next(self._ids)
+        fut = Future()
+        fut.req_id = req_id
+        with self._pending_lock:
+            self._pending[req_id] = fut
+            self._suscripciones[req_id] = (payload, callback)
+        with self._send_lock:
+            ws.send(json.dumps(dict(payload, subscribe=1, req_id=req_id)))
+        return fut
+
+    def _olvidar(self, payload, callback):
+        with self._pending_lock:
+            for req_id, sub in list(self._suscripciones.items()):
+                if sub == (payload, callback):
+                    del self._suscripciones[req_id]
+                    self._pending.pop(req_id, None)
+
+    def suscribir(self, payload, callback, timeout=None):
+        """
+        Suscribe `payload` (p. ej. {"ticks": "frxEURUSD"}) y llama a
+        `callback(msg)` con cada mensaje, el primero incluido. Devuelve la
+        primera respuesta; si trae error la suscripción se descarta.
+        """
+        ws = self._conexion()
+        try:
+            fut = self._suscribir_en(ws, payload, callback)
+        except Exception as e:
+            self._olvidar(payload, callback)
+            self._descartar(ws, e)
+            raise
+        try:
+            resp = fut.result(timeout or self.timeout)
+        except FutureTimeout:
+            self._olvidar(payload, callback)
+            raise TimeoutError(f"Deriv: sin respuesta a la suscripción {list(payload)[0]}")
+        if "error" in resp:
+            self._olvidar(payload, callback)
+        return resp
+
+    def cancelar(self, payload, callback):
+        """Deja de recibir `payload`: se olvida y se envía `forget` a Deriv."""
+        with self._pending_lock:
+            ids = [
+                self._ids_servidor.pop(req_id, None)
+                for req_id, sub in self._suscripciones.items()
+                if sub == (payload, callback)
+            ]
+        self._olvidar(payload, callback)
+        ws = self._ws
+        for sid in ids:
+            if sid and ws is not None:
+                try:
+                    self._enviar(ws, {"forget": sid})
+                except Exception:
+                    pass
+
+    def close(self):
+        self._cerrado = True
+        ws = self._ws
+        if ws is not None:
+            self._descartar(ws, "cliente cerrado")
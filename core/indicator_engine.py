@@ -0,0 +1,219 @@
+from collections import deque
+
+import pandas as pd
+
+# Mismos parámetros que add_indicators (librería `ta`)
+EMAS = (9, 21, 50, 200)
+RSI_N = 14
+MACD_FAST, MACD_SLOW, MACD_SIGN = 12, 26, 9
+ADX_N = 14
+ATR_N = 14
+ROC_N = 5
+
+VELA_COLS = ["timestamp", "open", "high", "low", "close", "volume"]
+COLUMNAS = VELA_COLS + [
+    "EMA9", "EMA21", "EMA50", "EMA200", "RSI", "MACD", "MACD_SIG",
+    "ADX", "ATR", "OBV", "MOM", "VELA_PODER",
+]
+
+NAN = float("nan")
+
+
+def _alpha_span(span):
+    # Igual que pandas.ewm(span=...): alpha = 1 / (1 + com)
+    return 1.0 / (1.0 + (span - 1) / 2)
+
+
+def _alpha(alpha):
+    # Igual que pandas.ewm(alpha=...)
+    return 1.0 / (1.0 + (1 - alpha) / alpha)
+
+
+A_EMA = {n: _alpha_span(n) for n in EMAS}
+A_FAST = _alpha_span(MACD_FAST)
+A_SLOW = _alpha_span(MACD_SLOW)
+A_SIGN = _alpha_span(MACD_SIGN)
+A_RSI = _alpha(1 / RSI_N)
+
+
+def _ewm(prev, x, a):
+    """Un paso de ewm(adjust=False).mean() con la misma aritmética que pandas."""
+    if prev == x:
+        return prev
+    old = 1.0 - a
+    return (old * prev + a * x) / (old + a)
+
+
+def _dx(s, p, m):
+    dip = 100 * (p / s) if s != 0 else 0.0
+    din = 100 * (m / s) if s != 0 else 0.0
+    if dip + din == 0:
+        return 0.0
+    return 100 * abs((dip - din) / (dip + din))
+
+
+def _primer_paso(vela):
+    ts, o, h, l, c, v = vela
+    e = {
+        "j": 0, "ts": ts, "c": c, "h": h, "l": l,
+        "fast": c, "slow": c, "sig": None, "sig_n": 0,
+        "up": 0.0, "dn": 0.0,
+        "tr_sum": h - l, "atr": 0.0,
+        "s": 0.0, "p": 0.0, "m": 0.0, "dx_sum": 0.0, "adx": 0.0,
+        "obv": v, "closes": (c,),
+    }
+    for n in EMAS:
+        e[f"ema{n}"] = c
+    return e
+
+
+def _paso(prev, vela):
+    """
+    Avanza el estado una vela en O(1). `prev` no se modifica: se devuelve
+    un estado nuevo, así la vela en formación se puede recalcular sobre el
+    último estado cerrado tantas veces como haga falta.
+    """
+    if prev is None:
+        return _primer_paso(vela)
+
+    ts, o, h, l, c, v = vela
+    e = dict(prev)
+    j = e["j"] = prev["j"] + 1
+    pc, ph, pl = prev["c"], prev["h"], prev["l"]
+    e["ts"], e["c"], e["h"], e["l"] = ts, c, h, l
+
+    # EMAs y MACD
+    for n in EMAS:
+        e[f"ema{n}"] = _ewm(prev[f"ema{n}"], c, A_EMA[n])
+    e["fast"] = _ewm(prev["fast"], c, A_FAST)
+    e["slow"] = _ewm(prev["slow"], c, A_SLOW)
+    if j >= MACD_SLOW - 1:
+        macd = e["fast"] - e["slow"]
+        e["sig"] = macd if prev["sig"] is None else _ewm(prev["sig"], macd, A_SIGN)
+        e["sig_n"] = prev["sig_n"] + 1
+
+    # RSI (Wilder vía ewm alpha=1/n)
+    diff = c - pc
+    e["up"] = _ewm(prev["up"], diff if diff > 0 else 0.0, A_RSI)
+    e["dn"] = _ewm(prev["dn"], -diff if diff < 0 else 0.0, A_RSI)
+
+    # ATR: media simple de las primeras n TR y luego suavizado de Wilder
+    tr = max(h, pc) - min(l, pc)
+    if j < ATR_N:
+        e["tr_sum"] = prev["tr_sum"] + tr
+        if j == ATR_N - 1:
+            e["atr"] = e["tr_sum"] / ATR_N
+    else:
+        e["atr"] = (prev["atr"] * (ATR_N - 1) + tr) / ATR_N
+
+    # ADX (misma secuencia de suavizados que ta.trend.ADXIndicator)
+    up, down = h - ph, pl - l
+    pos = up if (up > down and up > 0) else 0.0
+    neg = down if (down > up and down > 0) else 0.0
+    if j <= ADX_N:
+        e["s"], e["p"], e["m"] = prev["s"] + tr, prev["p"] + pos, prev["m"] + neg
+    else:
+        e["s"] = prev["s"] - prev["s"] / ADX_N + tr
+        e["p"] = prev["p"] - prev["p"] / ADX_N + pos
+        e["m"] = prev["m"] - prev["m"] / ADX_N + neg
+    if j >= ADX_N:
+        dx = _dx(e["s"], e["p"], e["m"])
+        if j < 2 * ADX_N - 1:
+            e["dx_sum"] = prev["dx_sum"] + dx
+        elif j == 2 * ADX_N - 1:
+            e["dx_sum"] = prev["dx_sum"] + dx
+            e["adx"] = e["dx_sum"] / ADX_N
+        else:
+            e["adx"] = (prev["adx"] * (ADX_N - 1) + dx) / ADX_N
+
+    # OBV y ROC
+    e["obv"] = prev["obv"] + (-v if c < pc else v)
+    e["closes"] = (prev["closes"] + (c,))[-(ROC_N + 1):]
+
+    return e
+
+
+def _fila(e, vela):
+    ts, o, h, l, c, v = vela
+    j = e["j"]
+    fila = {"timestamp": ts, "open": o, "high": h, "low": l, "close": c, "volume": v}
+
+    for n in EMAS:
+        fila[f"EMA{n}"] = e[f"ema{n}"] if j >= n - 1 else NAN
+
+    if j >= RSI_N - 1:
+        fila["RSI"] = 100.0 if e["dn"] == 0 else 100 - (100 / (1 + e["up"] / e["dn"]))
+    else:
+        fila["RSI"] = NAN
+
+    fila["MACD"] = e["fast"] - e["slow"] if j >= MACD_SLOW - 1 else NAN
+    fila["MACD_SIG"] = e["sig"] if e["sig_n"] >= MACD_SIGN else NAN
+
+    fila["ADX"] = e["adx"]
+    fila["ATR"] = e["atr"]
+    fila["OBV"] = e["obv"]
+
+    closes = e["closes"]
+    if j >= ROC_N:
+        fila["MOM"] = (c - closes[0]) / closes[0] * 100
+    else:
+        fila["MOM"] = NAN
+    fila["VELA_PODER"] = abs(c - o) / (e["atr"] + 1e-9)
+    return fila
+
+
+class MotorIndicadores:
+    """
+    Indicadores de add_indicators calculados de forma incremental.
+
+    Guarda el estado recursivo (EMAs, suavizados de Wilder, OBV...) de un
+    par (símbolo, temporalidad). Cada vela cerrada avanza el estado en O(1);
+    la vela en formación se evalúa sobre el último estado cerrado sin
+    modificarlo. Alimentado con la misma serie, da los mismos valores que
+    `ta` sobre el DataFrame completo.
+    """
+
+    def __init__(self, historia=10):
+        self.historia = historia
+        self.reset()
+
+    def reset(self):
+        self._estado = None
+        self._filas = deque(maxlen=self.historia)
+        self.ultimo_ts = None
+
+    def cerrar(self, vela):
+        """Incorpora una vela cerrada (ts, open, high, low, close, volume)."""
+        self._estado = _paso(self._estado, vela)
+        self._filas.append(_fila(self._estado, vela))
+        self.ultimo_ts = vela[0]
+
+    def previsualizar(self, vela):
+        """Indicadores de la vela en formación, sin tocar el estado."""
+        return _fila(_paso(self._estado, vela), vela)
+
+    def actualizar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Recibe la ventana de velas (como la devuelve safe_get_klines), cierra
+        las que son nuevas y trata la última como vela en formación.
+        Devuelve las últimas `historia` filas con las columnas de
+        add_indicators.
+        """
+        if df is None or df.empty:
+            return pd.DataFrame(columns=COLUMNAS)
+
+        ts = df["timestamp"]
+        # Sin solape con lo ya procesado (hueco o reinicio): reconstruir
+        if self.ultimo_ts is not None and ts.iloc[0] > self.ultimo_ts:
+            self.reset()
+        if self.ultimo_ts is not None:
+            df = df[ts > self.ultimo_ts]
+
+        velas = list(df[VELA_COLS].itertuples(index=False, name=None))
+        for vela in velas[:-1]:
+            self.cerrar(vela)
+
+        filas = list(self._filas)
+        if velas:
+            filas.append(self.previsualizar(velas[-1]))
+        return pd.DataFrame(filas, columns=COLUMNAS)
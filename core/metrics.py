@@ -0,0 +1,196 @@
+import os
+import math
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Límites de los histogramas de latencia (segundos)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registro = {}
+_registro_lock = threading.Lock()
+
+
+def _num(v):
+    if isinstance(v, float):
+        if math.isinf(v):
+            return "+Inf" if v > 0 else "-Inf"
+        return repr(v)
+    return str(v)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres, valores, extra=None):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+# ---------------- MÉTRICAS ----------------
+class _Metrica:
+    """
+    Base de las métricas: un valor por combinación de etiquetas. Los
+    valores de las etiquetas se pasan en orden, sin nombre, para que
+    registrar una muestra cueste solo un lock y una suma.
+    """
+
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def _lineas(self):
+        raise NotImplementedError
+
+    def exponer(self):
+        with self._lock:
+            lineas = self._lineas()
+        if not lineas:
+            return []
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"] + lineas
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, *valores, n=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + n
+
+    def _lineas(self):
+        return [
+            f"{self.nombre}{_etiquetas(self.etiquetas, k)} {_num(v)}"
+            for k, v in sorted(self._valores.items())
+        ]
+
+
+class Medidor(_Metrica):
+    tipo = "gauge"
+
+    def set(self, valor, *valores):
+        with self._lock:
+            self._valores[valores] = valor
+
+    def _lineas(self):
+        return [
+            f"{self.nombre}{_etiquetas(self.etiquetas, k)} {_num(v)}"
+            for k, v in sorted(self._valores.items())
+        ]
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, valor, *valores):
+        i = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._valores.get(valores)
+            if serie is None:
+                # [conteo por bucket..., +Inf, suma]
+                serie = self._valores[valores] = [0] * (len(self.buckets) + 1) + [0.0]
+            serie[i] += 1
+            serie[-1] += valor
+
+    @contextmanager
+    def medir(self, *valores):
+        """Observa la duración del bloque `with`."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *valores)
+
+    def _lineas(self):
+        lineas = []
+        for k, serie in sorted(self._valores.items()):
+            acumulado = 0
+            for le, n in zip(self.buckets + (math.inf,), serie[:-1]):
+                acumulado += n
+                extra = f'le="{_num(float(le))}"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, k, extra)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, k)} {_num(serie[-1])}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, k)} {acumulado}")
+        return lineas
+
+
+# ---------------- REGISTRO ----------------
+def _obtener(clase, nombre, ayuda, etiquetas, **kwargs):
+    """Devuelve la métrica registrada con ese nombre o la crea."""
+    with _registro_lock:
+        m = _registro.get(nombre)
+        if m is None:
+            m = _registro[nombre] = clase(nombre, ayuda, etiquetas, **kwargs)
+        elif type(m) is not clase or m.etiquetas != tuple(etiquetas):
+            raise ValueError(f"Métrica {nombre} ya registrada con otro tipo o etiquetas")
+        return m
+
+
+def contador(nombre, ayuda, etiquetas=()) -> Contador:
+    return _obtener(Contador, nombre, ayuda, etiquetas)
+
+
+def medidor(nombre, ayuda, etiquetas=()) -> Medidor:
+    return _obtener(Medidor, nombre, ayuda, etiquetas)
+
+
+def histograma(nombre, ayuda, etiquetas=(), buckets=BUCKETS) -> Histograma:
+    return _obtener(Histograma, nombre, ayuda, etiquetas, buckets=buckets)
+
+
+def exponer() -> str:
+    """Todas las métricas del proceso en formato de texto de Prometheus."""
+    with _registro_lock:
+        metricas = list(_registro.values())
+    lineas = []
+    for m in metricas:
+        lineas.extend(m.exponer())
+    return "\n".join(lineas) + "\n" if lineas else ""
+
+
+def familias(texto):
+    """Nombres de las métricas declaradas (# TYPE) en un texto Prometheus."""
+    return {
+        linea.split()[2] for linea in texto.splitlines()
+        if linea.startswith("# TYPE ") and len(linea.split()) > 2
+    }
+
+
+def combinar(propio, externo):
+    """
+    Añade a `propio` las familias de `externo` que no estén ya en él: una
+    exposición no puede repetir una métrica (la API y el productor cargan
+    algunos módulos en común).
+    """
+    repetidas = familias(propio)
+    lineas, saltar = [], False
+    for linea in externo.splitlines():
+        if linea.startswith("# HELP ") or linea.startswith("# TYPE "):
+            partes = linea.split()
+            saltar = len(partes) > 2 and partes[2] in repetidas
+        if linea and not saltar:
+            lineas.append(linea)
+    return propio + ("\n".join(lineas) + "\n" if lineas else "")
+
+
+def volcar(path):
+    """
+    Escribe `exponer()` en `path` de forma atómica. Así el productor, que
+    no sirve HTTP, publica sus métricas para que la API las incluya.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(exponer())
+    os.replace(tmp, path)
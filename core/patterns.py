@@ -0,0 +1,149 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Dirección que sugiere cada patrón (None = indecisión)
+PATRONES = {
+    "Doji": None,
+    "Martillo": "CALL",
+    "Shooting Star": "PUT",
+    "Bullish Engulfing": "CALL",
+    "Bearish Engulfing": "PUT",
+    "Harami Alcista": "CALL",
+    "Harami Bajista": "PUT",
+    "Morning Star": "CALL",
+    "Evening Star": "PUT",
+    "Three White Soldiers": "CALL",
+    "Three Black Crows": "PUT",
+}
+# Velas necesarias para evaluar cualquier patrón en la última posición
+VELAS_PATRON = 3
+
+# Pivotes: velas a cada lado y distancia máxima entre dos pivotes comparados
+PIVOTE_K = 3
+PIVOTE_DIST = 60
+
+
+def _prev(x, n=1):
+    """x desplazado n posiciones (NaN / False al principio)."""
+    out = np.empty_like(x)
+    relleno = False if x.dtype == bool else np.nan
+    out[:n] = relleno
+    out[n:] = x[:-n] if n else x
+    return out
+
+
+def _f(x):
+    return np.asarray(x, dtype=float)
+
+
+# ---------------- VELAS ----------------
+def patrones(o, h, l, c) -> dict:
+    """
+    Máscaras booleanas {nombre: array} de cada patrón de PATRONES sobre
+    toda la serie; la posición i indica que el patrón termina en la vela i.
+    """
+    o, h, l, c = _f(o), _f(h), _f(l), _f(c)
+    body = np.abs(c - o)
+    rango = h - l
+    sube, baja = c > o, c < o
+    lw = np.minimum(o, c) - l
+    uw = h - np.maximum(o, c)
+
+    o1, c1, body1 = _prev(o), _prev(c), _prev(body)
+    o2, c2, body2, rango2 = _prev(o, 2), _prev(c, 2), _prev(body, 2), _prev(rango, 2)
+    sube1, baja1 = _prev(sube), _prev(baja)
+    sube2, baja2 = _prev(sube, 2), _prev(baja, 2)
+
+    # Vela t-2 de cuerpo largo y t-1 pequeña (estrella)
+    larga2 = body2 > 0.6 * rango2
+    estrella1 = body1 < 0.3 * body2
+    medio2 = (o2 + c2) / 2
+
+    return {
+        "Doji": (rango > 0) & (body <= 0.1 * rango),
+        "Martillo": (lw > body * 2) & (uw < body * 0.5),
+        "Shooting Star": (uw > body * 2) & (lw < body * 0.5),
+        "Bullish Engulfing": sube & baja1,
+        "Bearish Engulfing": baja & sube1,
+        "Harami Alcista": baja1 & sube & (o >= c1) & (c <= o1) & (body < body1),
+        "Harami Bajista": sube1 & baja & (o <= c1) & (c >= o1) & (body < body1),
+        "Morning Star": baja2 & larga2 & estrella1 & sube & (c > medio2),
+        "Evening Star": sube2 & larga2 & estrella1 & baja & (c < medio2),
+        # En cripto la vela abre en el cierre anterior: "abre dentro del
+        # cuerpo previo" incluye ese cierre
+        "Three White Soldiers": (
+            sube & sube1 & sube2 & (c > c1) & (c1 > c2)
+            & (o > o1) & (o <= c1) & (o1 > o2) & (o1 <= c2)
+        ),
+        "Three Black Crows": (
+            baja & baja1 & baja2 & (c < c1) & (c1 < c2)
+            & (o < o1) & (o >= c1) & (o1 < o2) & (o1 >= c2)
+        ),
+    }
+
+
+# ---------------- DIVERGENCIAS ----------------
+def divergencias(c, osc, nombre) -> dict:
+    """
+    Divergencias de 3 velas (las de detectar_divergencias): el precio y el
+    oscilador `nombre` (RSI, MACD...) van en sentido contrario respecto a
+    dos velas atrás.
+    """
+    c, osc = _f(c), _f(osc)
+    c2, osc2 = _prev(c, 2), _prev(osc, 2)
+    return {
+        f"Divergencia {nombre} Alcista": (c < c2) & (osc > osc2),
+        f"Divergencia {nombre} Bajista": (c > c2) & (osc < osc2),
+    }
+
+
+def pivotes(x, k=PIVOTE_K, minimo=True):
+    """
+    Índices de pivotes: x[i] es el mínimo (o máximo) de x[i-k : i+k+1].
+    Un pivote en i solo se conoce al cerrar la vela i + k.
+    """
+    x = _f(x)
+    if len(x) < 2 * k + 1:
+        return np.empty(0, dtype=np.int64)
+    ventana = sliding_window_view(x, 2 * k + 1)
+    extremo = ventana.min(axis=1) if minimo else ventana.max(axis=1)
+    centro = x[k:len(x) - k]
+    return np.flatnonzero(centro == extremo) + k
+
+
+def divergencias_pivote(l, h, osc, nombre, k=PIVOTE_K, max_dist=PIVOTE_DIST) -> dict:
+    """
+    Divergencias entre dos pivotes consecutivos (swing): mínimo más bajo en
+    precio con mínimo más alto en el oscilador (alcista) y al revés en los
+    máximos (bajista). La máscara se marca en la vela que confirma el
+    segundo pivote (i + k), así no mira al futuro.
+    """
+    l, h, osc = _f(l), _f(h), _f(osc)
+    n = len(osc)
+    out = {}
+    for sufijo, precio, minimo in (("Alcista", l, True), ("Bajista", h, False)):
+        mask = np.zeros(n, dtype=bool)
+        p = pivotes(precio, k, minimo)
+        if len(p) >= 2:
+            a, b = p[:-1], p[1:]
+            if minimo:
+                ok = (precio[b] < precio[a]) & (osc[b] > osc[a])
+            else:
+                ok = (precio[b] > precio[a]) & (osc[b] < osc[a])
+            ok &= (b - a) <= max_dist
+            mask[b[ok] + k] = True
+        out[f"Divergencia {nombre} {sufijo} (pivote)"] = mask
+    return out
+
+
+# ---------------- CONSULTA ----------------
+def activos(mascaras: dict, i=-1):
+    """Nombres cuyas máscaras están activas en la posición i."""
+    return [nombre for nombre, m in mascaras.items() if len(m) and m[i]]
+
+
+def direccion(nombre):
+    """CALL/PUT de un patrón o divergencia (por su nombre)."""
+    if nombre in PATRONES:
+        return PATRONES[nombre]
+    return "CALL" if "Alcista" in nombre else "PUT"
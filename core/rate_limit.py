@@ -0,0 +1,192 @@
+import math
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+# Peso por minuto que admite cada exchange. Binance publica el suyo
+# (REQUEST_WEIGHT, 6000/min por IP) y devuelve el usado en cada respuesta;
+# Deriv no publica pesos: cada petición cuenta 1 con un límite prudente
+PESO_MINUTO = {"binance": 6000, "deriv": 120}
+# Parte del límite que se usa: deja sitio a las peticiones en vuelo
+MARGEN = 0.9
+# Segundos que espera una petición sin plazo (p. ej. el resolver) antes de descartarse
+ESPERA_MAX = 30
+# Bloqueo si un 429/418 no trae Retry-After (un 418 es un ban de la IP)
+BLOQUEO_429 = 60
+BLOQUEO_418 = 120
+
+CABECERA_PESO = "X-MBX-USED-WEIGHT-1M"
+
+ESPERA_LIMITE = metrics.histograma(
+    "binarias_limite_espera_seconds", "Espera por presupuesto de peso antes de cada petición",
+    ("exchange",),
+)
+PESO_USADO = metrics.medidor(
+    "binarias_limite_peso_usado", "Peso usado en el minuto según el exchange", ("exchange",),
+)
+DESCARTADAS = metrics.contador(
+    "binarias_limite_descartadas_total", "Peticiones descartadas por no caber antes de su plazo",
+    ("exchange",),
+)
+BLOQUEOS = metrics.contador(
+    "binarias_limite_bloqueos_total", "Respuestas 429/418 del exchange", ("exchange", "status"),
+)
+
+
+class PresupuestoAgotado(Exception):
+    """La petición no cabe en el presupuesto del exchange antes de su plazo."""
+
+
+def peso_klines(limit: int) -> int:
+    """Peso de GET /api/v3/klines en Binance según `limit`."""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+# ---------------- PLAZOS ----------------
+_contexto = threading.local()
+
+
+@contextmanager
+def plazo(limite):
+    """
+    Las peticiones hechas en este hilo dentro del bloque tienen prioridad
+    por `limite` (epoch en que su resultado deja de servir: la que antes
+    vence, antes sale) y se descartan si no caben antes de él.
+    """
+    previo = getattr(_contexto, "limite", None)
+    _contexto.limite = limite
+    try:
+        yield
+    finally:
+        _contexto.limite = previo
+
+
+class LimitadorPeso:
+    """
+    Presupuesto de peso por minuto de un exchange.
+
+    - Un token bucket de `peso_minuto * margen` reparte el peso a ritmo
+      constante (sin ráfagas que agoten el minuto en un segundo).
+    - El exchange cuenta por minuto de reloj: además del bucket, el peso
+      propio del minuto en curso no pasa de la capacidad, ni el que el
+      exchange dice llevar contado (`observar`, cabecera de cada respuesta,
+      que incluye a otros procesos con la misma IP) pasa del límite.
+    - Un 429/418 bloquea todas las peticiones durante Retry-After.
+    - Las peticiones esperan en cola por plazo (ver `plazo`); las que no
+      caben antes de su plazo se descartan con PresupuestoAgotado en vez de
+      gastar peso en datos que llegarían tarde.
+
+    `fraccion` reparte el ritmo entre procesos (workers) con la misma IP.
+    """
+
+    def __init__(self, nombre, peso_minuto, margen=MARGEN, fraccion=1.0, espera_max=ESPERA_MAX,
+                 reloj=time.time):
+        self.nombre = nombre
+        self.peso_minuto = peso_minuto
+        self.margen = margen
+        self.fraccion = fraccion
+        self.espera_max = espera_max
+        self.reloj = reloj
+
+        ahora = reloj()
+        self._tokens = self.capacidad
+        self._repuesto = ahora
+        self._minuto = int(ahora // 60)
+        self._usado = 0  # peso propio del minuto en curso
+        self._usado_exchange = 0  # el del exchange (cabecera) más el propio posterior
+        self._bloqueado_hasta = 0.0
+        self._cola = []  # heap de (prioridad, seq, limite)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def capacidad(self):
+        return self.peso_minuto * self.margen * self.fraccion
+
+    # ---------------- PRESUPUESTO ----------------
+    def _reponer(self, ahora):
+        self._tokens = min(
+            self.capacidad, self._tokens + (ahora - self._repuesto) * self.capacidad / 60
+        )
+        self._repuesto = ahora
+        if int(ahora // 60) != self._minuto:
+            self._minuto = int(ahora // 60)
+            self._usado = self._usado_exchange = 0
+
+    def _espera(self, peso, ahora):
+        """Segundos hasta que `peso` quepa (0 si cabe ya)."""
+        self._reponer(ahora)
+        if ahora < self._bloqueado_hasta:
+            return self._bloqueado_hasta - ahora
+        if (self._usado + peso > self.capacidad
+                or self._usado_exchange + peso > self.peso_minuto * self.margen):
+            return (self._minuto + 1) * 60 - ahora
+        if self._tokens < peso:
+            return (peso - self._tokens) * 60 / self.capacidad
+        return 0.0
+
+    def adquirir(self, peso=1):
+        """
+        Bloquea hasta poder gastar `peso`. Lanza PresupuestoAgotado si no
+        cabe antes del plazo del hilo (o de `espera_max` sin plazo).
+        """
+        inicio = self.reloj()
+        limite = getattr(_contexto, "limite", None)
+        # Sin plazo: detrás de todas las que lo tienen
+        ticket = (math.inf if limite is None else limite, next(self._seq),
+                  inicio + self.espera_max if limite is None else limite)
+        with self._cond:
+            heapq.heappush(self._cola, ticket)
+            self._cond.notify_all()
+            try:
+                while True:
+                    ahora = self.reloj()
+                    espera = self._espera(peso, ahora) if self._cola[0] is ticket else None
+                    if espera == 0.0:
+                        self._tokens -= peso
+                        self._usado += peso
+                        self._usado_exchange += peso
+                        break
+                    restante = ticket[2] - ahora
+                    if restante <= 0 or (espera is not None and espera > restante):
+                        DESCARTADAS.inc(self.nombre)
+                        raise PresupuestoAgotado(
+                            f"{self.nombre}: sin peso disponible antes del plazo"
+                            f" (faltan {espera or 0:.1f}s, plazo {max(restante, 0):.1f}s)"
+                        )
+                    self._cond.wait(restante if espera is None else espera)
+            finally:
+                self._cola.remove(ticket)
+                heapq.heapify(self._cola)
+                self._cond.notify_all()
+        ESPERA_LIMITE.observe(self.reloj() - inicio, self.nombre)
+
+    def observar(self, status, headers):
+        """Ajusta el presupuesto con la respuesta del exchange (status y cabeceras)."""
+        ahora = self.reloj()
+        usado = headers.get(CABECERA_PESO)
+        with self._cond:
+            self._reponer(ahora)
+            if usado is not None and usado.isdigit():
+                self._usado_exchange = max(self._usado_exchange, int(usado))
+                PESO_USADO.set(int(usado), self.nombre)
+            if status in (418, 429):
+                retry = headers.get("Retry-After")
+                bloqueo = (
+                    int(retry) if retry is not None and retry.isdigit()
+                    else BLOQUEO_418 if status == 418 else BLOQUEO_429
+                )
+                self._bloqueado_hasta = max(self._bloqueado_hasta, ahora + bloqueo)
+                BLOQUEOS.inc(self.nombre, str(status))
+                print(f"⛔ {self.nombre}: HTTP {status}, peticiones en pausa {bloqueo}s")
+            self._cond.notify_all()
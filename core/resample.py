@@ -0,0 +1,181 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from candle_store import VELA_COLS, VENTANAS, segundos_tf
+
+# Timeframe que se descarga (o llega por stream); el resto se deriva
+BASE = "1m"
+
+
+def agregar(ts, o, h, l, c, v, tf):
+    """Velas de 1m (ts en epoch) -> velas de `tf` segundos alineadas al epoch."""
+    if len(ts) == 0 or tf == 60:
+        return ts, o, h, l, c, v
+    grupo = ts // tf
+    inicios = np.flatnonzero(np.diff(grupo)) + 1
+    inicios = np.concatenate([[0], inicios])
+    finales = np.concatenate([inicios[1:], [len(ts)]]) - 1
+    return (
+        grupo[inicios] * tf,
+        o[inicios],
+        np.maximum.reduceat(h, inicios),
+        np.minimum.reduceat(l, inicios),
+        c[finales],
+        np.add.reduceat(v, inicios),
+    )
+
+
+def _arrays(df):
+    """DataFrame de velas -> (epochs int64, matriz n x 5 de OHLCV)."""
+    ts = df["timestamp"].to_numpy("datetime64[s]").astype(np.int64)
+    return ts, df[VELA_COLS[1:]].to_numpy(float)
+
+
+def _frame(ts, ohlcv, tipo):
+    """Inversa de `_arrays`, con la resolución de timestamp `tipo`."""
+    return pd.DataFrame({
+        "timestamp": pd.DatetimeIndex(ts.astype("datetime64[s]").astype(tipo)),
+        "open": ohlcv[:, 0],
+        "high": ohlcv[:, 1],
+        "low": ohlcv[:, 2],
+        "close": ohlcv[:, 3],
+        "volume": ohlcv[:, 4],
+    }, copy=False)
+
+
+def _grupos(ts, sec):
+    """(apertura de la primera vela completa, nº de velas) que `agregar` saca de `ts`."""
+    grupo = ts // sec
+    if ts[0] % sec:
+        grupo = grupo[grupo > grupo[0]]
+    if len(grupo) == 0:
+        return None, 0
+    return int(grupo[0]) * sec, int(np.count_nonzero(np.diff(grupo))) + 1
+
+
+class Remuestreador:
+    """
+    Deriva los timeframes mayores de una sola ventana de velas de 1m.
+
+    Todas las temporalidades de un símbolo salen de la misma foto de 1m
+    (`derivar`), así la validación multitimeframe compara velas que
+    coinciden en "ahora", y cada ciclo hace una descarga por símbolo en
+    vez de una por (símbolo, timeframe).
+
+    Los límites son los del exchange (múltiplos de la duración desde el
+    epoch UTC). El primer grupo se descarta si la ventana de 1m empieza a
+    mitad de vela; el último es la vela abierta, igual que en el exchange.
+
+    La ventana de 1m solo cubre `limit` minutos: cada timeframe guarda su
+    propia ventana de `limit` velas y las recién derivadas reemplazan todo
+    lo guardado desde su primera vela. La primera vez, o si desde la
+    última fusión pasó más de lo que cubre la ventana de 1m, hace falta una
+    semilla (una descarga directa de ese timeframe): `sin_semilla` dice
+    cuáles, el llamador las descarga fuera de aquí y se las pasa a
+    `derivar`. Un timeframe sin semilla se omite en ese ciclo.
+
+    `sin_volumen(symbol)` indica los símbolos cuyo volumen es solo un proxy
+    de 1.0 (Deriv): no se suma al agregar.
+    """
+
+    def __init__(self, limit=200, base=BASE, sin_volumen=None):
+        self.limit = limit
+        self.base = base
+        self.sin_volumen = sin_volumen
+        self._ventanas = {}  # (symbol, tf) -> DataFrame entregado
+        self._arrays = {}  # (symbol, tf) -> (epochs, ohlcv) para fusionar
+        self._lock = threading.Lock()
+
+    def _falta_semilla(self, symbol, interval, desde, n):
+        # Sin solape no se sabe qué pasó entre medias (y la última vela
+        # guardada pudo quedar a medias): se siembra de nuevo
+        if n >= self.limit:
+            return False
+        previo = self._arrays.get((symbol, interval))
+        return previo is None or previo[0][-1] < desde
+
+    def sin_semilla(self, symbol, df_base, timeframes):
+        """Timeframes de `timeframes` que necesitan semilla para derivarse de `df_base`."""
+        if df_base is None or df_base.empty:
+            return []
+        ts = df_base["timestamp"].to_numpy("datetime64[s]").astype(np.int64)
+        faltan = []
+        with self._lock:
+            for tf in timeframes:
+                if tf == self.base:
+                    continue
+                desde, n = _grupos(ts, segundos_tf(tf))
+                if desde is not None and self._falta_semilla(symbol, tf, desde, n):
+                    faltan.append(tf)
+        return faltan
+
+    def _derivar_tf(self, symbol, interval, ts, ohlcv, volumen, semilla):
+        sec = segundos_tf(interval)
+        t, o, h, l, c, v = agregar(ts, *ohlcv.T, sec)
+        if ts[0] % sec:
+            t, o, h, l, c, v = t[1:], o[1:], h[1:], l[1:], c[1:], v[1:]
+        if len(t) == 0:
+            return None
+        if not volumen:
+            v = np.ones(len(t))
+        nuevo = np.column_stack([o, h, l, c, v])
+
+        previo = None
+        if len(t) < self.limit:
+            previo = self._arrays.get((symbol, interval))
+        if self._falta_semilla(symbol, interval, t[0], len(t)):
+            if semilla is None or semilla.empty:
+                # Lo guardado ya no enlaza con la ventana de 1m: no sirve
+                self._arrays.pop((symbol, interval), None)
+                self._ventanas.pop((symbol, interval), None)
+                return None
+            VENTANAS.inc("semilla")
+            previo = _arrays(semilla)
+        if previo is not None:
+            corte = np.searchsorted(previo[0], t[0])
+            t = np.concatenate([previo[0][:corte], t])
+            nuevo = np.concatenate([previo[1][:corte], nuevo])
+        VENTANAS.inc("remuestreo")
+        return t[-self.limit:], nuevo[-self.limit:]
+
+    def derivar(self, symbol, df_base, timeframes, semillas=None):
+        """
+        {timeframe: DataFrame} derivados de `df_base` (velas de 1m).
+        `semillas` ({timeframe: DataFrame}) son las descargas de los que
+        `sin_semilla` pidió; los que falten quedan en None.
+        """
+        if df_base is None or df_base.empty:
+            return {tf: None for tf in timeframes}
+        tipo = df_base["timestamp"].dtype
+        ts, ohlcv = _arrays(df_base)
+        volumen = not (self.sin_volumen and self.sin_volumen(symbol))
+
+        frames = {}
+        with self._lock:
+            self._ventanas[(symbol, self.base)] = df_base
+            for tf in timeframes:
+                key = (symbol, tf)
+                if tf == self.base:
+                    frames[tf] = df_base.tail(self.limit)
+                    continue
+                semilla = (semillas or {}).get(tf)
+                ventana = self._derivar_tf(symbol, tf, ts, ohlcv, volumen, semilla)
+                if ventana is not None:
+                    self._arrays[key] = ventana
+                    self._ventanas[key] = _frame(*ventana, tipo)
+                frames[tf] = self._ventanas.get(key)
+        return frames
+
+    def olvidar(self, symbol):
+        """Descarta las ventanas de `symbol` (ya no lo procesa este proceso)."""
+        with self._lock:
+            for key in [k for k in self._ventanas if k[0] == symbol]:
+                self._ventanas.pop(key, None)
+                self._arrays.pop(key, None)
+
+    def ventana(self, symbol, interval):
+        """Última ventana derivada (None si aún no hay)."""
+        with self._lock:
+            return self._ventanas.get((symbol, interval))
@@ -0,0 +1,287 @@
+import os
+import csv
+import json
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+import signal_log
+from candle_store import segundos_tf
+
+# Columnas del log de resultados (una fila por señal resuelta)
+RESULTADO_COLS = [
+    "id",
+    "symbol",
+    "timeframe",
+    "direction",
+    "price",
+    "exit_price",
+    "expiry",
+    "result",
+    "resolved_at",
+]
+
+
+def _epochs(df):
+    return df["timestamp"].to_numpy().astype("datetime64[s]").astype(np.int64)
+
+
+def _cierres(df):
+    """{apertura (epoch): close} de un DataFrame de velas."""
+    if df is None or df.empty:
+        return {}, None
+    ts = _epochs(df)
+    return dict(zip(ts.tolist(), df["close"].astype(float).tolist())), int(ts[-1])
+
+
+# Segundos antes del cierre en que una señal aún cuenta como emitida en él
+# (strategy.py recalcula con OFFSET_CIERRE=-5; boot.py justo tras el cierre)
+ANTICIPO_EMISION = 30
+
+
+def vencimiento(row):
+    """
+    Epoch en que expira la señal. La señal se emite al cierre de una vela
+    (su `price` es ese cierre), aunque algunos productores lo hacen unos
+    segundos antes, y vence `duration_candles` velas después.
+    """
+    tf = segundos_tf(row["timeframe"])
+    ts = datetime.strptime(row["timestamp"], signal_log.TS_FMT).replace(tzinfo=timezone.utc)
+    entrada = (int(ts.timestamp()) + ANTICIPO_EMISION) // tf * tf
+    return entrada + max(1, int(row.get("duration_candles") or 1)) * tf
+
+
+def resultado(direction, entrada, salida):
+    if salida == entrada:
+        return "EMPATE"
+    gana = salida > entrada if direction == "CALL" else salida < entrada
+    return "WIN" if gana else "LOSS"
+
+
+class SignalResolver:
+    """
+    Resuelve por lotes las señales vencidas del log binario.
+
+    Sigue el log igual que la API (desde el último offset leído) y guarda
+    las señales pendientes con su vencimiento. En cada `resolver()` toma
+    todas las vencidas y busca el cierre de la vela de salida primero en
+    las ventanas ya descargadas (`velas_fn(symbol, interval)`, sin red) y,
+    para las que no estén, con una sola descarga de velas de 1m por símbolo
+    que cubre todo su rango (`fetch_fn`, la misma de CandleStore).
+
+    Los resultados se añaden a un CSV con el mismo id que usa la API
+    (inode-offset del registro), así se pueden unir con cada señal.
+
+    Tras cada ciclo se guarda en `<results_path>.estado` el offset del log
+    hasta el que todo está resuelto (el de la pendiente más antigua) y los
+    ids ya resueltos posteriores a él: al arrancar se sigue desde ahí en
+    vez de recorrer el log y el CSV de resultados completos. Sin estado
+    guardado, `desde` es el offset del log donde empezar (tras las señales
+    importadas del CSV antiguo, que no se resuelven).
+    """
+
+    def __init__(self, log_path, results_path, velas_fn=None, fetch_fn=None,
+                 max_espera=86400, pagina=1000, desde=None):
+        self.log_path = log_path
+        self.results_path = results_path
+        self.velas_fn = velas_fn
+        self.fetch_fn = fetch_fn
+        self.max_espera = max_espera
+        self.pagina = pagina
+
+        self.estado_path = results_path + ".estado"
+
+        self._pendientes = {}
+        self._inode = None
+        self._offset = len(signal_log.MAGIC)
+        self._guardado = None
+        self._resueltas = self._cargar_resueltas()
+        if self._guardado is None and desde is not None and os.path.exists(log_path):
+            # Se guarda ya: si se reinicia antes del primer ciclo no se
+            # vuelven a leer las importadas
+            self._inode, self._offset = os.stat(log_path).st_ino, desde
+            self._guardar_estado()
+
+    # ---------------- LOGS ----------------
+    def _cargar_resueltas(self):
+        if not os.path.exists(self.results_path):
+            with open(self.results_path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(RESULTADO_COLS)
+            return set()
+        try:
+            with open(self.estado_path, encoding="utf-8") as f:
+                estado = json.load(f)
+            self._inode, self._offset = int(estado["inode"]), int(estado["offset"])
+            self._guardado = (self._inode, self._offset, len(estado["resueltas"]))
+            return set(estado["resueltas"])
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            pass
+        # Sin estado guardado (primer arranque con esta versión): una vez
+        with open(self.results_path, newline="", encoding="utf-8") as f:
+            return {row["id"] for row in csv.DictReader(f) if row.get("id")}
+
+    def _guardar_estado(self):
+        """Guarda el offset resuelto y descarta los ids anteriores a él."""
+        if self._inode is None:
+            return
+        prefijo = f"{self._inode:x}-"
+
+        def offset_de(signal_id):
+            return int(signal_id.split("-")[1], 16)
+
+        desde = min((offset_de(i) for i in self._pendientes), default=self._offset)
+        self._resueltas = {
+            i for i in self._resueltas if i.startswith(prefijo) and offset_de(i) >= desde
+        }
+        estado = (self._inode, desde, len(self._resueltas))
+        if estado == self._guardado:
+            return
+        tmp = self.estado_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"inode": self._inode, "offset": desde,
+                       "resueltas": sorted(self._resueltas)}, f)
+        os.replace(tmp, self.estado_path)
+        self._guardado = estado
+
+    def _leer_log(self):
+        """Añade a pendientes las señales nuevas del log binario."""
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._inode = st.st_ino
+            self._offset = len(signal_log.MAGIC)
+        if st.st_size == self._offset:
+            return
+
+        with open(self.log_path, "rb") as f:
+            if f.read(len(signal_log.MAGIC)) != signal_log.MAGIC:
+                return
+            f.seek(self._offset)
+            filas, usados = signal_log.leer_registros(f.read(st.st_size - self._offset), self._offset)
+        self._offset += usados
+
+        for offset, row in filas:
+            signal_id = f"{self._inode:x}-{offset:x}"
+            if signal_id in self._resueltas:
+                continue
+            try:
+                row["expiry"] = vencimiento(row)
+            except (KeyError, ValueError) as e:
+                print(f"⚠️ Señal sin vencimiento calculable ({e}): {row}")
+                continue
+            self._pendientes[signal_id] = row
+
+    def _registrar(self, filas):
+        with open(self.results_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            for fila in filas:
+                writer.writerow([fila[c] for c in RESULTADO_COLS])
+
+    # ---------------- PRECIOS ----------------
+    def _desde_cache(self, symbol, grupo):
+        """Cierres de salida encontrados en las ventanas locales."""
+        precios = {}
+        for tf in {row["timeframe"] for _, row in grupo}:
+            cierres, ultima = _cierres(self.velas_fn(symbol, tf) if self.velas_fn else None)
+            sec = segundos_tf(tf)
+            for signal_id, row in grupo:
+                apertura = row["expiry"] - sec
+                # Solo si ya hay una vela posterior: la de salida estaba cerrada
+                if row["timeframe"] == tf and apertura in cierres and ultima >= row["expiry"]:
+                    precios[signal_id] = cierres[apertura]
+        return precios
+
+    def _descargar_rango(self, symbol, grupo):
+        """Una descarga de 1m por símbolo que cubre todos sus vencimientos."""
+        if self.fetch_fn is None:
+            return {}
+        desde = min(row["expiry"] for _, row in grupo) - 60
+        hasta = max(row["expiry"] for _, row in grupo)
+        cierres, ultima = {}, None
+        inicio = desde
+        while inicio <= hasta:
+            limit = min(self.pagina, (hasta - inicio) // 60 + 2)
+            df = self.fetch_fn(symbol, "1m", limit, start=inicio)
+            nuevos, fin = _cierres(df)
+            if fin is None:
+                break
+            cierres.update(nuevos)
+            ultima = fin if ultima is None else max(ultima, fin)
+            if fin < inicio:
+                break
+            inicio = fin + 60
+
+        return {
+            signal_id: cierres[row["expiry"] - 60]
+            for signal_id, row in grupo
+            if row["expiry"] - 60 in cierres and ultima >= row["expiry"]
+        }
+
+    # ---------------- CICLO ----------------
+    def resolver(self, ahora=None):
+        """Resuelve todas las señales vencidas. Devuelve las filas registradas."""
+        ahora = time.time() if ahora is None else ahora
+        self._leer_log()
+
+        por_simbolo = defaultdict(list)
+        for signal_id, row in self._pendientes.items():
+            if row["expiry"] <= ahora:
+                por_simbolo[row["symbol"]].append((signal_id, row))
+        if not por_simbolo:
+            self._guardar_estado()
+            return []
+
+        resueltas = []
+        resuelto_en = datetime.fromtimestamp(ahora, timezone.utc).strftime(signal_log.TS_FMT)
+        for symbol, grupo in por_simbolo.items():
+            try:
+                precios = self._desde_cache(symbol, grupo)
+                # Las que ya pasaron de max_espera (p. ej. tras una parada
+                # larga) no justifican una descarga: quedan SIN_DATOS
+                faltan = [
+                    (i, r) for i, r in grupo
+                    if i not in precios and ahora - r["expiry"] < self.max_espera
+                ]
+                if faltan:
+                    precios.update(self._descargar_rango(symbol, faltan))
+            except Exception as e:
+                print(f"⚠️ Error resolviendo señales de {symbol}: {e}")
+                precios = {}
+
+            for signal_id, row in grupo:
+                salida = precios.get(signal_id)
+                if salida is None:
+                    if ahora - row["expiry"] < self.max_espera:
+                        continue  # se reintenta en el próximo ciclo
+                    res = "SIN_DATOS"
+                else:
+                    res = resultado(row["direction"], float(row["price"]), salida)
+                resueltas.append({
+                    "id": signal_id,
+                    "symbol": symbol,
+                    "timeframe": row["timeframe"],
+                    "direction": row["direction"],
+                    "price": row["price"],
+                    "exit_price": "" if salida is None else round(salida, 6),
+                    "expiry": datetime.fromtimestamp(row["expiry"], timezone.utc)
+                    .strftime(signal_log.TS_FMT),
+                    "result": res,
+                    "resolved_at": resuelto_en,
+                })
+
+        if resueltas:
+            self._registrar(resueltas)
+            for fila in resueltas:
+                self._pendientes.pop(fila["id"], None)
+                self._resueltas.add(fila["id"])
+            conteo = defaultdict(int)
+            for fila in resueltas:
+                conteo[fila["result"]] += 1
+            resumen = " | ".join(f"{k}={v}" for k, v in sorted(conteo.items()))
+            print(f"🏁 {len(resueltas)} señales resueltas ({resumen})")
+        self._guardar_estado()
+        return resueltas
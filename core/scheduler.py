@@ -0,0 +1,63 @@
+import time
+from collections import deque
+
+from candle_store import segundos_tf
+
+
+class CandleScheduler:
+    """
+    Despierta al cierre de vela de cada timeframe en lugar de cada N segundos.
+
+    Los cierres están alineados al epoch UTC, igual que en Binance y Deriv
+    (las velas de 3m cierran en múltiplos de 180 s, las de 5m en múltiplos
+    de 300 s...). `offset` desplaza el despertar respecto al cierre: negativo
+    para actuar antes de que cierre la vela (p. ej. -5) y positivo para dar
+    margen a que el exchange publique la vela cerrada.
+
+    En cada despertar se llama a `job(timeframes, cierre)` solo con los
+    timeframes cuyo cierre toca, y se registra el desfase respecto al
+    instante objetivo.
+    """
+
+    def __init__(self, timeframes, offset=0.0, reloj=time.time, dormir=time.sleep,
+                 historial=100):
+        self.timeframes = list(timeframes)
+        self.offset = offset
+        self.reloj = reloj
+        self.dormir = dormir
+        self.desfases = deque(maxlen=historial)
+
+    def proximo(self, ahora=None):
+        """Devuelve (objetivo, timeframes, cierre) del próximo despertar."""
+        ahora = self.reloj() if ahora is None else ahora
+        cierres = {}
+        for tf in self.timeframes:
+            sec = segundos_tf(tf)
+            cierre = (int((ahora - self.offset) // sec) + 1) * sec
+            cierres.setdefault(cierre, []).append(tf)
+        cierre = min(cierres)
+        return cierre + self.offset, cierres[cierre], cierre
+
+    def esperar(self):
+        """Duerme hasta el próximo cierre. Devuelve (timeframes, cierre, desfase)."""
+        objetivo, tfs, cierre = self.proximo()
+        restante = objetivo - self.reloj()
+        if restante > 0:
+            self.dormir(restante)
+        desfase = self.reloj() - objetivo
+        self.desfases.append(desfase)
+        return tfs, cierre, desfase
+
+    def run(self, job, iteraciones=None):
+        n = 0
+        while iteraciones is None or n < iteraciones:
+            tfs, cierre, desfase = self.esperar()
+            hora = time.strftime("%H:%M:%S", time.gmtime(cierre))
+            print(f"⏰ Cierre {hora} [{', '.join(tfs)}] desfase {desfase * 1000:+.1f} ms")
+            inicio = self.reloj()
+            try:
+                job(tfs, cierre)
+            except Exception as e:
+                print("⚠️ Error en el ciclo programado:", e)
+            print(f"   ciclo completado en {self.reloj() - inicio:.2f}s")
+            n += 1
@@ -1,13 +1,13 @@
 import os
-import time
 import warnings
-import random
-from datetime import datetime, timedelta
+from datetime import datetime
 
 import pandas as pd
-import numpy as np
-import ta
-from binance.client import Client
+
+from binance_client import BinanceClient
+from indicator_engine import MotorIndicadores
+from scheduler import CandleScheduler
+from simulator import Simulador
 
 warnings.filterwarnings("ignore")
 
@@ -18,6 +18,14 @@ API_SECRET = "0lDJEwHWv7LyhgVj1gwZQxddwufSmz7P6pfB1cLIvtWqAVlVUb9ZmX9JKQobWiRP"
 ACTIVOS = ["BTCUSDT", "EURUSD", "ETHUSDT", "SOLUSDT", "GBPJPY"]
 TIMEFRAMES = ["3m", "5m"]
 LIMIT = 200
+# Segundos respecto al cierre de vela en que se recalcula (negativo = antes)
+OFFSET_CIERRE = 0
+
+# Mismos modos que boot.py: BINARIAS_OFFLINE=1 sin red (todo simulado);
+# BINARIAS_DEMO=1 usa velas simuladas cuando no hay reales. Por defecto el
+# símbolo espera al próximo cierre
+OFFLINE = os.environ.get("BINARIAS_OFFLINE") == "1"
+DEMO = os.environ.get("BINARIAS_DEMO") == "1"
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_CSV = os.path.join(BASE_DIR, "binary_signals_log_optimizado.csv")
@@ -33,14 +41,10 @@ if not os.path.exists(LOG_CSV):
     print("🆕 Archivo CSV creado automáticamente:", LOG_CSV)
 
 # ---------------- CLIENTE ----------------
-usar_binance = False
-client = None
-try:
-    client = Client(API_KEY, API_SECRET)
-    usar_binance = True
-    print("✅ Conectado a Binance.")
-except Exception:
-    print("⚠️ Modo DEMO: sin conexión Binance (se usan datos simulados).")
+# Se conecta en la primera petición
+client = BinanceClient(API_KEY, API_SECRET)
+# Mercado simulado de OFFLINE/DEMO (el de boot.py, misma BINARIAS_SEED)
+simulador = Simulador(int(os.environ.get("BINARIAS_SEED", "0")))
 
 
 # ---------------- FUNCIONES AUX ----------------
@@ -50,72 +54,65 @@ def now_utc():
 
 def safe_get_klines(symbol, interval, limit=200):
     """
-    Intenta obtener velas reales desde Binance.
-    Si falla (forex u otro), genera datos DEMO.
+    Intenta obtener velas reales desde Binance. Sin ellas (forex u otro
+    fallo) devuelve vacío y el símbolo espera al próximo cierre; solo con
+    BINARIAS_DEMO=1 se usan velas simuladas.
     """
-    if usar_binance:
-        try:
-            kl = client.get_klines(symbol=symbol, interval=interval, limit=limit)
-            df = pd.DataFrame(
-                kl,
-                columns=[
-                    "ts",
-                    "open",
-                    "high",
-                    "low",
-                    "close",
-                    "volume",
-                    "close_time",
-                    "qv",
-                    "nt",
-                    "tb",
-                    "tq",
-                    "i",
-                ],
-            )
-            df["timestamp"] = pd.to_datetime(df["ts"], unit="ms")
-            df[["open", "high", "low", "close", "volume"]] = df[
-                ["open", "high", "low", "close", "volume"]
-            ].astype(float)
+    if OFFLINE:
+        return simulador.klines(symbol, interval, limit)
+    try:
+        kl = client.get_klines(symbol=symbol, interval=interval, limit=limit)
+        df = pd.DataFrame(
+            kl,
+            columns=[
+                "ts",
+                "open",
+                "high",
+                "low",
+                "close",
+                "volume",
+                "close_time",
+                "qv",
+                "nt",
+                "tb",
+                "tq",
+                "i",
+            ],
+        )
+        df["timestamp"] = pd.to_datetime(df["ts"], unit="ms")
+        df[["open", "high", "low", "close", "volume"]] = df[
+            ["open", "high", "low", "close", "volume"]
+        ].astype(float)
+        if not df.empty:
             return df[["timestamp", "open", "high", "low", "close", "volume"]]
-        except Exception:
-            pass
+    except Exception as e:
+        print(f"⚠️ {symbol} {interval} sin velas reales: {e}")
 
-    # DEMO DATA (si no hay datos reales)
-    end = datetime.utcnow()
-    tf_min = int(interval[:-1])
-    times = [end - timedelta(minutes=i * tf_min) for i in range(limit)][::-1]
+    if not DEMO:
+        return pd.DataFrame()
+    print(f"⚠️ Usando datos DEMO para {symbol} {interval}")
+    return simulador.klines(symbol, interval, limit)
 
-    base = {"EURUSD": 1.08, "GBPJPY": 160.0}.get(
-        symbol, 30000 + random.uniform(-2000, 2000)
-    )
-    noise = np.random.normal(
-        0,
-        0.0005 if symbol in ["EURUSD", "GBPJPY"] else 0.002,
-        size=limit,
-    ).cumsum()
-    close = base * (1 + noise)
-    high = close * (1 + np.random.uniform(0.0002, 0.0015, size=limit))
-    low = close * (1 - np.random.uniform(0.0002, 0.0015, size=limit))
-    openp = close * (1 + np.random.uniform(-0.0008, 0.0008, size=limit))
-    volume = np.random.uniform(10, 1000, size=limit)
-
-    return pd.DataFrame(
-        {
-            "timestamp": times,
-            "open": openp,
-            "high": high,
-            "low": low,
-            "close": close,
-            "volume": volume,
-        }
-    )
+
+# Estado incremental de indicadores por (símbolo, timeframe)
+MOTORES = {}
+
+
+def motor_indicadores(symbol: str, timeframe: str) -> MotorIndicadores:
+    key = (symbol, timeframe)
+    if key not in MOTORES:
+        MOTORES[key] = MotorIndicadores()
+    return MOTORES[key]
 
 
 def add_indicators(df: pd.DataFrame) -> pd.DataFrame:
     """
     Añade EMAs, RSI, MACD, ADX, ATR, OBV, MOM, fuerza de vela, etc.
+    Versión de referencia (el ciclo usa MotorIndicadores): `ta` se importa
+    aquí para no cargarlo al arrancar.
     """
+    import ta
+
     df = df.copy()
 
     df["EMA9"] = ta.trend.ema_indicator(df["close"], 9)
@@ -390,20 +387,29 @@ def validar_multitimeframe(sig3, sig5):
 
 
 # ---------------- LÓGICA PRINCIPAL ----------------
-def update_signals():
+# Última señal por (símbolo, timeframe): cuando solo cierra una de las
+# temporalidades la otra se valida con su última señal
+ULTIMAS_SENALES = {}
+
+
+def update_signals(timeframes=None):
+    """Recalcula solo los `timeframes` cuyo cierre tocó (todos si None)."""
     for sym in ACTIVOS:
         try:
             senales = {}
 
-            # 1) construir señales por timeframe
-            for tf in TIMEFRAMES:
+            # 1) construir señales de los timeframes que cerraron
+            for tf in timeframes or TIMEFRAMES:
                 df_raw = safe_get_klines(sym, tf, LIMIT)
-                df_ind = add_indicators(df_raw)
+                if df_raw.empty:
+                    continue  # sin velas reales: se espera al próximo cierre
+                df_ind = motor_indicadores(sym, tf).actualizar(df_raw)
                 senal = construir_senal(df_ind, sym, tf)
                 senales[tf] = senal
+                ULTIMAS_SENALES[(sym, tf)] = senal
 
-            sig3 = senales.get("3m")
-            sig5 = senales.get("5m")
+            sig3 = ULTIMAS_SENALES.get((sym, "3m"))
+            sig5 = ULTIMAS_SENALES.get((sym, "5m"))
 
             # 2) validación multi-timeframe
             valid = validar_multitimeframe(sig3, sig5)
@@ -413,12 +419,10 @@ def update_signals():
                 )
                 continue
 
-            sig3, sig5 = valid
-            sig3["mtf_ok"] = True
-            sig5["mtf_ok"] = True
-
-            # 3) Loguear ambas señales (3m y 5m) alineadas
-            filas_log = [sig3, sig5]
+            # 3) Loguear solo las señales nuevas de este cierre
+            filas_log = [sig for sig in valid if sig is senales.get(sig["timeframe"])]
+            for sig in filas_log:
+                sig["mtf_ok"] = True
 
             with open(LOG_CSV, "a", newline="", encoding="utf-8") as f:
                 for row in filas_log:
@@ -444,7 +448,7 @@ def update_signals():
 # ---------------- LOOP PRINCIPAL ----------------
 if __name__ == "__main__":
     print("🚀 Iniciando sistema BINARIAS (optimizado MTF + divergencias + volumen)...")
-    while True:
-        update_signals()
-        # Ajusta este tiempo según qué tan frecuente quieras recalcular
-        time.sleep(20)
+    # Recalcula al cierre de cada vela de 3m/5m
+    CandleScheduler(TIMEFRAMES, offset=OFFSET_CIERRE).run(
+        lambda tfs, cierre: update_signals(tfs)
+    )
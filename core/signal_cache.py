@@ -0,0 +1,264 @@
+import os
+import csv
+import threading
+from collections import deque
+
+import metrics
+import signal_log
+
+FILAS_LEIDAS = metrics.contador(
+    "binarias_cache_filas_leidas_total", "Filas decodificadas al seguir los logs", ("log",),
+)
+
+
+class SignalCache:
+    """
+    Caché en memoria de las últimas señales del log CSV.
+
+    Mantiene un buffer circular con las `maxlen` filas más recientes y
+    sigue el archivo desde el último offset leído, de modo que cada
+    refresco solo parsea las líneas nuevas. La carga inicial lee el
+    archivo desde el final hacia atrás, así que el coste no depende del
+    tamaño total del log. Si el archivo se trunca o se rota (cambia el
+    inode), el caché se reconstruye desde cero.
+
+    Cada fila se identifica por el offset en bytes donde empieza su línea
+    (campo `id`, "inode-offset" en hexadecimal).
+    """
+
+    # Etiqueta de FILAS_LEIDAS
+    LOG = "senales"
+
+    def __init__(self, path, maxlen=200, block_size=64 * 1024):
+        self.path = path
+        self.maxlen = maxlen
+        self.block_size = block_size
+        self.version = 0
+
+        self._rows = deque(maxlen=maxlen)
+        self._columns = None
+        self._header_end = 0
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.Lock()
+
+    # ---------------- LECTURA ----------------
+    def _reset(self):
+        self._rows.clear()
+        self._columns = None
+        self._header_end = 0
+        self._offset = 0
+        self._inode = None
+        self.version += 1
+
+    def _id(self, offset):
+        return f"{self._inode or 0:x}-{offset:x}"
+
+    def _parse(self, data: bytes, base_offset: int):
+        """Convierte bytes con líneas completas en (offset, dict)."""
+        filas = []
+        pos = base_offset
+        for raw in data.split(b"\n"):
+            inicio = pos
+            pos += len(raw) + 1
+            line = raw.decode("utf-8", errors="replace").rstrip("\r")
+            if not line:
+                continue
+            values = next(csv.reader([line]))
+            if len(values) != len(self._columns):
+                continue  # línea corrupta o de otro formato
+            filas.append((inicio, dict(zip(self._columns, values))))
+        return filas
+
+    def _read_header(self, f):
+        f.seek(0)
+        header = f.readline()
+        if not header.endswith(b"\n"):
+            return False
+        self._columns = next(csv.reader([header.decode("utf-8").strip()]))
+        self._header_end = len(header)
+        return True
+
+    def _load_tail(self, f, size):
+        """Lee hacia atrás solo los bloques necesarios para `maxlen` filas."""
+        end = size
+        pos = size
+        buf = b""
+        while pos > self._header_end and buf.count(b"\n") <= self.maxlen:
+            step = min(self.block_size, pos - self._header_end)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+
+        # Descartar la línea parcial final (el productor aún la escribe)
+        last_nl = buf.rfind(b"\n")
+        if last_nl < 0:
+            self._offset = self._header_end
+            return []
+        complete = buf[: last_nl + 1]
+        end = pos + len(complete)
+
+        # Si no llegamos al encabezado, la primera línea puede estar cortada
+        if pos > self._header_end:
+            first_nl = complete.find(b"\n")
+            pos += first_nl + 1
+            complete = complete[first_nl + 1:]
+
+        self._offset = end
+        return self._parse(complete[:-1], pos)
+
+    def _load_new(self, f, size):
+        """Lee desde el último offset hasta el final del archivo."""
+        f.seek(self._offset)
+        data = f.read(size - self._offset)
+        last_nl = data.rfind(b"\n")
+        if last_nl < 0:
+            return []
+        complete = data[:last_nl]
+        base = self._offset
+        self._offset += last_nl + 1
+        return self._parse(complete, base)
+
+    def refresh(self):
+        """Incorpora las líneas nuevas del log. Devuelve las filas añadidas."""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                if self._inode is not None:
+                    self._reset()
+                return []
+
+            # Rotación (nuevo archivo) o truncado
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                if self._inode is not None:
+                    self._reset()
+
+            if self._inode is not None and st.st_size == self._offset:
+                return []
+
+            with open(self.path, "rb") as f:
+                if self._columns is None:
+                    if not self._read_header(f):
+                        return []
+                    self._inode = st.st_ino
+                    nuevas = self._load_tail(f, st.st_size)
+                else:
+                    nuevas = self._load_new(f, st.st_size)
+
+            if nuevas:
+                FILAS_LEIDAS.inc(self.LOG, n=len(nuevas))
+                self._agregar(nuevas)
+                self.version += 1
+            return nuevas
+
+    def _agregar(self, nuevas):
+        for offset, row in nuevas:
+            row["id"] = self._id(offset)
+        self._rows.extend(nuevas)
+
+    # ---------------- CONSULTA ----------------
+    def latest(self, limit=None):
+        """Devuelve las filas más recientes primero (como dicts)."""
+        return self.snapshot(limit)[1]
+
+    def snapshot(self, limit=None):
+        """
+        Devuelve (clave, filas) de forma atómica. La clave combina inode y
+        offset leído, así que identifica el contenido del log incluso entre
+        reinicios del proceso (sirve como ETag).
+        """
+        self.refresh()
+        with self._lock:
+            key = self._id(self._offset)
+            rows = [row for _, row in reversed(self._rows)]
+        return key, (rows if limit is None else rows[:limit])
+
+    def since(self, last_id=None):
+        """
+        Devuelve [(id, fila)] posteriores a `last_id`, de la más antigua a la
+        más reciente. Si `last_id` pertenece a otro archivo (rotación) o no
+        es válido, se devuelve todo el buffer.
+        """
+        with self._lock:
+            try:
+                inode, offset = (int(x, 16) for x in str(last_id).split("-"))
+            except ValueError:
+                inode, offset = None, -1
+            if inode != self._inode:
+                offset = -1
+            return [(self._id(o), row) for o, row in self._rows if o > offset]
+
+    @property
+    def last_id(self):
+        """Id de la fila más reciente del buffer (None si está vacío)."""
+        with self._lock:
+            return self._id(self._rows[-1][0]) if self._rows else None
+
+
+class BinarySignalCache(SignalCache):
+    """
+    Igual que SignalCache pero sobre el log binario de signal_log: la carga
+    inicial usa el largo al final de cada registro para leer hacia atrás y
+    el seguimiento solo decodifica los registros completos nuevos.
+    """
+
+    def _read_header(self, f):
+        f.seek(0)
+        if f.read(len(signal_log.MAGIC)) != signal_log.MAGIC:
+            return False
+        self._columns = signal_log.COLUMNAS
+        self._header_end = len(signal_log.MAGIC)
+        return True
+
+    def _load_tail(self, f, size):
+        # Si el productor está escribiendo un lote, se ignora lo incompleto
+        fin = signal_log.fin_valido(self.path)
+        self._offset = fin
+        return signal_log.leer_ultimos(f, fin, self.maxlen, self._header_end)
+
+    def _load_new(self, f, size):
+        f.seek(self._offset)
+        filas, usados = signal_log.leer_registros(f.read(size - self._offset), self._offset)
+        self._offset += usados
+        return filas
+
+
+class ResultCache(SignalCache):
+    """
+    Resultados de señales (log CSV de resolver.py) indexados por id de
+    señal. Sigue el archivo igual que SignalCache: la carga inicial lee
+    solo el final del archivo y se guardan los `maxlen` resultados más
+    recientes (los de señales más antiguas se descartan al llegar nuevos).
+    Se reconstruye si el archivo se trunca o se rota.
+    """
+
+    LOG = "resultados"
+
+    def __init__(self, path, maxlen=10000, block_size=64 * 1024):
+        super().__init__(path, maxlen, block_size)
+        self._por_id = {}
+
+    def _reset(self):
+        super()._reset()
+        self._por_id.clear()
+
+    def _agregar(self, nuevas):
+        # Aquí `id` es la columna del CSV (el id de la señal resuelta)
+        for offset, row in nuevas:
+            if len(self._rows) == self.maxlen:
+                _, vieja = self._rows.popleft()
+                if self._por_id.get(vieja.get("id")) is vieja:
+                    del self._por_id[vieja["id"]]
+            self._rows.append((offset, row))
+            self._por_id[row.get("id")] = row
+
+    def key(self):
+        """Versión del log de resultados (para el ETag de /signals)."""
+        self.refresh()
+        with self._lock:
+            return self._id(self._offset)
+
+    def get(self, signal_id):
+        with self._lock:
+            return self._por_id.get(signal_id)
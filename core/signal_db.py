@@ -0,0 +1,208 @@
+import os
+import time
+import sqlite3
+import calendar
+import threading
+
+import metrics
+import signal_log
+
+# Tipos de SQLite para cada tipo del SCHEMA del log binario
+_TIPOS = {"str": "TEXT", "ts": "TEXT", "f64": "REAL", "i32": "INTEGER", "bool": "INTEGER"}
+
+COLUMNAS = ["id"] + signal_log.COLUMNAS
+ESQUEMA = [
+    f"""CREATE TABLE IF NOT EXISTS signals (
+        seq INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE,
+        ts INTEGER NOT NULL,
+        {", ".join(f"{name} {_TIPOS[tipo]}" for name, tipo in signal_log.SCHEMA)}
+    )""",
+    # (symbol, timeframe, ts) para los filtros habituales; ts solo para el
+    # listado general y `since`. `seq` desempata en la paginación.
+    "CREATE INDEX IF NOT EXISTS signals_sym_tf_ts ON signals (symbol, timeframe, ts, seq)",
+    "CREATE INDEX IF NOT EXISTS signals_sym_ts ON signals (symbol, ts, seq)",
+    "CREATE INDEX IF NOT EXISTS signals_ts ON signals (ts, seq)",
+    "CREATE TABLE IF NOT EXISTS estado (clave TEXT PRIMARY KEY, valor INTEGER)",
+]
+
+# Lectura del log por tramos al importar (la primera vez puede ser grande)
+TRAMO = 8 * 1024 * 1024
+
+DURACION_SYNC = metrics.histograma(
+    "binarias_db_sincronizar_seconds", "Duración de la importación de señales nuevas a SQLite",
+)
+FILAS_DB = metrics.contador(
+    "binarias_db_filas_total", "Señales insertadas en SQLite",
+)
+
+
+def cursor_de(ts, seq):
+    """Cursor opaco para la paginación por clave (ts, seq)."""
+    return f"{ts}:{seq}"
+
+
+def leer_cursor(cursor):
+    try:
+        ts, seq = (int(x) for x in str(cursor).split(":"))
+    except ValueError:
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+    return ts, seq
+
+
+class SignalDB:
+    """
+    Índice de señales en SQLite (modo WAL) para las consultas filtradas de
+    la API.
+
+    El log binario sigue siendo la fuente de verdad: `sincronizar` importa
+    los registros nuevos desde el último offset guardado en la tabla
+    `estado`, en una sola transacción por lote. El productor lo llama tras
+    cada fsync del log, así que si se cae entre las dos escrituras la
+    siguiente sincronización recupera lo que falte. El id de cada señal es
+    el mismo que usa la API (inode-offset del registro).
+
+    Con `solo_lectura=True` cada hilo abre su propia conexión de solo
+    lectura; en WAL los lectores no bloquean al productor ni al revés.
+    """
+
+    def __init__(self, path, solo_lectura=False):
+        self.path = path
+        self.solo_lectura = solo_lectura
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conn = None
+        if not solo_lectura:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # En WAL, NORMAL solo arriesga la última transacción ante un corte
+            # de luz; el log binario ya está en disco y se reimporta
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for sql in ESQUEMA:
+                self._conn.execute(sql)
+
+    # ---------------- CONEXIONES ----------------
+    def _lectura(self):
+        if not self.solo_lectura:
+            return self._conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(self.path)
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=1000")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ---------------- ESCRITURA ----------------
+    def _estado(self):
+        filas = dict(self._conn.execute("SELECT clave, valor FROM estado"))
+        return filas.get("inode"), filas.get("offset", len(signal_log.MAGIC))
+
+    def sincronizar(self, log_path):
+        """Importa las señales nuevas del log binario. Devuelve cuántas."""
+        t0 = time.perf_counter()
+        with self._lock:
+            try:
+                st = os.stat(log_path)
+            except FileNotFoundError:
+                return 0
+            inode, offset = self._estado()
+            # Log rotado o truncado: se importa el nuevo desde el principio
+            # (las filas anteriores se conservan, su id lleva el otro inode)
+            if inode != st.st_ino or st.st_size < offset:
+                inode, offset = st.st_ino, len(signal_log.MAGIC)
+            if st.st_size == offset:
+                return 0
+
+            total = 0
+            with open(log_path, "rb") as f:
+                if f.read(len(signal_log.MAGIC)) != signal_log.MAGIC:
+                    return 0
+                while offset < st.st_size:
+                    f.seek(offset)
+                    filas, usados = signal_log.leer_registros(
+                        f.read(min(TRAMO, st.st_size - offset)), offset
+                    )
+                    if not usados:
+                        break  # registro incompleto: el escritor aún no terminó
+                    self._insertar(inode, filas, offset + usados)
+                    offset += usados
+                    total += len(filas)
+
+        if total:
+            FILAS_DB.inc(n=total)
+            DURACION_SYNC.observe(time.perf_counter() - t0)
+        return total
+
+    def _insertar(self, inode, filas, offset):
+        valores = []
+        for pos, row in filas:
+            ts = calendar.timegm(time.strptime(row["timestamp"], signal_log.TS_FMT))
+            valores.append([f"{inode:x}-{pos:x}", ts] + [row.get(c) for c in signal_log.COLUMNAS])
+
+        marcas = ", ".join("?" * (len(COLUMNAS) + 1))
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO signals (id, ts, {', '.join(signal_log.COLUMNAS)}) "
+                f"VALUES ({marcas})",
+                valores,
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO estado (clave, valor) VALUES (?, ?)",
+                [("inode", inode), ("offset", offset)],
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    # ---------------- CONSULTA ----------------
+    def version(self):
+        """Última señal importada (cambia con cada lote; sirve para el ETag)."""
+        fila = self._lectura().execute("SELECT max(seq) FROM signals").fetchone()
+        return fila[0] or 0
+
+    def consultar(self, symbol=None, timeframe=None, min_confidence=None, since=None,
+                  cursor=None, limit=50):
+        """
+        Señales de la más reciente a la más antigua que cumplen los filtros.
+        `since` es un epoch; `cursor` el `next_cursor` de la página anterior.
+        Devuelve (filas, next_cursor); next_cursor es None en la última página.
+        """
+        where, args = [], []
+        if symbol:
+            where.append("symbol = ?")
+            args.append(symbol)
+        if timeframe:
+            where.append("timeframe = ?")
+            args.append(timeframe)
+        if min_confidence is not None:
+            where.append("confidence_pct >= ?")
+            args.append(float(min_confidence))
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(int(since))
+        if cursor:
+            where.append("(ts, seq) < (?, ?)")
+            args.extend(leer_cursor(cursor))
+
+        sql = (
+            f"SELECT seq, ts, {', '.join(COLUMNAS)} FROM signals"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + " ORDER BY ts DESC, seq DESC LIMIT ?"
+        )
+        cur = self._lectura().execute(sql, args + [int(limit) + 1])
+        filas = cur.fetchall()
+
+        siguiente = None
+        if len(filas) > limit:
+            filas = filas[:limit]
+            siguiente = cursor_de(filas[-1][1], filas[-1][0])
+        return [dict(zip(COLUMNAS, fila[2:])) for fila in filas], siguiente
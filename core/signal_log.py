@@ -0,0 +1,473 @@
+import os
+import csv
+import time
+import struct
+import zlib
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+
+import metrics
+
+# ---------------- FORMATO ----------------
+# Archivo: MAGIC + registros. Cada registro:
+#   u32 largo | u32 crc32(payload) | payload | u32 largo
+# El largo repetido al final permite leer el log de atrás hacia delante
+# (últimas N señales sin recorrer el archivo) y el CRC detecta escrituras
+# a medias tras una caída.
+MAGIC = b"BSIGLOG1\n"
+CABECERA = struct.Struct("<II")
+COLA = struct.Struct("<I")
+MARCO = CABECERA.size + COLA.size
+
+# Campos tipados, en el mismo orden que las columnas del CSV
+SCHEMA = [
+    ("timestamp", "ts"),
+    ("symbol", "str"),
+    ("timeframe", "str"),
+    ("direction", "str"),
+    ("confidence_label", "str"),
+    ("confidence_pct", "f64"),
+    ("confidence_display", "str"),
+    ("score", "i32"),
+    ("patterns", "str"),
+    ("divergences", "str"),
+    ("trend", "str"),
+    ("price", "f64"),
+    ("duration_candles", "i32"),
+    ("duration_minutes", "i32"),
+    ("mtf_ok", "bool"),
+]
+COLUMNAS = [name for name, _ in SCHEMA]
+
+_FIJOS = {"ts": struct.Struct("<q"), "f64": struct.Struct("<d"),
+          "i32": struct.Struct("<i"), "bool": struct.Struct("<?")}
+_LARGO_STR = struct.Struct("<H")
+TS_FMT = "%Y-%m-%d %H:%M:%S"
+
+# Un lote = una escritura + fsync (y la réplica CSV si está activa)
+DURACION_LOTE = metrics.histograma(
+    "binarias_log_escritura_seconds", "Duración de la escritura de un lote del log de señales",
+)
+FILAS_ESCRITAS = metrics.contador(
+    "binarias_log_filas_total", "Señales escritas en el log binario",
+)
+ERRORES_LOTE = metrics.contador(
+    "binarias_log_errores_total", "Escrituras de lotes del log de señales fallidas (se reintentan)",
+)
+FILAS_DESCARTADAS = metrics.contador(
+    "binarias_log_descartadas_total", "Señales perdidas al cerrar el log con el disco fallando",
+)
+
+# Reintentos de un lote fallido: espera inicial y máxima (segundos) y
+# cuántos se hacen como mucho una vez pedido el cierre
+REINTENTO_INICIAL = 0.1
+REINTENTO_MAX = 5.0
+REINTENTOS_AL_CERRAR = 3
+# Offsets revisados por paso al buscar el siguiente registro íntegro
+BLOQUE_RESYNC = 1 << 16
+
+
+def encode_record(row: dict) -> bytes:
+    partes = []
+    for name, tipo in SCHEMA:
+        value = row.get(name)
+        if tipo == "str":
+            raw = str(value if value is not None else "").encode("utf-8")[:65535]
+            partes.append(_LARGO_STR.pack(len(raw)))
+            partes.append(raw)
+        elif tipo == "ts":
+            ts = datetime.strptime(str(value), TS_FMT).replace(tzinfo=timezone.utc)
+            partes.append(_FIJOS["ts"].pack(int(ts.timestamp())))
+        elif tipo == "f64":
+            partes.append(_FIJOS["f64"].pack(float(value if value is not None else "nan")))
+        elif tipo == "i32":
+            partes.append(_FIJOS["i32"].pack(int(value or 0)))
+        else:
+            partes.append(_FIJOS["bool"].pack(value in (True, "True")))
+    payload = b"".join(partes)
+    return CABECERA.pack(len(payload), zlib.crc32(payload)) + payload + COLA.pack(len(payload))
+
+
+def decode_record(payload: bytes) -> dict:
+    row = {}
+    pos = 0
+    for name, tipo in SCHEMA:
+        if tipo == "str":
+            (n,) = _LARGO_STR.unpack_from(payload, pos)
+            pos += _LARGO_STR.size
+            row[name] = payload[pos:pos + n].decode("utf-8", errors="replace")
+            pos += n
+        else:
+            fmt = _FIJOS[tipo]
+            (value,) = fmt.unpack_from(payload, pos)
+            pos += fmt.size
+            if tipo == "ts":
+                value = datetime.fromtimestamp(value, timezone.utc).strftime(TS_FMT)
+            row[name] = value
+    return row
+
+
+# Offsets corruptos ya avisados (los lectores que siguen el log releen
+# desde el mismo punto en cada refresco)
+_corruptos_avisados = set()
+
+
+def _registro_valido(data: bytes, pos: int) -> bool:
+    """Hay un registro completo e íntegro (largos y CRC) en `pos`."""
+    if pos + MARCO > len(data):
+        return False
+    largo, crc = CABECERA.unpack_from(data, pos)
+    fin = pos + CABECERA.size + largo + COLA.size
+    if fin > len(data) or COLA.unpack_from(data, fin - COLA.size)[0] != largo:
+        return False
+    return zlib.crc32(data[pos + CABECERA.size:fin - COLA.size]) == crc
+
+
+def _resincronizar(data: bytes, pos: int):
+    """
+    Primer offset tras `pos` donde empieza un registro íntegro (None si no
+    hay). Por bloques, se buscan con numpy los offsets cuyo largo de
+    cabecera coincide con el de su cola; el CRC solo se calcula en esos.
+    """
+    ultimo = len(data) - MARCO
+    if ultimo <= pos:
+        return None
+    # u32 little-endian que empieza en cada byte (vista sin copia)
+    u32 = np.ndarray((len(data) - 3,), dtype="<u4", buffer=data, strides=(1,))
+    for inicio in range(pos + 1, ultimo + 1, BLOQUE_RESYNC):
+        candidatos = np.arange(inicio, min(inicio + BLOQUE_RESYNC, ultimo + 1))
+        largos = u32[candidatos]
+        colas = candidatos + CABECERA.size + largos
+        cabe = colas <= len(data) - COLA.size
+        candidatos, largos, colas = candidatos[cabe], largos[cabe], colas[cabe]
+        for candidato in candidatos[u32[colas] == largos]:
+            if _registro_valido(data, int(candidato)):
+                return int(candidato)
+    return None
+
+
+def leer_registros(data: bytes, base_offset: int):
+    """
+    Decodifica los registros completos de `data`, que empieza en
+    `base_offset` del archivo. Devuelve ([(offset, fila)], bytes_consumidos).
+    Un registro incompleto al final queda sin consumir.
+
+    Si el largo de un registro no coincide con su cola no se puede saber
+    dónde acaba: se avisa y la lectura sigue en el siguiente registro
+    íntegro; si no hay ninguno se detiene en el corrupto (sin consumirlo).
+    """
+    filas = []
+    pos = 0
+    while pos + MARCO <= len(data):
+        largo, crc = CABECERA.unpack_from(data, pos)
+        fin = pos + CABECERA.size + largo + COLA.size
+        (cola,) = COLA.unpack_from(data, fin - COLA.size) if fin <= len(data) else (largo,)
+        if cola != largo:
+            siguiente = _resincronizar(data, pos)
+            if base_offset + pos not in _corruptos_avisados:
+                _corruptos_avisados.add(base_offset + pos)
+                destino = "" if siguiente is None else f", se sigue en {base_offset + siguiente}"
+                print(f"⚠️ Log de señales corrupto en offset {base_offset + pos}{destino}")
+            if siguiente is None:
+                break
+            pos = siguiente
+            continue
+        if fin > len(data):
+            break
+        payload = data[pos + CABECERA.size:fin - COLA.size]
+        if zlib.crc32(payload) == crc:
+            filas.append((base_offset + pos, decode_record(payload)))
+        pos = fin
+    return filas, pos
+
+
+def leer_ultimos(f, size, n, inicio=len(MAGIC)):
+    """Lee los últimos `n` registros recorriendo el archivo hacia atrás."""
+    filas = []
+    fin = size
+    while fin - COLA.size >= inicio and len(filas) < n:
+        f.seek(fin - COLA.size)
+        (largo,) = COLA.unpack(f.read(COLA.size))
+        pos = fin - MARCO - largo
+        if pos < inicio:
+            break
+        f.seek(pos)
+        bloque = f.read(fin - pos)
+        leidas, usados = leer_registros(bloque, pos)
+        if usados != len(bloque) or not leidas:
+            break
+        filas.append(leidas[0])
+        fin = pos
+    filas.reverse()
+    return filas
+
+
+def fin_valido(path) -> int:
+    """Offset tras el último registro íntegro (para truncar escrituras a medias)."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es un log de señales")
+        # Caso normal: el último registro está completo
+        if size >= len(MAGIC) + MARCO:
+            f.seek(size - COLA.size)
+            (largo,) = COLA.unpack(f.read(COLA.size))
+            pos = size - MARCO - largo
+            if pos >= len(MAGIC):
+                f.seek(pos)
+                _, usados = leer_registros(f.read(size - pos), pos)
+                if usados == size - pos:
+                    return size
+        elif size == len(MAGIC):
+            return size
+        # Tras una caída: recorrer desde el inicio
+        f.seek(len(MAGIC))
+        _, usados = leer_registros(f.read(), len(MAGIC))
+        return len(MAGIC) + usados
+
+
+# ---------------- ESCRITOR ----------------
+class SignalLogWriter:
+    """
+    Escritor del log binario de señales con commit agrupado.
+
+    `append` solo encola la fila. Un hilo dedicado junta lo que llegue en
+    `max_delay` segundos (o hasta `max_batch` filas) y lo escribe de una vez
+    con un único fsync. Opcionalmente replica las filas en el CSV de
+    siempre (sin fsync) para las herramientas que aún lo leen y las importa
+    en el índice SQLite de signal_db (`db_path`) tras cada lote.
+    """
+
+    def __init__(self, path, csv_path=None, max_batch=256, max_delay=0.2, db_path=None):
+        self.path = path
+        self.csv_path = csv_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self._cola = deque()
+        self._cond = threading.Condition()
+        self._encoladas = 0
+        self._escritas = 0
+        self._descartadas = 0
+        self._cerrado = False
+        self.lotes = 0
+        # Offset tras las señales importadas del CSV (solo si se creó el log)
+        self.fin_importacion = None
+
+        self._f = self._abrir()
+        # Fin del último lote con fsync: ahí se trunca si falla una escritura
+        self._fin = os.path.getsize(self.path)
+        self._db = None
+        if db_path:
+            from signal_db import SignalDB
+
+            self._db = SignalDB(db_path)
+        self._hilo = threading.Thread(target=self._run, name="signal-log", daemon=True)
+        self._hilo.start()
+
+    def _abrir(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            # Log nuevo: arranca con las señales que ya tenga el CSV
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(MAGIC)
+                if self.csv_path and os.path.exists(self.csv_path):
+                    n = importar_csv(self.csv_path, f)
+                    if n:
+                        print(f"📥 {n} señales importadas de {self.csv_path} al log binario")
+                self.fin_importacion = f.tell()
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        else:
+            fin = fin_valido(self.path)
+            if fin != os.path.getsize(self.path):
+                print(f"⚠️ Log de señales: se descartan bytes incompletos tras {fin}")
+                os.truncate(self.path, fin)
+        return open(self.path, "ab")
+
+    def append(self, row: dict):
+        with self._cond:
+            if self._cerrado:
+                raise RuntimeError("SignalLogWriter cerrado")
+            self._cola.append(dict(row))
+            self._encoladas += 1
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Espera a que todo lo encolado hasta ahora esté en disco. Devuelve
+        False si vence `timeout` o si alguna fila se descartó al cerrar.
+        """
+        with self._cond:
+            objetivo = self._encoladas
+            descartadas = self._descartadas
+            listo = self._cond.wait_for(
+                lambda: self._escritas + self._descartadas >= objetivo, timeout
+            )
+            return listo and self._descartadas == descartadas
+
+    def close(self):
+        with self._cond:
+            self._cerrado = True
+            self._cond.notify_all()
+        self._hilo.join()
+        self._f.close()
+        if self._db is not None:
+            self._db.close()
+
+    def _tomar_lote(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._cola or self._cerrado)
+            if not self._cola:
+                return None
+            limite = time.monotonic() + self.max_delay
+            while len(self._cola) < self.max_batch and not self._cerrado:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._cond.wait(restante)
+            n = min(len(self._cola), self.max_batch)
+            return [self._cola.popleft() for _ in range(n)]
+
+    def _escribir(self, lote):
+        t0 = time.perf_counter()
+        data = []
+        for row in lote:
+            try:
+                data.append(encode_record(row))
+            except (ValueError, TypeError) as e:
+                print(f"⚠️ Señal no registrable ({e}): {row}")
+        self._f.write(b"".join(data))
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._fin = self._f.tell()
+
+        # La réplica va aparte: si falla, el lote ya está en el log y no se
+        # puede reintentar sin duplicarlo
+        if self.csv_path:
+            try:
+                with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    for row in lote:
+                        writer.writerow([row.get(c, "") for c in COLUMNAS])
+            except OSError as e:
+                print("⚠️ Error al replicar señales en el CSV:", e)
+
+        DURACION_LOTE.observe(time.perf_counter() - t0)
+        FILAS_ESCRITAS.inc(n=len(data))
+
+    def _deshacer(self):
+        """
+        Tras un write o fsync fallido: descarta lo que haya quedado del lote
+        (en el buffer o a medias en disco) truncando al fin del último lote
+        confirmado, para poder reintentarlo sin duplicar registros.
+        """
+        try:
+            self._f.close()
+        except OSError:
+            pass
+        os.truncate(self.path, self._fin)
+        self._f = open(self.path, "ab")
+
+    def _sincronizar_db(self):
+        if self._db is None:
+            return
+        try:
+            self._db.sincronizar(self.path)
+        except Exception as e:
+            print("⚠️ Error al importar señales en SQLite:", e)
+
+    def _run(self):
+        # Lo que el índice no tenga (primer arranque o caída tras el fsync)
+        self._sincronizar_db()
+        while True:
+            lote = self._tomar_lote()
+            if lote is None:
+                return
+            escrito = self._escribir_con_reintentos(lote)
+            self._sincronizar_db()
+            with self._cond:
+                if escrito:
+                    self._escritas += len(lote)
+                else:
+                    self._descartadas += len(lote)
+                self._cond.notify_all()
+
+    def _escribir_con_reintentos(self, lote):
+        """
+        Escribe el lote; si falla lo deshace y lo reintenta con espera
+        creciente mientras el log siga abierto. Devuelve False si se
+        descarta (el disco sigue fallando tras pedir el cierre).
+        """
+        espera = REINTENTO_INICIAL
+        al_cerrar = 0
+        while True:
+            try:
+                self._escribir(lote)
+                self.lotes += 1
+                return True
+            except Exception as e:
+                ERRORES_LOTE.inc()
+                print("⚠️ Error al escribir el log de señales (se reintenta):", e)
+                try:
+                    self._deshacer()
+                except OSError as e2:
+                    print("⚠️ No se pudo truncar el log de señales:", e2)
+
+            with self._cond:
+                if self._cerrado:
+                    # Cerrando: pocos intentos y sin esperas largas
+                    al_cerrar += 1
+                    if al_cerrar > REINTENTOS_AL_CERRAR:
+                        FILAS_DESCARTADAS.inc(n=len(lote))
+                        print(f"⛔ Log de señales: se descartan {len(lote)} señales sin escribir")
+                        return False
+                    espera = REINTENTO_INICIAL
+                self._cond.wait(espera)
+            espera = min(espera * 2, REINTENTO_MAX)
+
+
+def importar_csv(csv_path, f):
+    """
+    Escribe en `f` (tras MAGIC) las filas de un CSV con encabezado en el
+    orden del archivo. Las filas que no se pueden codificar se descartan.
+    Devuelve cuántas se importaron.
+    """
+    n = 0
+    with open(csv_path, newline="", encoding="utf-8") as src:
+        reader = csv.reader(src)
+        columnas = next(reader, None)
+        if not columnas:
+            return 0
+        data = []
+        for values in reader:
+            if len(values) != len(columnas):
+                continue
+            try:
+                data.append(encode_record(dict(zip(columnas, values))))
+            except (ValueError, TypeError):
+                continue
+            n += 1
+            if len(data) >= 4096:
+                f.write(b"".join(data))
+                data = []
+        f.write(b"".join(data))
+    return n
+
+
+def exportar_csv(path, csv_path):
+    """Vuelca el log binario completo a CSV (con encabezado)."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es un log de señales")
+        filas, _ = leer_registros(f.read(), len(MAGIC))
+    with open(csv_path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow(COLUMNAS)
+        for _, row in filas:
+            writer.writerow([row[c] for c in COLUMNAS])
+    return len(filas)
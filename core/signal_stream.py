@@ -0,0 +1,103 @@
+import asyncio
+
+
+class SignalBroadcaster:
+    """
+    Reparte las señales nuevas del log a los clientes conectados por
+    SSE/WebSocket.
+
+    Una sola tarea asyncio vigila el `SignalCache` (un `stat` cada
+    `poll_interval` segundos) y empuja cada fila nueva a la cola de cada
+    suscriptor. La tarea se arranca con la primera suscripción y se cancela
+    al irse el último cliente, así que sin clientes no hay coste.
+    """
+
+    def __init__(self, cache, poll_interval=0.1, queue_size=1000):
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+
+        self._subs = set()
+        self._task = None
+        self._last_id = None
+
+    # ---------------- SUSCRIPCIONES ----------------
+    def subscribe(self, last_id=None):
+        """
+        Registra un cliente. Devuelve (cola, backlog) donde backlog son las
+        filas posteriores a `last_id` que siguen en el buffer del caché.
+        """
+        self._ensure_started()
+        backlog = self.cache.since(last_id) if last_id else []
+        # Lo posterior a lo ya difundido llegará por la cola
+        backlog = [(i, row) for i, row in backlog if not self.newer(i, self._last_id)]
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subs.add(queue)
+        return queue, backlog
+
+    def unsubscribe(self, queue):
+        self._subs.discard(queue)
+        if not self._subs:
+            self._stop()
+
+    @staticmethod
+    def valid_id(signal_id):
+        """True si `signal_id` tiene el formato '<inode>-<offset>' en hex."""
+        partes = str(signal_id).split("-")
+        if len(partes) != 2:
+            return False
+        try:
+            int(partes[0], 16), int(partes[1], 16)
+        except ValueError:
+            return False
+        return True
+
+    @staticmethod
+    def newer(signal_id, ref_id):
+        """True si `signal_id` es posterior a `ref_id` (mismo archivo de log)."""
+        if ref_id is None:
+            return True
+        inode, offset = signal_id.split("-")
+        ref_inode, ref_offset = ref_id.split("-")
+        return inode != ref_inode or int(offset, 16) > int(ref_offset, 16)
+
+    def is_subscribed(self, queue):
+        return queue in self._subs
+
+    @property
+    def clients(self):
+        return len(self._subs)
+
+    # ---------------- DIFUSIÓN ----------------
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self.cache.refresh()
+            self._last_id = self.cache.last_id
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    def _publish(self, items):
+        for queue in list(self._subs):
+            try:
+                for item in items:
+                    queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # Cliente demasiado lento: se desconecta (podrá reanudar);
+                # la tarea sigue hasta que su generador llame a unsubscribe
+                self._subs.discard(queue)
+
+    async def _run(self):
+        while True:
+            try:
+                self.cache.refresh()
+                nuevas = self.cache.since(self._last_id)
+                if nuevas:
+                    self._last_id = nuevas[-1][0]
+                    self._publish(nuevas)
+            except Exception as e:
+                print("⚠️ Error en el stream de señales:", e)
+            await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,375 @@
+import math
+import time
+import zlib
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from candle_store import VELA_COLS, segundos_tf
+from resample import agregar
+
+# Primer minuto simulado (2020-01-01 UTC) y minutos por bloque
+ORIGEN = 1577836800
+BLOQUE = 240
+
+# Régimen: (deriva por minuto en unidades de σ, multiplicador de σ,
+# probabilidad de salto por minuto). Cambia entre bloques (cadena de Markov).
+REGIMENES = {
+    "lateral": (0.0, 0.8, 0.0002),
+    "alcista": (0.03, 1.0, 0.0003),
+    "bajista": (-0.03, 1.2, 0.0005),
+    "panico": (-0.08, 2.5, 0.003),
+}
+TRANSICION = np.array([
+    [0.90, 0.05, 0.045, 0.005],
+    [0.08, 0.88, 0.035, 0.005],
+    [0.08, 0.035, 0.87, 0.015],
+    [0.15, 0.05, 0.30, 0.50],
+])
+_REG = np.array(list(REGIMENES.values()))
+_TRANS_CUM = TRANSICION.cumsum(axis=1)
+
+# Volatilidad: AR(1) lento entre bloques y AR(1) rápido dentro del bloque
+PHI_BLOQUE, SIGMA_BLOQUE = 0.9, 0.25
+PHI_MINUTO, SIGMA_MINUTO = 0.97, 0.12
+SALTO = 8.0  # tamaño típico de un salto, en σ
+MECHA = 0.5  # largo típico de las mechas, en σ
+REVERSION = 0.002  # atracción del nivel hacia el precio base, por bloque
+
+# El estado por bloque se extiende en tramos alineados (mismo redondeo sin
+# importar el orden de las consultas) y los minutos se generan por lotes
+TRAMO_ESTADO = 4096
+LOTE_BLOQUES = 128
+
+PRECIOS = {
+    "BTCUSDT": 30000.0,
+    "ETHUSDT": 2000.0,
+    "SOLUSDT": 100.0,
+    "frxEURUSD": 1.08,
+    "frxGBPJPY": 185.0,
+    "frxEURJPY": 160.0,
+}
+# σ por minuto y volumen base; el forex de Deriv no trae volumen (proxy 1.0)
+# y cierra el fin de semana (viernes 22:00 a domingo 22:00 UTC)
+PERFIL_CRIPTO = {"vol": 0.0008, "volumen": 500.0, "cierre_semanal": False}
+PERFIL_FOREX = {"vol": 0.00012, "volumen": None, "cierre_semanal": True}
+
+
+def perfil(symbol):
+    return PERFIL_FOREX if symbol.startswith("frx") else PERFIL_CRIPTO
+
+
+def _u64(x):
+    return np.asarray(x, dtype=np.uint64)
+
+
+def _mezclar(x):
+    """SplitMix64 vectorizado: enteros -> enteros pseudoaleatorios."""
+    with np.errstate(over="ignore"):
+        x = _u64(x) + _u64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> _u64(30))) * _u64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> _u64(27))) * _u64(0x94D049BB133111EB)
+    return x ^ (x >> _u64(31))
+
+
+def _uniformes(clave, bloques, flujo):
+    """U(0, 1) por bloque, sin estado: mismo (clave, bloque, flujo) -> mismo valor."""
+    with np.errstate(over="ignore"):
+        x = _mezclar(_u64(clave) ^ _mezclar(_u64(bloques) * _u64(8) + _u64(flujo)))
+    return ((x >> _u64(11)).astype(np.float64) + 0.5) * 2.0 ** -53
+
+
+def _normales(clave, bloques, flujo):
+    """N(0, 1) por bloque (Box-Muller sobre dos flujos de uniformes)."""
+    u1 = _uniformes(clave, bloques, flujo)
+    u2 = _uniformes(clave, bloques, flujo + 1)
+    return np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+
+
+def _ar1(eps, phi, x0=0.0):
+    """
+    x[t] = phi * x[t-1] + eps[t] partiendo de x[-1] = x0, sin bucle por
+    elemento: x[t] = phi^t * (phi * x0 + sum(eps[k] / phi^k)). Se hace por
+    tramos para que phi^-t no pierda precisión. Con una matriz, cada fila
+    es una serie independiente.
+    """
+    eps = np.asarray(eps, dtype=float)
+    out = np.empty_like(eps)
+    largo = eps.shape[-1]
+    tramo = max(1, int(np.log(1e6) / -np.log(phi))) if phi < 1 else max(largo, 1)
+    for i in range(0, largo, tramo):
+        e = eps[..., i:i + tramo]
+        pot = phi ** np.arange(e.shape[-1])
+        out[..., i:i + tramo] = pot * (phi * x0 + np.cumsum(e / pot, axis=-1))
+        x0 = out[..., i + e.shape[-1] - 1:i + e.shape[-1]]
+    return out
+
+
+def cerrado(ts):
+    """Máscara de minutos con el mercado de forex cerrado (fin de semana)."""
+    # 1970-01-01 fue jueves: sumando 3 días, el día 0 de la semana es el lunes
+    semana = (np.asarray(ts) // 60 + 3 * 1440) % (7 * 1440)
+    viernes_22 = 4 * 1440 + 22 * 60
+    domingo_22 = 6 * 1440 + 22 * 60
+    return (semana >= viernes_22) & (semana < domingo_22)
+
+
+class _Serie:
+    """
+    Estado de un símbolo. Lo secuencial (régimen, volatilidad lenta y nivel
+    de precio al inicio de cada bloque) se calcula una vez por bloque y se
+    guarda; los minutos de un bloque salen de un generador sembrado con
+    (semilla, símbolo, bloque), así cualquier tramo se puede regenerar igual
+    y los bloques recientes se guardan en un LRU.
+    """
+
+    def __init__(self, seed, symbol, max_bloques=512):
+        self.symbol = symbol
+        self.perfil = perfil(symbol)
+        self.id = zlib.crc32(symbol.encode())
+        self.seed = seed
+        self.clave = int(_mezclar(_u64(((seed & 0xFFFFFFFF) << 32) ^ self.id)))
+
+        u = float(_uniformes(self.clave, 0, 7))
+        self.base = math.log(PRECIOS.get(symbol, 10 ** (4 * u)))
+
+        self.regimen = np.zeros(0, dtype=np.int8)
+        self.vol = np.zeros(0)  # log-σ lenta del bloque
+        self.nivel = np.zeros(1) + self.base  # log-precio al inicio de cada bloque
+        self._bloques = OrderedDict()
+        self._max_bloques = max_bloques
+        self._lock = threading.Lock()
+
+    def _extender(self, n):
+        """Calcula régimen, volatilidad y nivel al menos hasta el bloque n - 1."""
+        while len(self.regimen) < n:
+            self._extender_tramo()
+
+    def _extender_tramo(self):
+        k = len(self.regimen)
+        n = k + TRAMO_ESTADO
+        b = np.arange(k, n)
+        u_reg = _uniformes(self.clave, b, 0)
+        z_nivel = _normales(self.clave, b, 1)
+        z_vol = _normales(self.clave, b, 3)
+
+        # La cadena de regímenes es lo único que va elemento a elemento
+        filas = _TRANS_CUM.tolist()
+        r = int(self.regimen[-1]) if k else 0
+        regimen = np.empty(n - k, dtype=np.int8)
+        for i, u in enumerate(u_reg.tolist()):
+            r = min(bisect_right(filas[r], u), len(filas) - 1)
+            regimen[i] = r
+
+        vol = _ar1(SIGMA_BLOQUE * z_vol, PHI_BLOQUE, self.vol[-1] if k else 0.0)
+        deriva, mult = _REG[regimen, 0], _REG[regimen, 1]
+        sigma = self.perfil["vol"] * mult * np.exp(vol)
+        paso = sigma * (deriva * BLOQUE + np.sqrt(BLOQUE) * z_nivel)
+        # Nivel con reversión lenta al precio base: AR(1) sobre nivel - base
+        desvio = _ar1(paso, 1 - REVERSION, self.nivel[-1] - self.base)
+
+        self.regimen = np.concatenate([self.regimen, regimen])
+        self.vol = np.concatenate([self.vol, vol])
+        self.nivel = np.concatenate([self.nivel, self.base + desvio])
+
+    def _generar(self, bloques):
+        """
+        Arrays (o, h, l, c, v) de forma (len(bloques), BLOQUE). Cada bloque
+        tiene su propio generador (el resultado no depende de qué otros
+        bloques se pidan a la vez); el resto se calcula sobre la matriz.
+        """
+        bloques = np.asarray(bloques, dtype=np.int64)
+        self._extender(int(bloques.max()) + 1)
+        n = len(bloques)
+
+        e = np.empty((5, n, BLOQUE))
+        u = np.empty((n, BLOQUE))
+        semillas = _mezclar(_u64(self.clave) ^ _mezclar(_u64(bloques) * _u64(8) + _u64(6)))
+        for i, semilla in enumerate(semillas.tolist()):
+            rng = np.random.Generator(np.random.PCG64(semilla))
+            e[:, i] = rng.standard_normal((5, BLOQUE))
+            u[i] = rng.random(BLOQUE)
+
+        deriva, mult, p_salto = (col[:, None] for col in _REG[self.regimen[bloques]].T)
+        vol_b = self.vol[bloques][:, None]
+        x = _ar1(SIGMA_MINUTO * e[0], PHI_MINUTO)
+        sigma = self.perfil["vol"] * mult * np.exp(vol_b + x)
+
+        hay = u < p_salto
+        salto = np.where(hay, SALTO * sigma * e[1], 0.0)
+
+        # Puente: el camino termina exactamente en el nivel del bloque siguiente
+        camino = np.cumsum(sigma * (deriva + e[2]) + salto, axis=1)
+        t = np.arange(1, BLOQUE + 1) / BLOQUE
+        inicio = self.nivel[bloques][:, None]
+        objetivo = self.nivel[bloques + 1][:, None] - inicio
+        c = inicio + camino - t * (camino[:, -1:] - objetivo)
+
+        # La vela abre en el cierre anterior salvo cuando hay salto (gap)
+        o = np.empty_like(c)
+        o[:, 0] = inicio[:, 0]
+        o[:, 1:] = c[:, :-1]
+        o += salto
+
+        h = np.maximum(o, c) + MECHA * sigma * np.abs(e[3])
+        l = np.minimum(o, c) - MECHA * sigma * np.abs(e[4])
+
+        base = self.perfil["volumen"]
+        if base is None:
+            v = np.ones_like(c)
+        else:
+            v = base * np.exp(x + vol_b + 0.3 * e[1]) * (1 + 4 * hay)
+        return np.exp(o), np.exp(h), np.exp(l), np.exp(c), v
+
+    def bloques(self, b0, b1):
+        """Columnas (o, h, l, c, v) de los bloques [b0, b1) concatenados."""
+        faltan = [b for b in range(b0, b1) if b not in self._bloques]
+        nuevos = {}
+        for j in range(0, len(faltan), LOTE_BLOQUES):
+            lote = faltan[j:j + LOTE_BLOQUES]
+            cols = self._generar(lote)
+            nuevos.update({b: tuple(col[i] for col in cols) for i, b in enumerate(lote)})
+
+        partes = []
+        for b in range(b0, b1):
+            if b in nuevos:
+                partes.append(nuevos[b])
+            else:
+                self._bloques.move_to_end(b)
+                partes.append(self._bloques[b])
+
+        # Solo se guardan los más recientes de lo generado
+        for b in faltan[-self._max_bloques:]:
+            self._bloques[b] = nuevos[b]
+        while len(self._bloques) > self._max_bloques:
+            self._bloques.popitem(last=False)
+        return [np.concatenate(col) for col in zip(*partes)]
+
+    def minutos(self, desde, hasta):
+        """Velas de 1m con apertura en [desde, hasta) (epochs múltiplos de 60)."""
+        if desde < ORIGEN:
+            raise ValueError(f"El simulador empieza en {ORIGEN} (pedido: {desde})")
+        m0 = (desde - ORIGEN) // 60
+        m1 = (hasta - ORIGEN) // 60
+        if m1 <= m0:
+            vacio = np.zeros(0)
+            return np.zeros(0, dtype=np.int64), vacio, vacio, vacio, vacio, vacio
+
+        b0, b1 = m0 // BLOQUE, (m1 - 1) // BLOQUE + 1
+        i0 = m0 - b0 * BLOQUE
+        i1 = i0 + (m1 - m0)
+        with self._lock:
+            cols = [col[i0:i1] for col in self.bloques(b0, b1)]
+        ts = ORIGEN + 60 * np.arange(m0, m1, dtype=np.int64)
+        if self.perfil["cierre_semanal"]:
+            abierto = ~cerrado(ts)
+            ts = ts[abierto]
+            cols = [col[abierto] for col in cols]
+        return (ts, *cols)
+
+
+class Simulador:
+    """
+    Mercado simulado determinista: con la misma semilla, un símbolo tiene
+    siempre la misma historia de 1m desde ORIGEN, con cambios de régimen,
+    rachas de volatilidad, saltos (gaps) y cierres de fin de semana en el
+    forex. Los timeframes mayores se agregan de esa misma serie, así que
+    3m y 5m son coherentes entre sí y entre llamadas.
+
+    `klines` tiene la firma de fetch_klines, así que sirve como fuente de
+    velas en lugar de Binance/Deriv y admite varios hilos a la vez.
+
+    `reloj` devuelve el epoch actual; en pruebas de carga se fija para
+    repetir exactamente los mismos datos.
+    """
+
+    def __init__(self, seed=0, reloj=time.time):
+        self.seed = int(seed)
+        self.reloj = reloj
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def serie(self, symbol) -> _Serie:
+        with self._lock:
+            s = self._series.get(symbol)
+            if s is None:
+                s = self._series[symbol] = _Serie(self.seed, symbol)
+            return s
+
+    def arrays(self, symbol, interval, desde, hasta):
+        """
+        (ts, o, h, l, c, v) de las velas que abren desde `desde`, con los
+        minutos anteriores a `hasta` (la última vela puede quedar a medias).
+        """
+        tf = segundos_tf(interval)
+        desde = -(-int(desde) // tf) * tf
+        hasta = -(-int(hasta) // 60) * 60
+        ts, o, h, l, c, v = agregar(*self.serie(symbol).minutos(desde, hasta), tf)
+        if perfil(symbol)["volumen"] is None:
+            v = np.ones(len(ts))  # como Deriv: sin volumen real en ningún timeframe
+        return ts, o, h, l, c, v
+
+    def klines(self, symbol, interval, limit=200, start=None):
+        """
+        `limit` velas desde `start` (epoch) o, sin `start`, las últimas
+        hasta ahora; la última puede estar en formación, como en el exchange.
+        """
+        tf = segundos_tf(interval)
+        ahora = int(self.reloj()) // 60 * 60 + 60
+        if start is not None:
+            desde = -(-int(start) // tf) * tf
+            cols = self.arrays(symbol, interval, desde, min(desde + limit * tf, ahora))
+        else:
+            # Con cierres de mercado hace falta mirar más atrás
+            ventana = limit * tf
+            while True:
+                desde = max(ORIGEN, (ahora - ventana) // tf * tf)
+                cols = self.arrays(symbol, interval, desde, ahora)
+                if len(cols[0]) >= limit or desde == ORIGEN:
+                    break
+                ventana *= 2
+            cols = [col[-limit:] for col in cols]
+
+        df = pd.DataFrame(dict(zip(VELA_COLS[1:], cols[1:])))
+        df.insert(0, "timestamp", pd.to_datetime(cols[0], unit="s"))
+        return df
+
+    def velas(self, symbols, interval, limit=200, start=None):
+        """{símbolo: DataFrame} para varios símbolos a la vez."""
+        return {sym: self.klines(sym, interval, limit, start) for sym in symbols}
+
+    def historia(self, symbol, desde, hasta, timeframes=("3m", "5m")):
+        """{timeframe: DataFrame} de [desde, hasta), todos de la misma serie de 1m."""
+        m = self.serie(symbol).minutos(desde // 60 * 60, -(-hasta // 60) * 60)
+        out = {}
+        for tf in timeframes:
+            cols = agregar(*m, segundos_tf(tf))
+            df = pd.DataFrame(dict(zip(VELA_COLS[1:], cols[1:])))
+            df.insert(0, "timestamp", pd.to_datetime(cols[0], unit="s"))
+            out[tf] = df
+        return out
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prueba de velocidad del simulador")
+    parser.add_argument("--simbolos", type=int, default=100)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sim = Simulador(args.seed)
+    simbolos = [f"SIM{i:04d}USDT" for i in range(args.simbolos)]
+    desde = ORIGEN + 365 * 86400
+    hasta = desde + args.dias * 86400
+    for sym in simbolos:
+        sim.serie(sym)._extender((hasta - ORIGEN) // 60 // BLOQUE + 1)
+
+    t0 = time.perf_counter()
+    n = sum(len(sim.arrays(sym, "1m", desde, hasta)[0]) for sym in simbolos)
+    dt = time.perf_counter() - t0
+    print(f"⚡ {n:,} velas de 1m en {dt:.2f}s ({n / dt:,.0f} velas/s)")
@@ -0,0 +1,429 @@
+import json
+import time
+import threading
+
+import pandas as pd
+import websocket
+
+import metrics
+from candle_store import VELA_COLS, VENTANAS, segundos_tf
+
+BINANCE_WS = "wss://stream.binance.com:9443/stream"
+
+MENSAJES_STREAM = metrics.contador(
+    "binarias_stream_mensajes_total", "Actualizaciones de vela recibidas por WebSocket", ("fuente",),
+)
+RECONEXIONES_STREAM = metrics.contador(
+    "binarias_stream_reconexiones_total", "Conexiones WebSocket de velas abiertas", ("fuente",),
+)
+
+
+def _df(filas):
+    """[(epoch, o, h, l, c, v), ...] -> DataFrame con VELA_COLS."""
+    df = pd.DataFrame(filas, columns=VELA_COLS)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+    return df
+
+
+# ---------------- AGREGACIÓN DE TICKS ----------------
+class AgregadorTicks:
+    """
+    Velas OHLC de un símbolo construidas tick a tick, para varios
+    timeframes a la vez.
+
+    - Límites alineados al epoch UTC, igual que Deriv y el scheduler: un
+      tick de epoch `e` cae en la vela que abre en `e // sec * sec`.
+    - Un tick tardío (o repetido tras reconectar) actualiza la vela a la que
+      pertenece si sigue en la ventana: máximo y mínimo siempre, apertura y
+      cierre solo si es anterior al primero o posterior al último tick de
+      esa vela. Los más antiguos que la ventana se descartan.
+    - `sembrar` fusiona velas ya hechas (historial) con la misma regla.
+    """
+
+    def __init__(self, timeframes, limit=200):
+        self.sec = {tf: segundos_tf(tf) for tf in timeframes}
+        self.limit = limit
+        # tf -> {apertura: [open, high, low, close, primer epoch, último epoch]}
+        self._velas = {tf: {} for tf in timeframes}
+        self._ultima = {}
+        self.ultimo_tick = None
+        self.tardios = 0
+
+    def _fusionar(self, tf, apertura, o, h, l, c, primero, ultimo):
+        velas = self._velas[tf]
+        v = velas.get(apertura)
+        if v is None:
+            ultima = self._ultima.get(tf)
+            if ultima is not None and apertura <= ultima - self.sec[tf] * self.limit:
+                return False
+            velas[apertura] = [o, h, l, c, primero, ultimo]
+            if ultima is None or apertura > ultima:
+                self._ultima[tf] = apertura
+            if len(velas) > self.limit * 2:
+                for epoch in sorted(velas)[: len(velas) - self.limit]:
+                    del velas[epoch]
+            return True
+        if primero < v[4]:
+            v[0], v[4] = o, primero
+        if ultimo >= v[5]:
+            v[3], v[5] = c, ultimo
+        v[1] = max(v[1], h)
+        v[2] = min(v[2], l)
+        return True
+
+    def tick(self, epoch, precio):
+        epoch = int(epoch)
+        if self.ultimo_tick is not None and epoch < self.ultimo_tick:
+            self.tardios += 1
+        for tf, sec in self.sec.items():
+            self._fusionar(tf, epoch // sec * sec, precio, precio, precio, precio, epoch, epoch)
+        if self.ultimo_tick is None or epoch > self.ultimo_tick:
+            self.ultimo_tick = epoch
+
+    def sembrar(self, tf, df, ahora):
+        """Fusiona un DataFrame de velas (VELA_COLS) descargado en `ahora`."""
+        sec = self.sec[tf]
+        epochs = (df["timestamp"] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        for apertura, o, h, l, c in zip(epochs, df["open"], df["high"], df["low"], df["close"]):
+            apertura = int(apertura)
+            # La vela abierta al descargar solo vale hasta `ahora`
+            ultimo = min(apertura + sec - 1, int(ahora))
+            self._fusionar(tf, apertura, float(o), float(h), float(l), float(c), apertura, ultimo)
+
+    def df(self, tf, limit):
+        velas = self._velas[tf]
+        # Deriv no da volumen: mismo proxy que safe_get_klines_deriv
+        filas = [(e, *velas[e][:4], 1.0) for e in sorted(velas)[-limit:]]
+        return _df(filas)
+
+
+# ---------------- FUENTES ----------------
+class FuenteREST:
+    """
+    Fuente por sondeo: la ventana del CandleStore, que pide al exchange
+    solo las velas nuevas en cada llamada.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def velas(self, symbol, interval, limit):
+        return self.store.get(symbol, interval).tail(limit)
+
+    def ventana(self, symbol, interval):
+        """Última ventana sin ir al exchange (None si no hay)."""
+        return self.store.ventana(symbol, interval)
+
+    def close(self):
+        pass
+
+
+class BinanceKlineStream:
+    """
+    Fuente por push: una sola conexión al stream combinado de klines de
+    Binance para todos los (símbolo, timeframe).
+
+    - Cada mensaje actualiza en memoria la vela abierta (o la cierra);
+      `velas` no hace ninguna petición mientras el stream esté vivo.
+    - La ventana se siembra con la fuente de respaldo (REST) la primera vez
+      y tras cada reconexión, para cubrir lo que pasó sin conexión.
+    - Si un par lleva más de `max_silencio` s sin mensajes se usa el
+      respaldo; si la conexión entera calla ese tiempo se reconecta, con
+      backoff exponencial entre intentos.
+    - `esperar_cierre` deja al ciclo esperar a que lleguen las velas que
+      cierran en un instante dado, en vez de pedirlas.
+
+    La conexión se abre en la primera llamada a `velas`.
+    """
+
+    def __init__(self, pares, respaldo, limit=200, url=BINANCE_WS, timeout=10,
+                 max_silencio=30, backoff_inicial=1, backoff_max=60):
+        self.pares = [(s, tf) for s, tf in pares]
+        self.respaldo = respaldo
+        self.limit = limit
+        streams = "/".join(f"{s.lower()}@kline_{tf}" for s, tf in self.pares)
+        self.url = f"{url}?streams={streams}"
+        self.timeout = timeout
+        self.max_silencio = max_silencio
+        self.backoff_inicial = backoff_inicial
+        self.backoff_max = backoff_max
+
+        # (symbol, interval) -> {epoch de apertura: (epoch, o, h, l, c, v)}
+        self._ventanas = {par: {} for par in self.pares}
+        self._recibido = {}  # último mensaje por par (monotonic)
+        self._cerradas = {}  # apertura de la última vela cerrada por par
+        self._sembrar = set(self.pares)
+        self._cond = threading.Condition()
+        self._ws = None
+        self._hilo = None
+        self._cerrado = False
+
+    # ---------------- CONEXIÓN ----------------
+    def iniciar(self):
+        with self._cond:
+            if self._hilo is None and not self._cerrado:
+                self._hilo = threading.Thread(target=self._run, name="binance-stream", daemon=True)
+                self._hilo.start()
+
+    def _run(self):
+        fallos = 0
+        while not self._cerrado:
+            try:
+                ws = websocket.create_connection(self.url, timeout=self.timeout)
+            except Exception as e:
+                fallos += 1
+                espera = min(self.backoff_max, self.backoff_inicial * 2 ** (fallos - 1))
+                print(f"⚠️ Stream Binance: sin conexión (reintento en {espera}s): {e}")
+                time.sleep(espera)
+                continue
+
+            fallos = 0
+            RECONEXIONES_STREAM.inc("binance")
+            # Lo anterior a esta conexión puede estar incompleto: se resiembra
+            with self._cond:
+                for par in self.pares:
+                    self._ventanas[par] = {}
+                self._sembrar = set(self.pares)
+                self._ws = ws
+            # Sin mensajes en `max_silencio` s la conexión se da por muerta
+            ws.settimeout(self.max_silencio)
+            try:
+                while not self._cerrado:
+                    raw = ws.recv()
+                    if not raw:
+                        break
+                    self._recibir(json.loads(raw))
+            except Exception as e:
+                if not self._cerrado:
+                    print(f"⚠️ Stream Binance: conexión perdida ({e}), reconectando")
+            finally:
+                self._ws = None
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+
+    def _recibir(self, msg):
+        k = (msg.get("data") or {}).get("k")
+        if not k:
+            return
+        par = (k["s"], k["i"])
+        if par not in self._ventanas:
+            return
+        apertura = int(k["t"]) // 1000
+        fila = (apertura, float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"]))
+        MENSAJES_STREAM.inc("binance")
+        with self._cond:
+            ventana = self._ventanas[par]
+            ventana[apertura] = fila
+            if len(ventana) > self.limit * 2:
+                for epoch in sorted(ventana)[: len(ventana) - self.limit]:
+                    del ventana[epoch]
+            self._recibido[par] = time.monotonic()
+            if k.get("x"):
+                self._cerradas[par] = max(apertura, self._cerradas.get(par, apertura))
+                self._cond.notify_all()
+
+    # ---------------- LECTURA ----------------
+    def _vivo(self, par):
+        recibido = self._recibido.get(par)
+        return (
+            self._ws is not None
+            and par not in self._sembrar
+            and recibido is not None
+            and time.monotonic() - recibido < self.max_silencio
+        )
+
+    def velas(self, symbol, interval, limit):
+        par = (symbol, interval)
+        if par not in self._ventanas:
+            return self.respaldo.velas(symbol, interval, limit)
+        self.iniciar()
+
+        with self._cond:
+            vivo = self._vivo(par)
+            sembrar = par in self._sembrar and self._ws is not None
+        if not vivo:
+            df = self.respaldo.velas(symbol, interval, limit)
+            if not sembrar or df is None or df.empty:
+                return df
+            # Lo recibido por el stream es igual o más reciente que el REST
+            epochs = (df["timestamp"] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+            filas = zip(epochs, *(df[c].astype(float) for c in VELA_COLS[1:]))
+            with self._cond:
+                ventana = self._ventanas[par]
+                for fila in filas:
+                    ventana.setdefault(int(fila[0]), tuple(fila))
+                self._sembrar.discard(par)
+            return df
+
+        VENTANAS.inc("stream")
+        return self._ventana_df(par, limit)
+
+    def _ventana_df(self, par, limit):
+        with self._cond:
+            ventana = self._ventanas[par]
+            filas = [ventana[e] for e in sorted(ventana)[-limit:]]
+        return _df(filas)
+
+    def ventana(self, symbol, interval):
+        """Ventana en memoria si el stream está vivo; si no, la del respaldo."""
+        par = (symbol, interval)
+        with self._cond:
+            vivo = par in self._ventanas and self._vivo(par)
+        if vivo:
+            return self._ventana_df(par, self.limit)
+        return self.respaldo.ventana(symbol, interval)
+
+    def esperar_cierre(self, timeframes, cierre, timeout=3.0):
+        """
+        Espera hasta `timeout` s a que el stream entregue cerradas las velas
+        que terminan en `cierre` (epoch). Devuelve True si llegaron todas.
+        """
+        pendientes = [
+            (par, cierre - segundos_tf(par[1])) for par in self.pares if par[1] in timeframes
+        ]
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._ws is None:
+                    return False
+                if all(self._cerradas.get(par, -1) >= apertura for par, apertura in pendientes):
+                    return True
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._cond.wait(restante)
+
+    def close(self):
+        self._cerrado = True
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+
+class DerivTickStream:
+    """
+    Fuente por push para forex: una suscripción de ticks por símbolo 'frx*'
+    en la conexión compartida de DerivClient, y las velas de cada
+    timeframe construidas en local (AgregadorTicks) en vez de pedir el
+    historial completo en cada ciclo.
+
+    - Cada (símbolo, timeframe) se siembra con el historial de la fuente de
+      respaldo la primera vez y tras cada reconexión de DerivClient (los
+      ticks perdidos sin conexión no se reciben después).
+    - Sin ticks en `max_silencio` s (mercado cerrado, conexión caída) se
+      usa el respaldo.
+    """
+
+    def __init__(self, simbolos, timeframes, cliente, respaldo, limit=200, max_silencio=60):
+        self.timeframes = list(timeframes)
+        self.cliente = cliente
+        self.respaldo = respaldo
+        self.limit = limit
+        self.max_silencio = max_silencio
+
+        self._agregadores = {s: AgregadorTicks(self.timeframes, limit) for s in simbolos}
+        self._suscritos = set()
+        self._sembrado = {}  # (symbol, tf) -> conexión de DerivClient al sembrar
+        self._recibido = {}  # último tick por símbolo (monotonic)
+        self._cond = threading.Condition()
+        self._lock_suscribir = threading.Lock()
+
+    # ---------------- SUSCRIPCIÓN ----------------
+    def iniciar(self):
+        """Suscribe los símbolos que aún no lo estén (se reintenta en cada llamada)."""
+        with self._lock_suscribir:
+            for symbol in self._agregadores:
+                if symbol in self._suscritos:
+                    continue
+                try:
+                    resp = self.cliente.suscribir({"ticks": symbol}, self._tick)
+                except Exception as e:
+                    print(f"⚠️ Ticks Deriv: sin suscripción para {symbol}: {e}")
+                    return
+                if "error" in resp:
+                    print(f"⚠️ Ticks Deriv {symbol}: {resp['error'].get('message')}")
+                    continue
+                self._suscritos.add(symbol)
+
+    def _tick(self, msg):
+        tick = msg.get("tick")
+        if not tick or tick.get("symbol") not in self._agregadores:
+            return
+        MENSAJES_STREAM.inc("deriv")
+        with self._cond:
+            self._agregadores[tick["symbol"]].tick(tick["epoch"], float(tick["quote"]))
+            self._recibido[tick["symbol"]] = time.monotonic()
+            self._cond.notify_all()
+
+    # ---------------- LECTURA ----------------
+    def _activo(self, symbol):
+        recibido = self._recibido.get(symbol)
+        return recibido is not None and time.monotonic() - recibido < self.max_silencio
+
+    def _vivo(self, symbol, interval):
+        return (
+            self._sembrado.get((symbol, interval)) == self.cliente.conexiones
+            and self._activo(symbol)
+        )
+
+    def velas(self, symbol, interval, limit):
+        if symbol not in self._agregadores or interval not in self.timeframes:
+            return self.respaldo.velas(symbol, interval, limit)
+        self.iniciar()
+
+        with self._cond:
+            vivo = self._vivo(symbol, interval)
+        if not vivo:
+            conexion = self.cliente.conexiones
+            df = self.respaldo.velas(symbol, interval, limit)
+            if symbol in self._suscritos and df is not None and not df.empty:
+                with self._cond:
+                    self._agregadores[symbol].sembrar(interval, df, time.time())
+                    self._sembrado[(symbol, interval)] = conexion
+            return df
+
+        VENTANAS.inc("ticks")
+        with self._cond:
+            return self._agregadores[symbol].df(interval, limit)
+
+    def ventana(self, symbol, interval):
+        """Velas agregadas si llegan ticks; si no, la ventana del respaldo."""
+        with self._cond:
+            vivo = symbol in self._agregadores and self._vivo(symbol, interval)
+            if vivo:
+                return self._agregadores[symbol].df(interval, self.limit)
+        return self.respaldo.ventana(symbol, interval)
+
+    def esperar_cierre(self, timeframes, cierre, timeout=3.0):
+        """
+        Espera hasta `timeout` s a que cada símbolo con ticks recientes
+        reciba un tick posterior a `cierre`: su vela ya está completa. Los
+        símbolos sin ticks (mercado cerrado) no se esperan.
+        """
+        if not any(tf in self.timeframes for tf in timeframes):
+            return True
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                pendientes = [
+                    s for s, agg in self._agregadores.items()
+                    if self._activo(s) and (agg.ultimo_tick or 0) < cierre
+                ]
+                if not pendientes:
+                    return True
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._cond.wait(restante)
+
+    def close(self):
+        """Cancela las suscripciones (el cliente Deriv sigue abierto)."""
+        with self._lock_suscribir:
+            suscritos, self._suscritos = self._suscritos, set()
+        for symbol in suscritos:
+            self.cliente.cancelar({"ticks": symbol}, self._tick)
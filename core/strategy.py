@@ -1,7 +1,9 @@
-import os, time, warnings, random
-from datetime import datetime, timedelta
-import pandas as pd, numpy as np, ta
-from binance.client import Client
+import os, warnings
+from datetime import datetime
+import pandas as pd
+from binance_client import BinanceClient
+from scheduler import CandleScheduler
+from simulator import Simulador
 
 warnings.filterwarnings("ignore")
 
@@ -11,6 +13,12 @@ API_SECRET = "0lDJEwHWv7LyhgVj1gwZQxddwufSmz7P6pfB1cLIvtWqAVlVUb9ZmX9JKQobWiRP"
 ACTIVOS = ["BTCUSDT", "EURUSD", "ETHUSDT", "SOLUSDT", "GBPJPY"]
 TIMEFRAMES = ["3m", "5m"]
 LIMIT = 200
+# Recalcular 5 s antes del cierre (misma ventana que should_trigger_alert)
+OFFSET_CIERRE = -5
+# Mismos modos que boot.py: BINARIAS_OFFLINE=1 sin red (todo simulado);
+# BINARIAS_DEMO=1 usa velas simuladas cuando no hay reales
+OFFLINE = os.environ.get("BINARIAS_OFFLINE") == "1"
+DEMO = os.environ.get("BINARIAS_DEMO") == "1"
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_CSV = os.path.join(BASE_DIR, "binary_signals_log.csv")
@@ -22,47 +30,38 @@ if not os.path.exists(LOG_CSV):
     print("🆕 Archivo CSV creado automáticamente:", LOG_CSV)
 
 # ---------------- CLIENTE ----------------
-usar_binance = False
-client = None
-try:
-    client = Client(API_KEY, API_SECRET)
-    usar_binance = True
-    print("✅ Conectado a Binance.")
-except Exception:
-    print("⚠️ Modo DEMO: sin conexión Binance.")
+# Se conecta en la primera petición
+client = BinanceClient(API_KEY, API_SECRET)
+# Mercado simulado de OFFLINE/DEMO (el de boot.py, misma BINARIAS_SEED)
+simulador = Simulador(int(os.environ.get("BINARIAS_SEED", "0")))
 
 # ---------------- FUNCIONES ----------------
 def now_utc():
     return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
 
 def safe_get_klines(symbol, interval, limit=200):
-    if usar_binance:
-        try:
-            kl = client.get_klines(symbol=symbol, interval=interval, limit=limit)
-            df = pd.DataFrame(kl, columns=[
-                'ts', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'qv', 'nt', 'tb', 'tq', 'i'])
-            df['timestamp'] = pd.to_datetime(df['ts'], unit='ms')
-            df[['open','high','low','close','volume']] = df[['open','high','low','close','volume']].astype(float)
+    # Sin velas reales: vacío (se espera al próximo cierre) salvo en DEMO
+    if OFFLINE:
+        return simulador.klines(symbol, interval, limit)
+    try:
+        kl = client.get_klines(symbol=symbol, interval=interval, limit=limit)
+        df = pd.DataFrame(kl, columns=[
+            'ts', 'open', 'high', 'low', 'close', 'volume',
+            'close_time', 'qv', 'nt', 'tb', 'tq', 'i'])
+        df['timestamp'] = pd.to_datetime(df['ts'], unit='ms')
+        df[['open','high','low','close','volume']] = df[['open','high','low','close','volume']].astype(float)
+        if not df.empty:
             return df[['timestamp','open','high','low','close','volume']]
-        except:
-            pass
-
-    # DEMO DATA
-    end = datetime.utcnow()
-    times = [end - timedelta(minutes=i*int(interval[:-1])) for i in range(limit)][::-1]
-    base = {"EURUSD":1.08,"GBPJPY":160.0}.get(symbol,30000+random.uniform(-2000,2000))
-    noise = np.random.normal(0,0.0005 if symbol in ["EURUSD","GBPJPY"] else 0.002,size=limit).cumsum()
-    close = base*(1+noise)
-    high = close*(1+np.random.uniform(0.0002,0.0015,size=limit))
-    low  = close*(1-np.random.uniform(0.0002,0.0015,size=limit))
-    openp= close*(1+np.random.uniform(-0.0008,0.0008,size=limit))
-    volume = np.random.uniform(10,1000,size=limit)
-    return pd.DataFrame({
-        'timestamp':times,'open':openp,'high':high,'low':low,'close':close,'volume':volume
-    })
+    except Exception as e:
+        print("⚠️", symbol, interval, "sin velas reales:", e)
+
+    if not DEMO:
+        return pd.DataFrame()
+    print("⚠️ Usando datos DEMO para", symbol, interval)
+    return simulador.klines(symbol, interval, limit)
 
 def add_indicators(df):
+    import ta  # solo al calcular: no se carga al arrancar
     df['EMA9']=ta.trend.ema_indicator(df['close'],9)
     df['EMA21']=ta.trend.ema_indicator(df['close'],21)
     df['EMA50']=ta.trend.ema_indicator(df['close'],50)
@@ -109,11 +108,14 @@ def classify_signal(score):
     elif score==3: return "MEDIA",0.7
     else: return "BAJA",0.5
 
-def update_signals():
+def update_signals(timeframes=None):
     for sym in ACTIVOS:
-        for tf in TIMEFRAMES:
+        for tf in timeframes or TIMEFRAMES:
             try:
-                df = add_indicators(safe_get_klines(sym, tf, LIMIT))
+                df = safe_get_klines(sym, tf, LIMIT)
+                if df.empty:
+                    continue  # sin velas reales: se espera al próximo cierre
+                df = add_indicators(df)
                 patterns = detectar_patrones(df)
                 sc_call = confirmations_score(df, "CALL")
                 sc_put = confirmations_score(df, "PUT")
@@ -173,6 +175,7 @@ def should_trigger_alert(tf: str) -> bool:
 # ---------------- LOOP PRINCIPAL ----------------
 if __name__ == "__main__":
     print("🚀 Iniciando sistema BINARIAS (estrategia)...")
-    while True:
-        update_signals()
-        time.sleep(20)
+    # Despierta dentro de la ventana de alerta de should_trigger_alert
+    CandleScheduler(TIMEFRAMES, offset=OFFSET_CIERRE).run(
+        lambda tfs, cierre: update_signals(tfs)
+    )
@@ -0,0 +1,215 @@
+import os
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import backtest as bt
+from candle_store import segundos_tf
+
+# ---------------- REJILLA ----------------
+# Valores probados por componente (los actuales de score_avanzado incluidos)
+GRID = {
+    "ema": (0, 1, 2),
+    "macd": (0, 1, 2),
+    "divergencia": (0, 1, 2, 3),
+    "pivote": (0, 1, 2),
+    "obv": (0, 1, 2),
+    "mom": (0, 1, 2),
+    "vela_poder": (0, 1, 2),
+    "adx": (0, 1, 2),
+}
+# Cortes de classify_signal: (ALTA, MEDIA) con MEDIA < ALTA
+UMBRALES_ALTA = range(5, 11)
+UMBRALES_MEDIA = range(3, 8)
+
+CLAVES = [(k, d) for k in bt.PESOS for d in ("CALL", "PUT")]
+
+
+# ---------------- MEMORIA COMPARTIDA ----------------
+class MemoriaCompartida:
+    """
+    Arrays de solo lectura publicados en /dev/shm. Los workers reciben solo
+    el manifiesto (nombre, forma, dtype) y mapean los mismos bytes.
+    """
+
+    def __init__(self):
+        self._bloques = []
+        self.manifiesto = {}
+
+    def publicar(self, nombre, arr):
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        self._bloques.append(shm)
+        self.manifiesto[nombre] = (shm.name, arr.shape, arr.dtype.str)
+
+    def cerrar(self):
+        for shm in self._bloques:
+            shm.close()
+            shm.unlink()
+        self._bloques = []
+
+
+# Estado de cada worker: bloques abiertos y vistas sobre ellos
+_BLOQUES = []
+_DATOS = {}
+_PARES = []
+
+
+def _adjuntar(manifiesto, pares):
+    for nombre, (shm_name, shape, dtype) in manifiesto.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _BLOQUES.append(shm)
+        _DATOS[nombre] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _PARES[:] = pares
+
+
+def _prep(clave):
+    comp = _DATOS[f"{clave}/componentes"]
+    return {
+        "componentes": {k: comp[i] for i, k in enumerate(CLAVES)},
+        "tendencia": _DATOS[f"{clave}/tendencia"],
+        "duracion": _DATOS[f"{clave}/duracion"],
+        "close": _DATOS[f"{clave}/close"],
+    }
+
+
+def _evaluar_pesos(valores):
+    """
+    Resultados por score para un juego de pesos, sumados en todos los
+    símbolos y timeframes: (valores, ganadas[score], perdidas[score]).
+    Los umbrales solo reparten scores en etiquetas, así que se aplican
+    después sin volver a evaluar.
+    """
+    pesos = dict(zip(GRID, valores))
+    max_score = sum(v * (2 if k in ("divergencia", "pivote") else 1) for k, v in pesos.items())
+    ganadas = np.zeros(max_score + 1, dtype=np.int64)
+    perdidas = np.zeros(max_score + 1, dtype=np.int64)
+
+    evaluados = {}
+    for a, b, j in _PARES:
+        for clave in (a, b):
+            if clave not in evaluados:
+                evaluados[clave] = bt.evaluar(_prep(clave), pesos)
+        s = bt.senales_mtf(_prep(a), _prep(b), None, None, pesos,
+                           evaluados=(evaluados[a], evaluados[b]), j=_DATOS[j])
+        r = s["resultado"]
+        ganadas += np.bincount(s["score"][r == 1], minlength=max_score + 1)
+        perdidas += np.bincount(s["score"][r == -1], minlength=max_score + 1)
+    return valores, ganadas, perdidas
+
+
+# ---------------- PREPARACIÓN ----------------
+def publicar_datos(datos, memoria):
+    """Calcula indicadores y reglas una vez y los publica. Devuelve los pares MTF."""
+    pares = []
+    for sym, frames in datos.items():
+        prep = {tf: bt.preparar(df) for tf, df in frames.items()}
+        for tf, p in prep.items():
+            clave = f"{sym}/{tf}"
+            memoria.publicar(f"{clave}/componentes",
+                             np.stack([p["componentes"][k].astype(np.int8) for k in CLAVES]))
+            memoria.publicar(f"{clave}/tendencia", p["tendencia"])
+            memoria.publicar(f"{clave}/duracion", p["duracion"])
+            memoria.publicar(f"{clave}/close", p["close"])
+
+        tf_a, tf_b = sorted(prep, key=segundos_tf)[:2]
+        for tf, otro in ((tf_a, tf_b), (tf_b, tf_a)):
+            j = bt._alinear(prep[tf]["timestamp"], segundos_tf(tf),
+                            prep[otro]["timestamp"], segundos_tf(otro))
+            memoria.publicar(f"{sym}/{tf}/j", j)
+            pares.append((f"{sym}/{tf}", f"{sym}/{otro}", f"{sym}/{tf}/j"))
+    return pares
+
+
+def cargar_datos(simbolos, dias, directorio=None):
+    """Historia del archivo local (archive.py) si existe; si no, sintética."""
+    if directorio:
+        from archive import OHLCVArchive
+
+        archivo = OHLCVArchive(directorio)
+        datos = {}
+        for sym in simbolos:
+            frames = {tf: archivo.dataframe(sym, tf) for tf in ("3m", "5m")}
+            if all(len(df) > bt.WARMUP for df in frames.values()):
+                datos[sym] = frames
+            else:
+                print(f"⚠️ {sym}: sin historia 3m/5m suficiente en {directorio}")
+        return datos
+    return {sym: bt.historia_sintetica(sym, dias) for sym in simbolos}
+
+
+# ---------------- INFORME ----------------
+def _filas(valores, ganadas, perdidas):
+    """Una fila por par de umbrales válido para este juego de pesos."""
+    cg, cp = np.cumsum(ganadas[::-1])[::-1], np.cumsum(perdidas[::-1])[::-1]
+
+    def desde(c, u):
+        return int(c[u]) if u < len(c) else 0
+
+    for alta, media in itertools.product(UMBRALES_ALTA, UMBRALES_MEDIA):
+        if media >= alta:
+            continue
+        g_alta, p_alta = desde(cg, alta), desde(cp, alta)
+        g_media, p_media = desde(cg, media) - g_alta, desde(cp, media) - p_alta
+        yield {
+            **dict(zip(GRID, valores)),
+            "umbral_alta": alta,
+            "umbral_media": media,
+            "senales_alta": g_alta + p_alta,
+            "win_rate_alta": g_alta / (g_alta + p_alta) if g_alta + p_alta else np.nan,
+            "senales_media": g_media + p_media,
+            "win_rate_media": g_media / (g_media + p_media) if g_media + p_media else np.nan,
+        }
+
+
+def ranking(resultados, min_senales=100) -> pd.DataFrame:
+    """Ordena por win rate de ALTA (con muestra mínima) y luego de MEDIA."""
+    df = pd.DataFrame([f for r in resultados for f in _filas(*r)])
+    df = df[df["senales_alta"] >= min_senales]
+    return df.sort_values(["win_rate_alta", "win_rate_media", "senales_alta"],
+                          ascending=False).reset_index(drop=True)
+
+
+def sweep(datos, workers=None, chunksize=8):
+    """Evalúa toda la rejilla de pesos en paralelo. Devuelve resultados crudos."""
+    combos = list(itertools.product(*GRID.values()))
+    memoria = MemoriaCompartida()
+    try:
+        pares = publicar_datos(datos, memoria)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_adjuntar,
+                                 initargs=(memoria.manifiesto, pares)) as pool:
+            return list(pool.map(_evaluar_pesos, combos, chunksize=chunksize))
+    finally:
+        memoria.cerrar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Barrido de pesos y umbrales del score")
+    parser.add_argument("--dias", type=int, default=90, help="días de historia sintética")
+    parser.add_argument("--simbolos", nargs="+", default=["BTCUSDT", "ETHUSDT", "SOLUSDT"])
+    parser.add_argument("--archivo", default=None, help="directorio de archive.py")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--min-senales", type=int, default=100)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--salida", default="sweep_report.csv")
+    args = parser.parse_args()
+
+    datos = cargar_datos(args.simbolos, args.dias, args.archivo)
+    combos = int(np.prod([len(v) for v in GRID.values()]))
+    print(f"🔎 {combos} juegos de pesos × umbrales con {args.workers} procesos")
+
+    t0 = time.perf_counter()
+    resultados = sweep(datos, args.workers)
+    dt = time.perf_counter() - t0
+
+    rep = ranking(resultados, args.min_senales)
+    rep.to_csv(args.salida, index=False)
+    print(f"✅ {len(rep)} combinaciones en {dt:.1f}s ({combos / dt:.0f} pesos/s) -> {args.salida}")
+    pd.set_option("display.width", 200)
+    print(rep.head(args.top).to_string(index=False))
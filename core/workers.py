@@ -0,0 +1,403 @@
+import os
+import time
+import bisect
+import hashlib
+import argparse
+import multiprocessing as mp
+from collections import Counter
+from multiprocessing.connection import wait
+
+import pandas as pd
+
+import metrics
+
+# Nodos virtuales por worker en el anillo: reparto parejo de símbolos
+VNODOS = 64
+# Segundos que el coordinador espera los resultados de un ciclo
+PLAZO_CICLO = 45
+# Ciclos seguidos sin respuesta antes de reiniciar un worker vivo
+FALLOS_MAX = 2
+# Segundos para que un worker recién lanzado importe boot y responda
+PLAZO_ARRANQUE = 60
+# Últimas velas por (símbolo, timeframe) que cada worker envía tras el
+# ciclo: con ellas el resolver del coordinador resuelve sin red
+VELAS_RESOLVER = 50
+
+# ---------------- MÉTRICAS ----------------
+WORKERS_VIVOS = metrics.medidor(
+    "binarias_workers_vivos", "Workers de señales en el anillo",
+)
+SIMBOLOS_WORKER = metrics.medidor(
+    "binarias_worker_simbolos", "Símbolos asignados a cada worker", ("worker",),
+)
+DURACION_WORKER = metrics.histograma(
+    "binarias_worker_ciclo_seconds", "Duración de update_signals en cada worker", ("worker",),
+)
+REINICIOS_WORKER = metrics.contador(
+    "binarias_worker_reinicios_total", "Workers reemplazados por motivo", ("motivo",),
+)
+SENALES_TARDIAS = metrics.contador(
+    "binarias_senales_tardias_total", "Resultados de worker descartados por llegar tras su ciclo",
+)
+
+
+def _hash(clave: str) -> int:
+    return int.from_bytes(hashlib.md5(clave.encode()).digest()[:8], "big")
+
+
+class AnilloHash:
+    """
+    Hash consistente: cada símbolo pertenece al primer nodo del anillo a
+    partir de su hash. Al entrar o salir un worker solo cambian de dueño
+    los símbolos de sus tramos (~1/N), el resto conserva su estado.
+    """
+
+    def __init__(self, vnodos=VNODOS):
+        self.vnodos = vnodos
+        self._puntos = []  # (hash, nodo) ordenado
+        self._nodos = set()
+
+    def __len__(self):
+        return len(self._nodos)
+
+    def __contains__(self, nodo):
+        return nodo in self._nodos
+
+    def agregar(self, nodo):
+        if nodo in self._nodos:
+            return
+        self._nodos.add(nodo)
+        for i in range(self.vnodos):
+            bisect.insort(self._puntos, (_hash(f"{nodo}#{i}"), nodo))
+
+    def quitar(self, nodo):
+        self._nodos.discard(nodo)
+        self._puntos = [p for p in self._puntos if p[1] != nodo]
+
+    def nodo(self, clave):
+        if not self._puntos:
+            return None
+        i = bisect.bisect(self._puntos, (_hash(clave),))
+        return self._puntos[i % len(self._puntos)][1]
+
+    def repartir(self, claves):
+        """{nodo: [claves]} con todos los nodos, aunque no reciban ninguna."""
+        reparto = {nodo: [] for nodo in self._nodos}
+        for clave in claves:
+            if self._puntos:
+                reparto[self.nodo(clave)].append(clave)
+        return reparto
+
+
+# ---------------- WORKER ----------------
+class _Emisor:
+    """Sustituye a SignalLogWriter en el worker: guarda las filas del ciclo."""
+
+    def __init__(self):
+        self.filas = []
+
+    def append(self, row):
+        self.filas.append(row)
+
+    def tomar(self):
+        filas, self.filas = self.filas, []
+        return filas
+
+
+def _cierres(boot):
+    """{(symbol, timeframe): (aperturas, cierres)} de las ventanas locales del worker."""
+    velas = {}
+    for symbol in boot.ACTIVOS:
+        for tf in boot.TIMEFRAMES:
+            df = boot.ventana_local(symbol, tf)
+            if df is None or df.empty:
+                continue
+            df = df.tail(VELAS_RESOLVER)
+            aperturas = df["timestamp"].to_numpy("datetime64[s]").astype("int64")
+            velas[(symbol, tf)] = (aperturas.tolist(), df["close"].astype(float).tolist())
+    return velas
+
+
+def _asignar(boot, simbolos):
+    """Pasa a procesar `simbolos` y libera el estado de los que se van."""
+    salen = set(boot.ACTIVOS) - set(simbolos)
+    for symbol in salen:
+        boot.velas.olvidar(symbol)
+        boot.remuestreo.olvidar(symbol)
+        for key in [k for k in boot.MOTORES if k[0] == symbol]:
+            del boot.MOTORES[key]
+        for key in [k for k in boot.ULTIMAS_SENALES if k[0] == symbol]:
+            del boot.ULTIMAS_SENALES[key]
+    if set(simbolos) != set(boot.ACTIVOS):
+        # Los streams se suscriben solo a los símbolos propios
+        for flujo in boot.FLUJOS:
+            flujo.close()
+        boot.FUENTES, boot.FLUJOS = boot.crear_fuentes(simbolos)
+    boot.ACTIVOS = list(simbolos)
+
+
+def _worker(wid, conn, fraccion):
+    """
+    Proceso worker: dueño del estado (velas, remuestreo, indicadores) de
+    los símbolos que le asigna el coordinador. Sus señales vuelven al
+    coordinador, que es el único que escribe el log, junto con las últimas
+    velas de sus ventanas para resolver las señales vencidas.
+    """
+    os.environ["BINARIAS_WORKER"] = "1"
+    import boot
+
+    emisor = boot.signal_log = _Emisor()
+    # Todos los workers comparten IP: cada uno gasta su parte del peso
+    for limitador in boot.LIMITADORES.values():
+        limitador.fraccion = fraccion
+    boot.ACTIVOS = []
+    conn.send(("listo", wid, os.getpid()))
+
+    while True:
+        try:
+            cmd = conn.recv()
+        except EOFError:
+            break
+        if cmd[0] == "fin":
+            break
+        if cmd[0] == "simbolos":
+            _asignar(boot, cmd[1])
+        elif cmd[0] == "ciclo":
+            _, timeframes, cierre, simbolos = cmd
+            t0 = time.perf_counter()
+            try:
+                if simbolos is None:
+                    boot.esperar_flujos(timeframes, cierre)
+                boot.update_signals(timeframes, cierre, simbolos)
+            except Exception as e:
+                print(f"⚠️ Worker {wid}: error en el ciclo: {e}")
+            dur = time.perf_counter() - t0
+            conn.send(("hecho", wid, os.getpid(), cierre, emisor.tomar(), dur, _cierres(boot)))
+
+
+# ---------------- COORDINADOR ----------------
+class Coordinador:
+    """
+    Reparte el universo de símbolos entre `n` procesos worker por hash
+    consistente y escribe en orden las señales de todos.
+
+    - Cada worker es dueño del estado de sus símbolos (ventanas de velas,
+      remuestreo, motores de indicadores y streams), así el cálculo escala
+      con los núcleos en vez de con el GIL.
+    - En cada ciclo se ordena a todos los workers calcular el cierre y se
+      esperan sus filas hasta `plazo` s; se escriben ordenadas por
+      (timestamp, symbol, timeframe) con el único SignalLogWriter. Los
+      resultados que llegan después de su ciclo se descartan.
+    - El resolver corre aquí (un solo escritor de resultados) con las
+      últimas velas que cada worker envía con sus filas; solo va a la red
+      por las que no estén.
+    - Un worker muerto sale del anillo: sus símbolos pasan a los demás (si
+      muere a mitad de ciclo se recalculan ahí mismo) y se lanza un
+      reemplazo con el mismo id, que vuelve a entrar al responder. Un
+      worker vivo que no responde `fallos_max` ciclos seguidos se reinicia.
+    """
+
+    def __init__(self, n, simbolos=None, plazo=PLAZO_CICLO, fallos_max=FALLOS_MAX):
+        import boot
+
+        self.boot = boot
+        self.n = n
+        self.simbolos = list(boot.ACTIVOS if simbolos is None else simbolos)
+        self.plazo = plazo
+        self.fallos_max = fallos_max
+
+        self._ctx = mp.get_context("spawn")
+        self._procesos = {}  # wid -> Process
+        self._conns = {}  # wid -> extremo del Pipe en el coordinador
+        self._pids = {}  # wid -> pid que respondió "listo"
+        self._anillo = AnilloHash()
+        self._asignados = {}  # wid -> símbolos enviados
+        self._fallos = Counter()
+        self._velas = {}  # (symbol, timeframe) -> (aperturas, cierres) del último ciclo
+        boot.resolver.velas_fn = self._ventana
+
+        for wid in range(n):
+            self._lanzar(wid)
+        self._esperar_listos(PLAZO_ARRANQUE)
+
+    # ---------------- PROCESOS ----------------
+    def _lanzar(self, wid):
+        # Un Pipe por worker, no una cola compartida: matar un worker no
+        # puede dejar tomado un lock que bloquee a los demás
+        conn, conn_worker = self._ctx.Pipe()
+        proc = self._ctx.Process(
+            target=_worker, args=(wid, conn_worker, 1 / self.n), name=f"binarias-worker-{wid}",
+            daemon=True,
+        )
+        proc.start()
+        conn_worker.close()
+        self._procesos[wid], self._conns[wid] = proc, conn
+        self._pids.pop(wid, None)
+
+    def _enviar(self, wid, cmd):
+        try:
+            self._conns[wid].send(cmd)
+        except OSError as e:
+            # Worker caído: _vigilar lo reemplaza
+            print(f"⚠️ Worker {wid}: no se pudo enviar {cmd[0]}: {e}")
+
+    def _reemplazar(self, wid, motivo):
+        print(f"⚠️ Worker {wid} {motivo}: se reparten sus símbolos y se relanza")
+        REINICIOS_WORKER.inc(motivo)
+        self._anillo.quitar(wid)
+        self._asignados.pop(wid, None)
+        self._fallos.pop(wid, None)
+        proc = self._procesos[wid]
+        if proc.is_alive():
+            proc.kill()
+        proc.join(timeout=5)
+        self._conns[wid].close()
+        self._lanzar(wid)
+
+    def _vigilar(self):
+        """Reemplaza los workers muertos. Devuelve sus símbolos huérfanos."""
+        huerfanos = []
+        for wid, proc in list(self._procesos.items()):
+            if not proc.is_alive():
+                huerfanos.extend(self._asignados.get(wid, []))
+                self._reemplazar(wid, "muerto")
+        return huerfanos
+
+    def _rebalancear(self):
+        """Envía a cada worker su parte del anillo si cambió."""
+        for wid, simbolos in self._anillo.repartir(self.simbolos).items():
+            if simbolos != self._asignados.get(wid):
+                self._enviar(wid, ("simbolos", simbolos))
+                self._asignados[wid] = simbolos
+            SIMBOLOS_WORKER.set(len(simbolos), wid)
+        WORKERS_VIVOS.set(len(self._anillo))
+
+    # ---------------- MENSAJES ----------------
+    def _recibir(self, timeout):
+        """Resultados recibidos en `timeout` s; los "listo" se atienden aquí."""
+        mensajes = []
+        for conn in wait(list(self._conns.values()), timeout):
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                continue  # worker muerto: lo detecta _vigilar
+            if msg[0] != "listo":
+                mensajes.append(msg)
+                continue
+            _, wid, pid = msg
+            if self._procesos[wid].pid == pid:
+                self._pids[wid] = pid
+                self._anillo.agregar(wid)
+                print(f"✅ Worker {wid} listo (pid {pid})")
+        return mensajes
+
+    def _drenar(self):
+        """Atiende lo llegado entre ciclos (reemplazos listos, resultados tardíos)."""
+        SENALES_TARDIAS.inc(n=len(self._recibir(0)))
+
+    def _esperar_listos(self, plazo):
+        limite = time.monotonic() + plazo
+        while len(self._pids) < len(self._procesos) and time.monotonic() < limite:
+            SENALES_TARDIAS.inc(n=len(self._recibir(0.5)))
+            self._vigilar()
+        self._rebalancear()
+
+    # ---------------- CICLO ----------------
+    def ciclo(self, timeframes=None, cierre=None):
+        """Un ciclo del scheduler repartido entre los workers."""
+        boot = self.boot
+        self._vigilar()
+        self._drenar()
+        self._rebalancear()
+
+        esperando = Counter()  # wid -> resultados pendientes
+        for wid, simbolos in self._asignados.items():
+            if simbolos:
+                self._enviar(wid, ("ciclo", timeframes, cierre, None))
+                esperando[wid] += 1
+
+        filas = []
+        limite = time.monotonic() + self.plazo
+        while +esperando and time.monotonic() < limite:
+            for _, wid, pid, cierre_msg, rows, dur, velas in self._recibir(
+                min(0.5, max(0.0, limite - time.monotonic()))
+            ):
+                if cierre_msg != cierre or esperando[wid] <= 0 or self._pids.get(wid) != pid:
+                    SENALES_TARDIAS.inc()
+                    continue
+                esperando[wid] -= 1
+                self._fallos.pop(wid, None)
+                DURACION_WORKER.observe(dur, wid)
+                filas.extend(rows)
+                self._velas.update(velas)
+            huerfanos = self._vigilar()
+            if huerfanos:
+                # Se recalculan en los workers que los heredan
+                for wid in list(esperando):
+                    if wid not in self._asignados:
+                        del esperando[wid]
+                self._rebalancear()
+                for wid, simbolos in self._anillo.repartir(huerfanos).items():
+                    if simbolos:
+                        self._enviar(wid, ("ciclo", timeframes, cierre, simbolos))
+                        esperando[wid] += 1
+
+        for wid in +esperando:
+            self._fallos[wid] += 1
+            print(f"⚠️ Worker {wid}: sin resultados en {self.plazo}s")
+            if self._fallos[wid] >= self.fallos_max:
+                self._reemplazar(wid, "sin_respuesta")
+        self._rebalancear()
+
+        self._escribir(filas)
+        boot.ULTIMO_CICLO.set(time.time())
+        try:
+            with boot.DURACION_RESOLVER.medir():
+                boot.resolver.resolver()
+        except Exception as e:
+            print("⚠️ Error al resolver señales:", e)
+        try:
+            metrics.volcar(boot.METRICAS_PROM)
+        except OSError as e:
+            print("⚠️ No se pudieron guardar las métricas:", e)
+
+    def _ventana(self, symbol, interval):
+        """velas_fn del resolver: las velas que envió el worker dueño del símbolo."""
+        velas = self._velas.get((symbol, interval))
+        if velas is None:
+            return None
+        aperturas, cierres = velas
+        return pd.DataFrame({"timestamp": pd.to_datetime(aperturas, unit="s"), "close": cierres})
+
+    def _escribir(self, filas):
+        """Un solo escritor: orden estable aunque los workers terminen en desorden."""
+        filas.sort(key=lambda r: (r["timestamp"], r["symbol"], r["timeframe"]))
+        for row in filas:
+            self.boot.signal_log.append(row)
+            self.boot.SENALES.inc(row["symbol"], row["timeframe"], row["direction"])
+
+    def close(self):
+        for wid in self._conns:
+            self._enviar(wid, ("fin",))
+        for proc in self._procesos.values():
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Señales repartidas entre procesos worker")
+    parser.add_argument("-n", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--simbolos", nargs="+", default=None, help="por defecto ACTIVOS")
+    args = parser.parse_args()
+
+    coordinador = Coordinador(args.workers, args.simbolos)
+    print(f"🚀 {len(coordinador.simbolos)} símbolos en {args.workers} workers")
+    from scheduler import CandleScheduler
+
+    try:
+        CandleScheduler(coordinador.boot.TIMEFRAMES, offset=coordinador.boot.OFFSET_CIERRE).run(
+            coordinador.ciclo
+        )
+    finally:
+        coordinador.close()
@@ -1,29 +1,59 @@
+const API_URL = "http://127.0.0.1:8000"; // <-- tu endpoint
 let lastSignalTime = null;
+let lastEventId = null;
+let socket = null;
 
+function notifyTabs(s) {
+  if (s.timestamp === lastSignalTime) return;
+  lastSignalTime = s.timestamp;
+
+  chrome.tabs.query({ url: "*://iqoption.com/traderoom/*" }, (tabs) => {
+    for (let tab of tabs) {
+      chrome.scripting.executeScript({
+        target: { tabId: tab.id },
+        func: displaySignal,
+        args: [s]
+      });
+    }
+  });
+}
+
+// ⚡ Stream en vivo: el servidor empuja cada señal nueva (sin polling)
+function connectStream() {
+  if (socket && socket.readyState <= WebSocket.OPEN) return;
+
+  let url = API_URL.replace(/^http/, "ws") + "/signals/stream";
+  if (lastEventId) url += "?last_id=" + encodeURIComponent(lastEventId);
+
+  socket = new WebSocket(url);
+  socket.onmessage = (event) => {
+    const msg = JSON.parse(event.data);
+    if (msg.type !== "signal") return;
+    lastEventId = msg.id;
+    notifyTabs(msg.data);
+  };
+  socket.onclose = () => { socket = null; };
+  socket.onerror = () => { socket = null; };
+}
+
+// Respaldo: si el stream no está abierto, se consulta /signals
 async function fetchSignals() {
   try {
-    const res = await fetch("http://127.0.0.1:8000/signals"); // <-- tu endpoint
+    const res = await fetch(API_URL + "/signals");
     const data = await res.json();
     if (data.status !== "ok" || !data.data.length) return;
 
-    const s = data.data[0];
-    if (s.timestamp === lastSignalTime) return;
-    lastSignalTime = s.timestamp;
-
-    chrome.tabs.query({ url: "*://iqoption.com/traderoom/*" }, (tabs) => {
-      for (let tab of tabs) {
-        chrome.scripting.executeScript({
-          target: { tabId: tab.id },
-          func: displaySignal,
-          args: [s]
-        });
-      }
-    });
+    notifyTabs(data.data[0]);
   } catch (err) {
     console.warn("⚠️ Error al leer API de señales:", err);
   }
 }
 
+function checkSignals() {
+  connectStream();
+  if (!socket || socket.readyState !== WebSocket.OPEN) fetchSignals();
+}
+
 function displaySignal(signal) {
   const { symbol, direction, confidence_display, elapsed_time, timeframe } = signal;
 
@@ -54,4 +84,5 @@ function displaySignal(signal) {
 
 
 chrome.alarms.create("fetchSignals", { periodInMinutes: 0.1 });
-chrome.alarms.onAlarm.addListener(fetchSignals);
+chrome.alarms.onAlarm.addListener(checkSignals);
+connectStream();
@@ -1,13 +1,52 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
-import numpy as np
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Optional
 import os
+import sys
+import json
+import math
+import time
+import asyncio
+import threading
 from datetime import datetime, timezone
 
 # ---------------- CONFIG ----------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-LOG_CSV = os.path.join(BASE_DIR, "core", "binary_signals_log.csv")
+# Mismo directorio de datos que el productor (BINARIAS_DATA_DIR o core/)
+DATA_DIR = os.environ.get("BINARIAS_DATA_DIR", os.path.join(BASE_DIR, "core"))
+LOG_BIN = os.path.join(DATA_DIR, "binary_signals.bin")
+LOG_RESULTADOS = os.path.join(DATA_DIR, "signal_results.csv")
+# Métricas que vuelca el productor (boot.py) al final de cada ciclo
+METRICAS_PROM = os.path.join(DATA_DIR, "metrics.prom")
+# Índice SQLite que mantiene el productor (consultas con filtros y páginas)
+LOG_DB = os.path.join(DATA_DIR, "signals.db")
+SIGNALS_LIMIT = 50
+SIGNALS_MAX = 500  # tamaño máximo de página en las consultas filtradas
+
+sys.path.insert(0, os.path.join(BASE_DIR, "core"))
+import metrics  # noqa: E402
+from signal_cache import BinarySignalCache, ResultCache  # noqa: E402
+from signal_db import SignalDB  # noqa: E402
+from signal_stream import SignalBroadcaster  # noqa: E402
+
+# Últimas señales en memoria (se sigue el log binario de forma incremental)
+signal_cache = BinarySignalCache(LOG_BIN, maxlen=SIGNALS_LIMIT * 4)
+# Consultas filtradas: una conexión de solo lectura por hilo
+signal_db = SignalDB(LOG_DB, solo_lectura=True)
+# WIN/LOSS/EMPATE de las señales vencidas (lo escribe el resolver del productor)
+result_cache = ResultCache(LOG_RESULTADOS)
+# Push de señales nuevas a clientes SSE / WebSocket
+broadcaster = SignalBroadcaster(signal_cache)
+STREAM_HEARTBEAT = 15  # segundos
+
+DURACION_SIGNALS = metrics.histograma(
+    "binarias_api_signals_seconds", "Duración de GET /signals por tipo de respuesta", ("estado",),
+)
+PAYLOAD = metrics.contador(
+    "binarias_api_payload_total", "Respuestas de /signals servidas desde el payload en caché",
+    ("cache",),
+)
 
 app = FastAPI(
     title="API de Señales Binarias",
@@ -51,94 +90,338 @@ def format_elapsed_time(timestamp_str):
     except Exception:
         return ""
 
+def _elapsed_text(sec):
+    """Texto corto de tiempo transcurrido (formato usado por /signals)."""
+    if sec < 60:
+        return f"hace {sec}s"
+    elif sec < 3600:
+        return f"hace {sec // 60} min"
+    elif sec < 86400:
+        return f"hace {sec // 3600}h {(sec % 3600) // 60}min"
+    else:
+        return f"hace {sec // 86400}d"
+
+
+def conf_color(label):
+    if label == "ALTA":
+        return "#00FF99"
+    elif label == "MEDIA":
+        return "#FFD700"
+    else:
+        return "#FF4C4C"
+
+
+def _to_float(value):
+    try:
+        x = float(value)
+    except (TypeError, ValueError):
+        return None
+    return x if math.isfinite(x) else None
+
+
+def _to_int(value):
+    x = _to_float(value)
+    return int(x) if x is not None and x == int(x) else value
+
+
+def limpiar_fila(row):
+    """Normaliza una fila cruda del log. Devuelve None si es inválida."""
+    if not all(row.get(k) for k in ("symbol", "direction", "confidence_label")):
+        return None
+
+    fila = dict(row)
+    pct = _to_float(fila.get("confidence_pct"))
+    fila["confidence_pct"] = pct if pct is not None else 0.0
+    price = _to_float(fila.get("price"))
+    fila["price"] = round(price, 6) if price is not None else ""
+    for col in ("score", "duration_candles", "duration_minutes"):
+        if col in fila:
+            fila[col] = _to_int(fila[col])
+    if "mtf_ok" in fila:
+        fila["mtf_ok"] = fila["mtf_ok"] in (True, "True")
+
+    fila["confidence_display"] = (
+        f"{fila['confidence_label']} ({fila['confidence_pct'] * 100:.0f}%)"
+    )
+    fila["confidence_color"] = conf_color(fila["confidence_label"])
+    return fila
+
+
+# 🔹 Respuesta pre-serializada: se reconstruye solo cuando cambia el log
+_payload = {"etag": None, "rows": []}
+_payload_lock = threading.Lock()
+
+
+def _build_payload(etag, rows):
+    """
+    Limpia, ordena y serializa las filas una sola vez por versión del log.
+    Cada fila se guarda como JSON sin la llave de cierre, para añadir
+    `elapsed_time` al enviar sin volver a serializar.
+    """
+    filas = [f for f in map(limpiar_fila, rows) if f is not None]
+    filas.sort(key=lambda f: f.get("timestamp", ""), reverse=True)
+    return {"etag": etag, "rows": _prebuild(filas[:SIGNALS_LIMIT])}
+
+
+def _prebuild(filas):
+    """Añade el resultado a cada fila y la serializa como (epoch, JSON sin '}')."""
+    prebuilt = []
+    for fila in filas:
+        res = result_cache.get(fila.get("id"))
+        fila["result"] = res["result"] if res else None
+        fila["exit_price"] = _to_float(res["exit_price"]) if res else None
+        try:
+            ts = datetime.strptime(fila["timestamp"], "%Y-%m-%d %H:%M:%S")
+            epoch = ts.replace(tzinfo=timezone.utc).timestamp()
+        except (KeyError, ValueError):
+            epoch = None
+        prebuilt.append((epoch, json.dumps(fila, ensure_ascii=False)[:-1]))
+    return prebuilt
+
+
+def _render(rows, **extra):
+    now = time.time()
+    parts = []
+    for epoch, prefix in rows:
+        elapsed = _elapsed_text(int(now - epoch)) if epoch is not None else ""
+        parts.append(f'{prefix}, "elapsed_time": "{elapsed}"}}')
+    last_update = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    campos = "".join(f'"{k}": {json.dumps(v)}, ' for k, v in extra.items())
+    return (
+        f'{{"status": "ok", "count": {len(rows)}, '
+        f'"last_update": "{last_update}", {campos}"data": [{", ".join(parts)}]}}'
+    )
+
+
+def _epoch_param(valor):
+    """`since` como epoch en segundos o fecha UTC ("2024-01-31 12:00:00" / ISO)."""
+    valor = str(valor).strip()
+    if valor.isdigit():
+        return int(valor)
+    try:
+        ts = datetime.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f"since inválido: {valor!r}")
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp())
+
+
+def _etag_match(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
 # ---------------- SEÑALES ----------------
 
-@app.get("/signals")
-def get_signals():
-    """Devuelve las señales más recientes desde el CSV."""
-    if not os.path.exists(LOG_CSV):
-        return {"status": "waiting", "data": []}
+def _consultar_signals(if_none_match, symbol, timeframe, min_confidence, since, cursor, limit):
+    """/signals con filtros o paginación: consulta al índice SQLite. Devuelve (estado, respuesta)."""
+    try:
+        since = _epoch_param(since) if since else None
+        version = signal_db.version()
+    except ValueError as e:
+        return "400", JSONResponse(
+            status_code=400, content={"status": "error", "message": str(e), "data": []}
+        )
+    except FileNotFoundError:
+        return "waiting", {"status": "waiting", "data": []}
+
+    # La versión del índice no depende de los filtros: el ETag vale por URL
+    etag = f'W/"db{version}.{result_cache.key()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_match(if_none_match, etag):
+        return "304", Response(status_code=304, headers=headers)
 
     try:
-        # 🔹 Leer CSV con encabezados conocidos
-        df = pd.read_csv(
-            LOG_CSV,
-            names=[
-                "timestamp", "symbol", "timeframe", "direction",
-                "confidence_label", "confidence_pct", "confidence_display",
-                "score", "patterns", "trend", "price"
-            ],
-            skiprows=1,  # salta la fila de encabezado duplicada
-            encoding="utf-8",
-            on_bad_lines="skip"
+        rows, siguiente = signal_db.consultar(
+            symbol=symbol,
+            timeframe=timeframe,
+            min_confidence=min_confidence,
+            since=since,
+            cursor=cursor,
+            limit=max(1, min(limit, SIGNALS_MAX)),
+        )
+    except ValueError as e:
+        return "400", JSONResponse(
+            status_code=400, content={"status": "error", "message": str(e), "data": []}
         )
 
-        if df.empty:
-            return {"status": "waiting", "data": []}
+    filas = [f for f in map(limpiar_fila, rows) if f is not None]
+    return "200", Response(
+        content=_render(_prebuild(filas), next_cursor=siguiente),
+        media_type="application/json",
+        headers=headers,
+    )
 
-        # 🔹 Limpieza
-        df.replace([np.inf, -np.inf], np.nan, inplace=True)
-        df.dropna(subset=["symbol", "direction", "confidence_label"], inplace=True)
 
-        # 🔹 Convertir numéricos
-        df["confidence_pct"] = pd.to_numeric(df["confidence_pct"], errors="coerce").fillna(0.0)
-        df["price"] = pd.to_numeric(df["price"], errors="coerce").round(6)
+@app.get("/signals")
+def get_signals(
+    if_none_match: Optional[str] = Header(default=None),
+    symbol: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    since: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = SIGNALS_LIMIT,
+):
+    """
+    Devuelve las señales más recientes del log de señales. Con `symbol`,
+    `timeframe`, `min_confidence` (0-1), `since` (epoch o fecha UTC) o
+    `limit` se filtra en el índice SQLite; `cursor` pide la página
+    siguiente (el `next_cursor` de la respuesta anterior).
+    """
+    global _payload
 
-        # 🔹 Si falta el campo de visualización
-        df["confidence_display"] = df.apply(
-            lambda x: f"{x['confidence_label']} ({x['confidence_pct']*100:.0f}%)"
-            if pd.notna(x["confidence_pct"]) else x["confidence_label"],
-            axis=1
-        )
+    t0 = time.perf_counter()
+    estado = "waiting"
+    try:
+        filtros = (symbol, timeframe, min_confidence, since, cursor)
+        if any(f is not None for f in filtros) or limit != SIGNALS_LIMIT:
+            estado, respuesta = _consultar_signals(if_none_match, *filtros, limit)
+            return respuesta
+
+        if not os.path.exists(LOG_BIN):
+            return {"status": "waiting", "data": []}
+
+        key, rows = signal_cache.snapshot()
+        etag = f'W/"{key}.{result_cache.key()}"'
 
-        # 🔹 Color dinámico
-        def conf_color(label):
-            if label == "ALTA":
-                return "#00FF99"
-            elif label == "MEDIA":
-                return "#FFD700"
+        with _payload_lock:
+            if _payload["etag"] != etag:
+                PAYLOAD.inc("miss")
+                _payload = _build_payload(etag, rows)
             else:
-                return "#FF4C4C"
+                PAYLOAD.inc("hit")
+            payload = _payload
 
-        df["confidence_color"] = df["confidence_label"].apply(conf_color)
+        if not payload["rows"]:
+            return {"status": "waiting", "data": []}
 
-        # 🔹 Tiempo transcurrido legible
-        def format_elapsed(ts):
-            try:
-                ts = datetime.strptime(str(ts), "%Y-%m-%d %H:%M:%S")
-                delta = datetime.utcnow() - ts
-                s = int(delta.total_seconds())
-                if s < 60:
-                    return f"hace {s}s"
-                elif s < 3600:
-                    return f"hace {s//60} min"
-                elif s < 86400:
-                    return f"hace {s//3600}h {(s%3600)//60}min"
-                else:
-                    return f"hace {s//86400}d"
-            except Exception:
-                return ""
-
-        df["elapsed_time"] = df["timestamp"].apply(format_elapsed)
-
-        # 🔹 Ordenar por fecha
-        df = df.sort_values("timestamp", ascending=False).head(50)
-        df = df.fillna("")
-
-        data = df.to_dict(orient="records")
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_match(if_none_match, etag):
+            estado = "304"
+            return Response(status_code=304, headers=headers)
 
-        return {
-            "status": "ok",
-            "count": len(data),
-            "last_update": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-            "data": data,
-        }
+        estado = "200"
+        return Response(
+            content=_render(payload["rows"]),
+            media_type="application/json",
+            headers=headers,
+        )
 
     except Exception as e:
+        estado = "error"
         return {
             "status": "error",
-            "message": f"Error al procesar CSV: {str(e)}",
+            "message": f"Error al leer el log de señales: {str(e)}",
             "data": [],
         }
+    finally:
+        DURACION_SIGNALS.observe(time.perf_counter() - t0, estado)
+
+
+# ---------------- MÉTRICAS ----------------
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Métricas de la API y del productor en formato de texto de Prometheus."""
+    texto = metrics.exponer()
+    try:
+        with open(METRICAS_PROM, encoding="utf-8") as f:
+            texto = metrics.combinar(texto, f.read())
+    except FileNotFoundError:
+        pass
+    return PlainTextResponse(texto, media_type="text/plain; version=0.0.4; charset=utf-8")
 
-    
\ No newline at end of file
+
+# ---------------- STREAM (SSE / WEBSOCKET) ----------------
+def _signal_event(signal_id, row):
+    """Señal lista para enviar por stream (mismo formato que /signals)."""
+    fila = limpiar_fila(row)
+    if fila is None:
+        return None
+    try:
+        ts = datetime.strptime(fila["timestamp"], "%Y-%m-%d %H:%M:%S")
+        sec = int(time.time() - ts.replace(tzinfo=timezone.utc).timestamp())
+        fila["elapsed_time"] = _elapsed_text(sec)
+    except (KeyError, ValueError):
+        fila["elapsed_time"] = ""
+    return {"type": "signal", "id": signal_id, "data": fila}
+
+
+async def _signal_events(last_id=None):
+    """
+    Generador común a SSE y WebSocket: primero el backlog posterior a
+    `last_id`, luego cada señal nueva. Emite None como latido si no hay
+    señales en STREAM_HEARTBEAT segundos. Un `last_id` mal formado se
+    ignora: se emite desde ahora.
+    """
+    if last_id is not None and not broadcaster.valid_id(last_id):
+        last_id = None
+    queue, backlog = broadcaster.subscribe(last_id)
+    sent = last_id
+    try:
+        for signal_id, row in backlog:
+            event = _signal_event(signal_id, row)
+            sent = signal_id
+            if event:
+                yield event
+
+        while broadcaster.is_subscribed(queue):
+            try:
+                signal_id, row = await asyncio.wait_for(queue.get(), STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if not broadcaster.newer(signal_id, sent):
+                continue
+            sent = signal_id
+            event = _signal_event(signal_id, row)
+            if event:
+                yield event
+    finally:
+        broadcaster.unsubscribe(queue)
+
+
+@app.get("/signals/stream")
+async def stream_signals(
+    last_id: Optional[str] = None,
+    last_event_id: Optional[str] = Header(default=None),
+):
+    """Server-Sent Events: una señal por evento, reanudable con Last-Event-ID."""
+
+    async def sse():
+        yield "retry: 2000\n\n"
+        async for event in _signal_events(last_event_id or last_id):
+            if event is None:
+                yield ": ping\n\n"
+                continue
+            data = json.dumps(event["data"], ensure_ascii=False)
+            yield f"id: {event['id']}\nevent: signal\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/signals/stream")
+async def stream_signals_ws(websocket: WebSocket, last_id: Optional[str] = None):
+    """WebSocket: mensajes {"type": "signal", "id", "data"} y pings periódicos."""
+    await websocket.accept()
+
+    async def sender():
+        async for event in _signal_events(last_id):
+            await websocket.send_json(event or {"type": "ping"})
+
+    # El cliente no envía nada: solo se escucha para detectar el cierre
+    task = asyncio.create_task(sender())
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    except WebSocketDisconnect:
+        pass
+    finally:
+        task.cancel()
@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import tempfile
+import threading
+
+import pytest
+from websockets.sync.server import serve
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Los módulos de core/ se importan planos, igual que desde main.py
+sys.path.insert(0, os.path.join(RAIZ, "core"))
+os.environ.setdefault("BINARIAS_OFFLINE", "1")
+# Logs, velas y métricas de boot/main fuera del repo
+DATOS = tempfile.mkdtemp(prefix="binarias-tests-")
+atexit.register(shutil.rmtree, DATOS, ignore_errors=True)
+os.environ.setdefault("BINARIAS_DATA_DIR", DATOS)
+
+
+@pytest.fixture(scope="session")
+def boot():
+    """El productor (core/boot.py) en modo OFFLINE, importado una vez."""
+    import boot
+
+    return boot
+
+
+def esperar(condicion, timeout=3.0):
+    """Sondea `condicion` hasta que se cumpla o pase `timeout`."""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class ServidorWS:
+    """
+    Servidor WebSocket local en un hilo. `responder(conexion, msg)` recibe
+    cada mensaje JSON y devuelve una respuesta (dict), una lista de ellas o
+    None. `rechazar` (n) responde 503 al handshake de las n primeras
+    conexiones.
+    """
+
+    def __init__(self, responder=None, rechazar=0):
+        self.responder = responder or (lambda conexion, msg: None)
+        self.rechazar = rechazar
+        self.conexiones = []
+        self.recibidos = []
+        self._lock = threading.Lock()
+        self._server = serve(
+            self._handler, "127.0.0.1", 0, process_request=self._handshake,
+            ping_interval=None, compression=None, close_timeout=0.2,
+        )
+        self.port = self._server.socket.getsockname()[1]
+        self.url = f"ws://127.0.0.1:{self.port}"
+        self._hilo = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._hilo.start()
+
+    def _handshake(self, conexion, request):
+        with self._lock:
+            if self.rechazar > 0:
+                self.rechazar -= 1
+                return conexion.respond(503, "no disponible\n")
+        return None
+
+    def _handler(self, conexion):
+        with self._lock:
+            self.conexiones.append(conexion)
+        try:
+            for raw in conexion:
+                msg = json.loads(raw)
+                with self._lock:
+                    self.recibidos.append(msg)
+                resp = self.responder(conexion, msg)
+                for r in resp if isinstance(resp, list) else [resp] if resp else []:
+                    conexion.send(json.dumps(r))
+        except Exception:
+            pass
+
+    def enviar(self, conexion, msg):
+        conexion.send(json.dumps(msg))
+
+    def cortar(self):
+        """Cierra todas las conexiones abiertas (el servidor sigue escuchando)."""
+        with self._lock:
+            conexiones = list(self.conexiones)
+        for conexion in conexiones:
+            conexion.close()
+
+    def cerrar(self):
+        self.cortar()
+        self._server.shutdown()
+
+
+@pytest.fixture
+def servidor_ws():
+    creados = []
+
+    def crear(responder=None, rechazar=0):
+        srv = ServidorWS(responder, rechazar)
+        creados.append(srv)
+        return srv
+
+    yield crear
+    for srv in creados:
+        srv.cerrar()
@@ -0,0 +1,202 @@
+import os
+import re
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import RAIZ
+import metrics
+from signal_log import SignalLogWriter
+
+FILA = {
+    "timestamp": "2025-11-14 16:28:45", "symbol": "BTCUSDT", "timeframe": "3m",
+    "direction": "CALL", "confidence_label": "MEDIA", "confidence_pct": 0.7,
+    "confidence_display": "MEDIA (70%)", "score": 4, "patterns": "", "divergences": "",
+    "trend": "LATERAL", "price": 97122.26, "duration_candles": 2, "duration_minutes": 6,
+    "mtf_ok": True,
+}
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """main.py importado de nuevo con BINARIAS_DATA_DIR en un directorio vacío."""
+    monkeypatch.setenv("BINARIAS_DATA_DIR", str(tmp_path))
+    monkeypatch.syspath_prepend(RAIZ)
+    sys.modules.pop("main", None)
+    import main
+
+    yield main
+    sys.modules.pop("main", None)
+
+
+def escribir(main, filas):
+    """Escribe las señales como el productor: log binario + índice SQLite."""
+    w = SignalLogWriter(main.LOG_BIN, db_path=main.LOG_DB)
+    for fila in filas:
+        w.append(fila)
+    w.flush()
+    w.close()
+
+
+def test_la_api_lee_de_binarias_data_dir(api, tmp_path):
+    for path in (api.LOG_BIN, api.LOG_RESULTADOS, api.METRICAS_PROM, api.LOG_DB):
+        assert os.path.dirname(path) == str(tmp_path)
+
+    client = TestClient(api.app)
+    assert client.get("/signals").json()["status"] == "waiting"
+
+    escribir(api, [FILA, dict(FILA, symbol="ETHUSDT")])
+    (tmp_path / "metrics.prom").write_text("binarias_ciclo_total 3\n", encoding="utf-8")
+
+    r = client.get("/signals")
+    assert r.json()["count"] == 2
+    r = client.get("/signals", params={"symbol": "ETHUSDT"})
+    assert [f["symbol"] for f in r.json()["data"]] == ["ETHUSDT"]
+    assert "binarias_ciclo_total 3" in client.get("/metrics").text
+
+
+def senales(n, symbols=("BTCUSDT", "ETHUSDT")):
+    """`n` señales por símbolo, de dos en dos por segundo (mismo ts: desempata seq)."""
+    return [
+        dict(FILA, symbol=s, timestamp=f"2025-11-14 16:{i // 120:02d}:{i // 2 % 60:02d}")
+        for i in range(n) for s in symbols
+    ]
+
+
+def test_paginacion_por_cursor(api):
+    escribir(api, senales(12))
+    client = TestClient(api.app)
+
+    vistas, cursor = [], None
+    while True:
+        params = {"symbol": "BTCUSDT", "timeframe": "3m", "limit": 5}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/signals", params=params).json()
+        vistas += [f["id"] for f in body["data"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+        ts, seq = (int(x) for x in cursor.split(":"))
+        assert ts > 0 and seq > 0
+
+    assert len(vistas) == len(set(vistas)) == 12
+    todas, _ = api.signal_db.consultar(symbol="BTCUSDT", limit=100)
+    assert vistas == [f["id"] for f in todas]
+
+
+def test_limites_de_pagina(api):
+    escribir(api, senales(api.SIGNALS_MAX + 1, symbols=("BTCUSDT",)))
+    client = TestClient(api.app)
+
+    body = client.get("/signals", params={"limit": 0}).json()
+    assert body["count"] == 1 and body["next_cursor"]
+    body = client.get("/signals", params={"limit": 10_000}).json()
+    assert body["count"] == api.SIGNALS_MAX and body["next_cursor"]
+    body = client.get("/signals", params={"limit": 10_000, "cursor": body["next_cursor"]}).json()
+    assert body["count"] == 1 and body["next_cursor"] is None
+
+
+@pytest.mark.parametrize("cursor", ["abc", "1:2:3", "12:"])
+def test_cursor_invalido_da_400(api, cursor):
+    escribir(api, senales(1))
+    r = TestClient(api.app).get("/signals", params={"cursor": cursor})
+    assert r.status_code == 400
+    assert "Cursor inválido" in r.json()["message"]
+
+
+def test_filtro_por_par_usa_el_indice(api):
+    escribir(api, senales(3))
+    sqls = []
+    conn = api.signal_db._lectura()
+    conn.set_trace_callback(sqls.append)
+    api.signal_db.consultar(symbol="BTCUSDT", timeframe="3m", cursor="1763137725:9", limit=5)
+    conn.set_trace_callback(None)
+
+    consulta = next(s for s in sqls if s.lstrip().startswith("SELECT seq"))
+    plan = " ".join(fila[-1] for fila in conn.execute("EXPLAIN QUERY PLAN " + consulta))
+    assert "signals_sym_tf_ts" in plan
+    # El índice ya da el orden (ts, seq): sin ordenar en una tabla temporal
+    assert "TEMP B-TREE" not in plan
+
+
+# Formato de texto de Prometheus 0.0.4
+NOMBRE = r"[a-zA-Z_:][a-zA-Z0-9_:]*"
+ETIQUETA = r'[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*"'
+MUESTRA = re.compile(
+    rf"^({NOMBRE})(?:\{{((?:{ETIQUETA})(?:,{ETIQUETA})*)?\}})? "
+    r"([-+]?(?:\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+|Inf|NaN))$"
+)
+SUFIJOS = {"histogram": ("_bucket", "_sum", "_count"), "counter": ("", "_total"), "gauge": ("",)}
+
+
+def parsear_prometheus(texto):
+    """
+    Valida `texto` como exposición de Prometheus y devuelve
+    {familia: (tipo, [(nombre, etiquetas, valor)])}. Cada familia se
+    declara una vez (HELP y TYPE antes de sus muestras) y no se parte.
+    """
+    assert texto.endswith("\n")
+    familias, actual = {}, None
+    for linea in texto.splitlines():
+        if linea.startswith("# HELP "):
+            nombre = linea.split()[2]
+            assert re.fullmatch(NOMBRE, nombre) and nombre not in familias, linea
+            familias[nombre], actual = (None, []), nombre
+        elif linea.startswith("# TYPE "):
+            _, _, nombre, tipo = linea.split()
+            assert nombre == actual and familias[nombre][0] is None, linea
+            assert tipo in SUFIJOS, linea
+            familias[nombre] = (tipo, [])
+        else:
+            m = MUESTRA.match(linea)
+            assert m, f"línea inválida: {linea!r}"
+            tipo, muestras = familias[actual]
+            assert m.group(1) in {actual + s for s in SUFIJOS[tipo]}, linea
+            etiquetas = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', m.group(2) or ""))
+            muestras.append((m.group(1), etiquetas, float(m.group(3))))
+    return familias
+
+
+def test_metrics_es_texto_prometheus(api, tmp_path):
+    client = TestClient(api.app)
+    escribir(api, senales(2))
+    client.get("/signals")
+    client.get("/signals", params={"cursor": "abc"})
+
+    # Lo que vuelca el productor; una familia coincide con una de la API
+    ciclos = metrics.Contador("binarias_ciclo_total", "Ciclos del productor", ("nota",))
+    ciclos.inc('comillas " barra \\ y\nsalto', n=3)
+    duracion = metrics.Histograma("binarias_ciclo_seconds", "Duración del ciclo", ("tf",))
+    duracion.observe(0.3, "3m")
+    duracion.observe(100, "5m")
+    repetida = metrics.Contador("binarias_api_payload_total", "Repetida", ("cache",))
+    repetida.inc("hit")
+    texto = [linea for m in (ciclos, duracion, repetida) for linea in m.exponer()]
+    (tmp_path / "metrics.prom").write_text("\n".join(texto) + "\n", encoding="utf-8")
+
+    r = client.get("/metrics")
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    familias = parsear_prometheus(r.text)
+
+    assert familias["binarias_ciclo_total"] == (
+        "counter", [("binarias_ciclo_total", {"nota": r'comillas \" barra \\ y\nsalto'}, 3.0)],
+    )
+    assert familias["binarias_api_payload_total"][0] == "counter"
+    assert "Repetida" not in r.text
+
+    for nombre in ("binarias_api_signals_seconds", "binarias_ciclo_seconds"):
+        tipo, muestras = familias[nombre]
+        assert tipo == "histogram"
+        series = {}
+        for n, etq, v in muestras:
+            clave = tuple(sorted((k, x) for k, x in etq.items() if k != "le"))
+            series.setdefault(clave, {}).setdefault(n, []).append((etq.get("le"), v))
+        assert len(series) >= 2
+        for serie in series.values():
+            acumulados = [v for _, v in serie[nombre + "_bucket"]]
+            assert acumulados == sorted(acumulados)
+            assert serie[nombre + "_bucket"][-1][0] == "+Inf"
+            assert serie[nombre + "_count"] == [(None, acumulados[-1])]
+            assert len(serie[nombre + "_sum"]) == 1
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from archive import OHLCVArchive, descargar
+from simulator import Simulador
+
+DESDE = 1_763_078_400  # 2025-11-14 00:00 UTC
+HASTA = DESDE + 86400
+sim = Simulador(seed=2, reloj=lambda: HASTA + 3600)
+
+
+def fetch(symbol, interval, limit, start=None):
+    return sim.klines(symbol, interval, limit, start=start)
+
+
+def referencia(desde=DESDE, hasta=HASTA):
+    df = sim.klines("BTCUSDT", "5m", (hasta - desde) // 300, start=desde)
+    return df[df["timestamp"] < pd.Timestamp(hasta, unit="s")].reset_index(drop=True)
+
+
+def test_memmap_ida_y_vuelta(tmp_path):
+    archivo = OHLCVArchive(str(tmp_path))
+    assert descargar(archivo, fetch, "BTCUSDT", "5m", DESDE, HASTA, pagina=100, pausa=0) == 288
+
+    vista = archivo.abrir("BTCUSDT", "5m")
+    assert isinstance(vista["close"], np.memmap) and not vista["close"].flags.writeable
+    pd.testing.assert_frame_equal(archivo.dataframe("BTCUSDT", "5m"), referencia())
+
+    # Tramo por fechas: [desde, hasta)
+    desde, hasta = DESDE + 3600, DESDE + 7200
+    tramo = archivo.abrir("BTCUSDT", "5m", pd.Timestamp(desde, unit="s"), hasta)
+    assert tramo["timestamp"][0] == desde and len(tramo["timestamp"]) == 12
+    np.testing.assert_array_equal(tramo["close"], referencia(desde, hasta)["close"])
+
+
+def test_reanuda_tras_una_escritura_interrumpida(tmp_path):
+    archivo = OHLCVArchive(str(tmp_path))
+    descargar(archivo, fetch, "BTCUSDT", "5m", DESDE, DESDE + 6 * 3600, pagina=50, pausa=0)
+    # Columnas con velas que meta.json nunca confirmó
+    with open(archivo._columna("BTCUSDT", "5m", "close"), "ab") as f:
+        f.write(np.arange(5, dtype="<f8").tobytes())
+
+    llamadas = []
+
+    def contar(symbol, interval, limit, start=None):
+        llamadas.append(start)
+        return fetch(symbol, interval, limit, start)
+
+    assert descargar(archivo, contar, "BTCUSDT", "5m", DESDE, HASTA, pagina=100, pausa=0) == 216
+    assert llamadas[0] == DESDE + 6 * 3600
+    pd.testing.assert_frame_equal(archivo.dataframe("BTCUSDT", "5m"), referencia())
@@ -0,0 +1,28 @@
+import os
+import sys
+import time
+import subprocess
+
+from conftest import RAIZ
+
+# Presupuesto del arranque del productor en modo OFFLINE (segundos)
+PRESUPUESTO_BOOT = 3.0
+PROHIBIDOS = ["ta", "binance"]
+
+
+def test_arranque_de_boot_offline(tmp_path):
+    codigo = (
+        f"import sys; sys.path.insert(0, {os.path.join(RAIZ, 'core')!r}); import boot; "
+        f"cargados = [m for m in {PROHIBIDOS!r} if m in sys.modules]; "
+        "sys.exit(f'importó {cargados}' if cargados else 0)"
+    )
+    env = dict(os.environ, BINARIAS_OFFLINE="1", BINARIAS_DATA_DIR=str(tmp_path))
+    env.pop("BINARIAS_WORKER", None)
+
+    t0 = time.perf_counter()
+    r = subprocess.run([sys.executable, "-c", codigo], env=env, cwd=tmp_path,
+                       capture_output=True, text=True, timeout=30)
+    duracion = time.perf_counter() - t0
+
+    assert r.returncode == 0, r.stderr or r.stdout
+    assert duracion < PRESUPUESTO_BOOT, f"boot tardó {duracion:.2f}s"
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import backtest
+from indicator_engine import COLUMNAS
+
+hist = backtest.historia_sintetica("BTCUSDT", dias=3, seed=1)
+NIVELES = {"BAJA": 0, "MEDIA": 1, "ALTA": 2}
+
+
+def test_indicadores_igual_que_ta(boot):
+    df = hist["3m"]
+    ref = boot.add_indicators(df)
+    ind = backtest.indicadores(df)
+    for col in COLUMNAS[1:]:
+        np.testing.assert_allclose(ind[col].to_numpy(float), ref[col].to_numpy(float),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=col)
+
+
+@pytest.mark.parametrize("tf", ["3m", "5m"])
+def test_backtest_coincide_con_construir_senal(boot, tf):
+    df = hist[tf]
+    ind = boot.add_indicators(df)
+    prep = backtest.preparar(df)
+    direccion, score, nivel = backtest.evaluar(prep)
+    tendencia = backtest.TENDENCIAS[prep["tendencia"]]
+    divs = {k: v for k, v in prep["divergencias"].items() if "(pivote)" not in k}
+
+    senales = 0
+    for i in range(backtest.WARMUP, len(df), 3):
+        # En vivo: la ventana termina en la vela i
+        senal = boot.construir_senal(ind.iloc[:i + 1], "BTCUSDT", tf)
+        if direccion[i] == 0:
+            assert senal is None, i
+            continue
+        senales += 1
+        assert senal["direction"] == ("CALL" if direccion[i] > 0 else "PUT"), i
+        assert senal["score"] == score[i], i
+        assert NIVELES[senal["confidence_label"]] == nivel[i], i
+        assert senal["trend"] == tendencia[i], i
+        assert senal["duration_candles"] == prep["duracion"][i], i
+        assert senal["patterns"] == str(backtest._etiquetas(prep["patrones"], [i])[0]), i
+        assert senal["divergences"] == str(backtest._etiquetas(divs, [i])[0]), i
+    assert senales > 100
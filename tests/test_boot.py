@@ -0,0 +1,49 @@
+import atexit
+
+import pandas as pd
+import pytest
+
+
+class FuenteCaida:
+    def velas(self, symbol, interval, limit):
+        raise ConnectionError("sin red")
+
+
+class FuenteVacia:
+    def velas(self, symbol, interval, limit):
+        return pd.DataFrame()
+
+
+@pytest.fixture
+def boot(boot, monkeypatch):
+    monkeypatch.setattr(boot, "OFFLINE", False)
+    return boot
+
+
+@pytest.mark.parametrize("fuente", [FuenteCaida(), FuenteVacia()])
+def test_sin_velas_reales_se_pospone_sin_demo(boot, monkeypatch, fuente):
+    monkeypatch.setattr(boot, "FUENTES", {"binance": fuente, "deriv": fuente})
+    monkeypatch.setattr(boot, "DEMO", False)
+
+    assert boot.safe_get_klines("BTCUSDT", "1m", 50).empty
+    assert boot.safe_get_klines("frxEURUSD", "1m", 50).empty
+
+
+def test_demo_solo_si_se_pide(boot, monkeypatch):
+    monkeypatch.setattr(boot, "FUENTES", {"binance": FuenteCaida(), "deriv": FuenteCaida()})
+    monkeypatch.setattr(boot, "DEMO", True)
+
+    assert len(boot.safe_get_klines("BTCUSDT", "1m", 50)) == 50
+
+
+def test_crear_fuentes_no_acumula_handlers_de_salida(boot, monkeypatch):
+    registrados = []
+    monkeypatch.setattr(atexit, "register", registrados.append)
+    monkeypatch.setattr(boot, "STREAM", {"binance"})
+
+    for _ in range(3):
+        fuentes, flujos = boot.crear_fuentes(["BTCUSDT", "ETHUSDT"])
+        assert len(flujos) == 1
+        for flujo in flujos:
+            flujo.close()
+    assert registrados == []
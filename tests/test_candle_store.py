@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import candle_store
+from candle_store import CandleStore
+from simulator import Simulador
+
+T0 = 1_763_137_800 + 100  # a mitad de una vela de 3m
+TF = 180
+
+
+def epoch(ts):
+    return int(pd.Timestamp(ts).timestamp())
+
+
+class FetchFalso:
+    """
+    Velas del simulador a la hora de `reloj`. Anota (limit, start) de cada
+    llamada y puede quitar de las respuestas las velas de `hueco` (desde,
+    hasta): siempre o solo en la primera descarga.
+    """
+
+    def __init__(self, reloj, hueco=None, solo_primera=False):
+        self.sim = Simulador(seed=5, reloj=reloj)
+        self.hueco = hueco
+        self.solo_primera = solo_primera
+        self.llamadas = []
+
+    def __call__(self, symbol, interval, limit, start=None):
+        self.llamadas.append((limit, start))
+        df = self.sim.klines(symbol, interval, limit, start=start)
+        if self.hueco and (len(self.llamadas) == 1 or not self.solo_primera):
+            ts = df["timestamp"].map(epoch)
+            df = df[(ts < self.hueco[0]) | (ts >= self.hueco[1])].reset_index(drop=True)
+        return df
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    r = SimpleNamespace(t=T0)
+    r.time = lambda: r.t
+    monkeypatch.setattr(candle_store, "time", r)
+    return r
+
+
+def referencia(reloj, limit=50):
+    return Simulador(seed=5, reloj=reloj.time).klines("BTCUSDT", "3m", limit)
+
+
+def test_solo_descarga_desde_la_ultima_vela(reloj):
+    fetch = FetchFalso(reloj.time)
+    store = CandleStore(fetch, limit=50)
+
+    df = store.get("BTCUSDT", "3m")
+    assert fetch.llamadas == [(50, None)]
+    ultima = epoch(df["timestamp"].iloc[-1])
+
+    reloj.t += 3 * TF
+    df = store.get("BTCUSDT", "3m")
+    # Desde la vela que estaba abierta (se reemplaza) hasta la actual
+    assert fetch.llamadas[1] == (5, ultima)
+    assert len(df) == 50
+    pd.testing.assert_frame_equal(df, referencia(reloj))
+
+
+def test_hueco_se_rellena_una_vez(reloj):
+    desde = T0 // TF * TF - 10 * TF
+    fetch = FetchFalso(reloj.time, hueco=(desde, desde + 3 * TF), solo_primera=True)
+    store = CandleStore(fetch, limit=50)
+
+    df = store.get("BTCUSDT", "3m")
+    assert fetch.llamadas[1] == (3, desde)
+    pd.testing.assert_frame_equal(df, referencia(reloj))
+
+
+def test_hueco_sin_velas_no_se_reintenta(reloj):
+    # Mercado cerrado: el exchange nunca devuelve esas velas
+    desde = T0 // TF * TF - 10 * TF
+    fetch = FetchFalso(reloj.time, hueco=(desde, desde + 3 * TF))
+    store = CandleStore(fetch, limit=50)
+
+    store.get("BTCUSDT", "3m")
+    reloj.t += TF
+    store.get("BTCUSDT", "3m")
+    assert [start for _, start in fetch.llamadas].count(desde) == 1
+
+
+def test_ventana_persistida_en_csv(reloj, tmp_path):
+    store = CandleStore(FetchFalso(reloj.time), directorio=str(tmp_path), limit=50)
+    df = store.get("BTCUSDT", "3m")
+    assert (tmp_path / "BTCUSDT_3m.csv").exists()
+
+    # Otro proceso: carga del disco y solo pide lo nuevo
+    reloj.t += TF
+    fetch = FetchFalso(reloj.time)
+    df2 = CandleStore(fetch, directorio=str(tmp_path), limit=50).get("BTCUSDT", "3m")
+    assert fetch.llamadas == [(3, epoch(df["timestamp"].iloc[-1]))]
+    pd.testing.assert_frame_equal(df2, referencia(reloj))
@@ -0,0 +1,93 @@
+import time
+import threading
+from collections import defaultdict
+
+import pytest
+
+from data_fetcher import LIMITES_POR_FUENTE, FetcherConcurrente, fuente_de
+
+
+class FetchFalso:
+    """fetch_fn de prueba: duerme `espera[symbol]` s y anota la concurrencia máxima por fuente."""
+
+    def __init__(self, espera=None, fallan=()):
+        self.espera = espera or {}
+        self.fallan = set(fallan)
+        self.activas = defaultdict(int)
+        self.pico = defaultdict(int)
+        self.llamadas = []
+        self._lock = threading.Lock()
+
+    def __call__(self, symbol, interval, limit):
+        fuente = fuente_de(symbol)
+        with self._lock:
+            self.activas[fuente] += 1
+            self.pico[fuente] = max(self.pico[fuente], self.activas[fuente])
+            self.llamadas.append((symbol, interval))
+        try:
+            time.sleep(self.espera.get(symbol, 0.05))
+            if symbol in self.fallan:
+                raise ConnectionError("sin red")
+            return f"velas {symbol} {interval}"
+        finally:
+            with self._lock:
+                self.activas[fuente] -= 1
+
+
+@pytest.fixture
+def fetcher():
+    creados = []
+
+    def crear(fetch_fn, **kwargs):
+        f = FetcherConcurrente(fetch_fn, **kwargs)
+        creados.append(f)
+        return f
+
+    yield crear
+    for f in creados:
+        f.close()
+
+
+def test_semaforo_por_fuente(fetcher):
+    stub = FetchFalso()
+    f = fetcher(stub)
+    jobs = [(f"SYM{i}USDT", "3m") for i in range(20)] + [(f"frxPAR{i}", "3m") for i in range(10)]
+
+    resultados = list(f.fetch(jobs))
+    assert len(resultados) == len(jobs)
+    assert dict(stub.pico) == LIMITES_POR_FUENTE == {"binance": 8, "deriv": 4}
+
+
+def test_entrega_en_orden_de_llegada(fetcher):
+    stub = FetchFalso(espera={"BTCUSDT": 0.4, "ETHUSDT": 0.2, "SOLUSDT": 0.01})
+    f = fetcher(stub)
+
+    t0 = time.perf_counter()
+    llegadas = []
+    for sym, tf, df in f.fetch([("BTCUSDT", "3m"), ("ETHUSDT", "3m"), ("SOLUSDT", "3m")]):
+        llegadas.append((sym, time.perf_counter() - t0))
+    assert [sym for sym, _ in llegadas] == ["SOLUSDT", "ETHUSDT", "BTCUSDT"]
+    # El primero no espera al más lento, y el total es el del más lento
+    assert llegadas[0][1] < 0.2 and llegadas[-1][1] < 0.6
+
+
+def test_un_error_no_cancela_el_resto(fetcher):
+    stub = FetchFalso(fallan={"ETHUSDT"})
+    f = fetcher(stub)
+    jobs = [("BTCUSDT", "3m"), ("ETHUSDT", "3m"), ("frxEURUSD", "5m")]
+
+    resultados = {(sym, tf): df for sym, tf, df in f.fetch(jobs)}
+    assert resultados == {
+        ("BTCUSDT", "3m"): "velas BTCUSDT 3m",
+        ("ETHUSDT", "3m"): None,
+        ("frxEURUSD", "5m"): "velas frxEURUSD 5m",
+    }
+
+
+def test_fetch_fn_por_llamada_comparte_semaforos(fetcher):
+    base, otra = FetchFalso(), FetchFalso()
+    f = fetcher(base, limites={"binance": 2})
+
+    list(f.fetch([(f"SYM{i}USDT", "1m") for i in range(6)], fetch_fn=otra))
+    assert base.llamadas == [] and len(otra.llamadas) == 6
+    assert otra.pico["binance"] == 2
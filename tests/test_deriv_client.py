@@ -0,0 +1,165 @@
+import time
+import threading
+
+import pytest
+
+from conftest import esperar
+from deriv_client import DerivClient
+
+
+def responder_deriv(conexion, msg):
+    """Respuestas mínimas con el formato de la API de Deriv."""
+    req_id = msg.get("req_id")
+    if "authorize" in msg:
+        if msg["authorize"] != "token-ok":
+            return {"error": {"code": "InvalidToken", "message": "token inválido"},
+                    "req_id": req_id}
+        return {"authorize": {"loginid": "VRTC1"}, "req_id": req_id}
+    if "ping" in msg:
+        return {"ping": "pong", "req_id": req_id}
+    if "ticks_history" in msg:
+        return {"candles": [{"epoch": msg["start"]}], "echo": msg["ticks_history"],
+                "req_id": req_id}
+    if "ticks" in msg:
+        return {"tick": {"symbol": msg["ticks"], "epoch": 1, "quote": 1.0},
+                "subscription": {"id": f"sub-{msg['ticks']}"}, "req_id": req_id}
+    if "forget" in msg:
+        return {"forget": 1, "req_id": req_id}
+    return None
+
+
+@pytest.fixture
+def cliente():
+    creados = []
+
+    def crear(url, **kwargs):
+        kwargs.setdefault("timeout", 2)
+        c = DerivClient(url=url, **kwargs)
+        creados.append(c)
+        return c
+
+    yield crear
+    for c in creados:
+        c.close()
+
+
+def test_multiplexa_peticiones_concurrentes(servidor_ws, cliente):
+    # El servidor contesta en desorden: la primera petición, la última
+    def en_desorden(conexion, msg):
+        if "ticks_history" not in msg:
+            return responder_deriv(conexion, msg)
+        resp = responder_deriv(conexion, msg)
+        threading.Timer(0.3 - msg["start"] / 50, srv.enviar, (conexion, resp)).start()
+        return None
+
+    srv = servidor_ws(en_desorden)
+    c = cliente(srv.url, token="token-ok")
+    resultados = {}
+
+    def pedir(i):
+        resultados[i] = c.request({"ticks_history": f"frx{i}", "start": i})
+
+    hilos = [threading.Thread(target=pedir, args=(i,)) for i in range(10)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert len(srv.conexiones) == 1
+    assert {i: r["echo"] for i, r in resultados.items()} == {i: f"frx{i}" for i in range(10)}
+
+
+def test_desconexion_falla_las_peticiones_pendientes(servidor_ws, cliente):
+    def cortar(conexion, msg):
+        if "ticks_history" in msg:
+            conexion.close()
+            return None
+        return responder_deriv(conexion, msg)
+
+    srv = servidor_ws(cortar)
+    c = cliente(srv.url, timeout=5)
+    t0 = time.monotonic()
+    with pytest.raises(ConnectionError):
+        c.request({"ticks_history": "frxEURUSD", "start": 0})
+    # Falla al caer la conexión, no al agotar el timeout
+    assert time.monotonic() - t0 < 2
+
+
+def test_reconecta_con_backoff(servidor_ws, cliente):
+    srv = servidor_ws(responder_deriv, rechazar=1)
+    c = cliente(srv.url, backoff_inicial=0.3)
+
+    with pytest.raises(Exception):
+        c.request({"ping": 1})
+    # Durante el backoff falla al instante, sin intentar conectar
+    with pytest.raises(ConnectionError, match="reconexión"):
+        c.request({"ping": 1})
+    assert srv.conexiones == []
+
+    time.sleep(0.35)
+    assert c.request({"ping": 1})["ping"] == "pong"
+    assert c.conexiones == 1 and len(srv.conexiones) == 1
+
+
+def test_autorizacion_rechazada_no_publica_la_conexion(servidor_ws, cliente):
+    srv = servidor_ws(responder_deriv)
+    c = cliente(srv.url, token="token-malo", backoff_inicial=5)
+
+    with pytest.raises(ConnectionError, match="autorización"):
+        c.request({"ping": 1})
+    assert c._ws is None
+    # Se aplica el backoff: el siguiente intento no abre otra conexión
+    with pytest.raises(ConnectionError, match="reconexión"):
+        c.request({"ping": 1})
+    assert len(srv.conexiones) == 1
+
+
+def test_suscripciones_se_renuevan_al_reconectar(servidor_ws, cliente):
+    srv = servidor_ws(responder_deriv)
+    c = cliente(srv.url, token="token-ok", ping_interval=0.1)
+    ticks = []
+
+    resp = c.suscribir({"ticks": "frxEURUSD"}, ticks.append)
+    assert resp["tick"]["symbol"] == "frxEURUSD"
+    assert ticks and ticks[0]["tick"]["symbol"] == "frxEURUSD"
+
+    srv.cortar()
+    # El heartbeat reconecta solo porque hay suscripciones
+    assert esperar(lambda: c.conexiones == 2)
+    assert esperar(lambda: len(ticks) >= 2)
+    suscripciones = [m for m in srv.recibidos if m.get("ticks") == "frxEURUSD"]
+    assert len(suscripciones) == 2
+    assert suscripciones[0]["req_id"] != suscripciones[1]["req_id"]
+
+    # El tick renovado llega al mismo callback
+    srv.enviar(srv.conexiones[-1], {"tick": {"symbol": "frxEURUSD", "epoch": 2, "quote": 1.1},
+                                    "req_id": suscripciones[1]["req_id"]})
+    assert esperar(lambda: ticks[-1]["tick"]["epoch"] == 2)
+
+
+def test_cancelar_envia_forget(servidor_ws, cliente):
+    srv = servidor_ws(responder_deriv)
+    c = cliente(srv.url)
+    callback = lambda msg: None  # noqa: E731
+
+    c.suscribir({"ticks": "frxEURUSD"}, callback)
+    c.cancelar({"ticks": "frxEURUSD"}, callback)
+
+    assert esperar(lambda: any(m.get("forget") == "sub-frxEURUSD" for m in srv.recibidos))
+    assert c._suscripciones == {}
+
+
+def test_caida_durante_authorize_no_espera_al_timeout(servidor_ws, cliente):
+    def cortar_authorize(conexion, msg):
+        if "authorize" in msg:
+            conexion.close()
+            return None
+        return responder_deriv(conexion, msg)
+
+    srv = servidor_ws(cortar_authorize)
+    c = cliente(srv.url, token="token-ok", timeout=5)
+    t0 = time.monotonic()
+    with pytest.raises(ConnectionError):
+        c.request({"ping": 1})
+    assert time.monotonic() - t0 < 2
+    assert c._ws is None
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicator_engine import COLUMNAS, MotorIndicadores
+from simulator import Simulador
+
+AHORA = 1_763_137_200
+VENTANA = 200
+hist = Simulador(seed=11, reloj=lambda: AHORA).klines("BTCUSDT", "3m", 600)
+
+
+def comparar(out, ref):
+    """Cada columna del motor frente a las últimas filas de add_indicators."""
+    ref = ref.tail(len(out)).reset_index(drop=True)
+    assert list(out["timestamp"]) == list(ref["timestamp"])
+    for col in COLUMNAS[1:]:
+        np.testing.assert_allclose(out[col].to_numpy(float), ref[col].to_numpy(float),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=col)
+
+
+@pytest.fixture
+def motor():
+    return MotorIndicadores(historia=10)
+
+
+def test_ventanas_deslizantes(boot, motor):
+    for fin in range(VENTANA, len(hist) + 1, 37):
+        out = motor.actualizar(hist.iloc[fin - VENTANA:fin])
+        assert len(out) == 11
+        # Estado desde la primera ventana: equivale a ta sobre toda la historia
+        comparar(out, boot.add_indicators(hist.iloc[:fin]))
+
+
+def test_vela_en_formacion_no_toca_el_estado(boot, motor):
+    ini, fin = 100, 300
+    motor.actualizar(hist.iloc[ini:fin])
+
+    # La última vela aún se está formando: otro cierre y otro máximo
+    formando = hist.iloc[ini + 1:fin + 1].copy()
+    formando.loc[fin, "close"] *= 1.01
+    formando.loc[fin, "high"] = formando.loc[fin, ["high", "close"]].max()
+    for _ in range(2):
+        out = motor.actualizar(formando)
+        comparar(out, boot.add_indicators(pd.concat([hist.iloc[ini:fin], formando.tail(1)])))
+
+    # Al cerrar, la vela definitiva reemplaza a la previsualizada
+    out = motor.actualizar(hist.iloc[ini + 2:fin + 2])
+    comparar(out, boot.add_indicators(hist.iloc[ini:fin + 2]))
+
+
+def test_ventana_sin_solape_reinicia(boot, motor):
+    motor.actualizar(hist.iloc[:VENTANA])
+
+    lejos = hist.iloc[400:400 + VENTANA]
+    out = motor.actualizar(lejos)
+    comparar(out, boot.add_indicators(lejos))
+    assert motor.ultimo_ts == lejos["timestamp"].iloc[-2]
@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+import pytest
+
+import patterns
+from simulator import Simulador
+
+AHORA = 1_763_137_200
+hist = Simulador(seed=5, reloj=lambda: AHORA).klines("BTCUSDT", "1m", 1000)
+o, h, l, c = (hist[col].to_numpy(float) for col in ("open", "high", "low", "close"))
+
+
+def velas(*filas):
+    """Arrays o, h, l, c a partir de tuplas (open, high, low, close)."""
+    return [np.array(col, dtype=float) for col in zip(*filas)]
+
+
+def test_serie_completa_igual_que_la_ventana_en_vivo():
+    completa = patterns.patrones(o, h, l, c)
+    vistos = set()
+    for i in range(patterns.VELAS_PATRON - 1, len(c)):
+        ini = i - patterns.VELAS_PATRON + 1
+        ventana = patterns.patrones(o[ini:i + 1], h[ini:i + 1], l[ini:i + 1], c[ini:i + 1])
+        assert patterns.activos(ventana) == patterns.activos(completa, i), i
+        vistos.update(patterns.activos(completa, i))
+    assert len(vistos) >= 6  # la serie ejercita buena parte de los patrones
+
+
+def test_divergencias_pivote_no_miran_al_futuro():
+    osc = np.cumsum(np.sin(np.arange(len(c)) / 7.0)) + c / c[0]
+    completa = patterns.divergencias_pivote(l, h, osc, "RSI")
+    assert any(m.any() for m in completa.values())
+    for fin in range(50, len(c), 13):
+        prefijo = patterns.divergencias_pivote(l[:fin], h[:fin], osc[:fin], "RSI")
+        for nombre, m in prefijo.items():
+            np.testing.assert_array_equal(m, completa[nombre][:fin], err_msg=f"{nombre} {fin}")
+
+
+@pytest.mark.parametrize("nombre, filas", [
+    ("Doji", [(10, 11, 9, 10.05)]),
+    ("Bullish Engulfing", [(10, 10.2, 9, 9.2), (9.1, 10.5, 9, 10.4)]),
+    ("Bearish Engulfing", [(9.2, 10.2, 9, 10), (10.1, 10.2, 8.9, 9)]),
+    ("Morning Star", [(12, 12.1, 9.9, 10), (9.9, 10.1, 9.7, 9.8), (9.8, 11.6, 9.8, 11.5)]),
+    ("Evening Star", [(10, 12.1, 9.9, 12), (12.1, 12.3, 12, 12.2), (12.2, 12.2, 10.4, 10.5)]),
+    ("Three White Soldiers", [(10, 11.1, 9.9, 11), (11, 12.1, 10.9, 12), (12, 13.1, 11.9, 13)]),
+    ("Three Black Crows", [(13, 13.1, 11.9, 12), (12, 12.1, 10.9, 11), (11, 11.1, 9.9, 10)]),
+])
+def test_patrones_de_libro(nombre, filas):
+    activos = patterns.activos(patterns.patrones(*velas(*filas)))
+    assert nombre in activos
+    opuesto = {"CALL": "PUT", "PUT": "CALL"}.get(patterns.PATRONES[nombre])
+    assert all(patterns.direccion(p) != opuesto for p in activos if p != "Doji"), activos
+
+
+def test_pivote_confirmado_k_velas_despues():
+    # Dos mínimos: el segundo más bajo en precio y más alto en el oscilador
+    bajos = np.array([5, 4, 3, 2, 3, 4, 5, 4, 3, 1, 3, 4, 5, 6], dtype=float)
+    osc = np.array([5, 4, 3, 1, 3, 4, 5, 4, 3, 2, 3, 4, 5, 6], dtype=float)
+    m = patterns.divergencias_pivote(bajos, bajos + 1, osc, "RSI")
+    mask = m["Divergencia RSI Alcista (pivote)"]
+    assert np.flatnonzero(mask).tolist() == [9 + patterns.PIVOTE_K]
+    assert not m["Divergencia RSI Bajista (pivote)"].any()
+
+
+def test_una_pasada_sobre_mucha_historia():
+    n = 200_000
+    rng = np.random.default_rng(0)
+    cierre = 100 + np.cumsum(rng.normal(0, 0.1, n))
+    apertura = np.r_[cierre[0], cierre[:-1]]
+    alto = np.maximum(apertura, cierre) + rng.random(n) * 0.1
+    bajo = np.minimum(apertura, cierre) - rng.random(n) * 0.1
+
+    t = time.perf_counter()
+    patterns.patrones(apertura, alto, bajo, cierre)
+    patterns.divergencias_pivote(bajo, alto, cierre, "RSI")
+    # Microsegundos por vela, no un bucle en Python
+    assert (time.perf_counter() - t) / n < 5e-6
@@ -0,0 +1,48 @@
+from resample import Remuestreador
+from simulator import Simulador
+
+AHORA = 1_763_137_200 + 90  # a mitad de una vela de 3m
+sim = Simulador(seed=7, reloj=lambda: AHORA)
+
+
+def base(minutos=0, limit=200):
+    s = Simulador(seed=7, reloj=lambda: AHORA + minutos * 60)
+    return s.klines("BTCUSDT", "1m", limit)
+
+
+def test_sin_semilla_se_omite_el_timeframe():
+    r = Remuestreador(limit=200)
+    df = base()
+    assert r.sin_semilla("BTCUSDT", df, ["1m", "3m", "5m"]) == ["3m", "5m"]
+
+    frames = r.derivar("BTCUSDT", df, ["1m", "3m", "5m"], {"3m": sim.klines("BTCUSDT", "3m", 200)})
+    assert len(frames["1m"]) == 200
+    assert frames["5m"] is None and r.ventana("BTCUSDT", "5m") is None
+    assert len(frames["3m"]) == 200
+
+
+def test_la_semilla_se_fusiona_con_lo_derivado():
+    r = Remuestreador(limit=200)
+    semilla = sim.klines("BTCUSDT", "3m", 200)
+    r.derivar("BTCUSDT", base(), ["3m"], {"3m": semilla})
+
+    # Con solape no hace falta otra semilla y las velas nuevas se añaden
+    siguiente = base(minutos=3)
+    assert r.sin_semilla("BTCUSDT", siguiente, ["3m"]) == []
+    df = r.derivar("BTCUSDT", siguiente, ["3m"])["3m"]
+    assert len(df) == 200
+    assert df["timestamp"].iloc[-1] > semilla["timestamp"].iloc[-1]
+    # Lo anterior a la ventana de 1m sale de la semilla
+    assert df["timestamp"].iloc[0] > semilla["timestamp"].iloc[0]
+    assert (df["close"].iloc[:50].to_numpy() == semilla["close"].iloc[1:51].to_numpy()).all()
+
+
+def test_sin_solape_descarta_lo_guardado():
+    r = Remuestreador(limit=200)
+    r.derivar("BTCUSDT", base(), ["3m"], {"3m": sim.klines("BTCUSDT", "3m", 200)})
+
+    # Más de 200 minutos sin fusionar: la ventana guardada ya no enlaza
+    tarde = base(minutos=400)
+    assert r.sin_semilla("BTCUSDT", tarde, ["3m"]) == ["3m"]
+    assert r.derivar("BTCUSDT", tarde, ["3m"], {"3m": None})["3m"] is None
+    assert r.ventana("BTCUSDT", "3m") is None
@@ -0,0 +1,117 @@
+import json
+import calendar
+import time
+
+import pandas as pd
+
+import signal_log
+from resolver import SignalResolver, vencimiento
+from signal_cache import ResultCache
+from signal_log import SignalLogWriter
+
+T0 = calendar.timegm(time.strptime("2025-11-14 16:30:00", signal_log.TS_FMT))
+
+
+def fila(minuto, symbol="BTCUSDT", duracion=1):
+    ts = time.strftime(signal_log.TS_FMT, time.gmtime(T0 + minuto * 60))
+    return {
+        "timestamp": ts, "symbol": symbol, "timeframe": "1m", "direction": "CALL",
+        "confidence_label": "MEDIA", "confidence_pct": 0.7, "confidence_display": "MEDIA (70%)",
+        "score": 4, "patterns": "", "divergences": "", "trend": "ALCISTA", "price": 100.0,
+        "duration_candles": duracion, "duration_minutes": duracion, "mtf_ok": True,
+    }
+
+
+def velas_1m(symbol, interval, limit, start=None):
+    epochs = [start + 60 * i for i in range(limit)]
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime(epochs, unit="s"),
+        "close": [101.0] * len(epochs),
+    })
+
+
+def escribir(path, filas):
+    w = SignalLogWriter(str(path))
+    for f in filas:
+        w.append(f)
+    w.flush()
+    w.close()
+
+
+def test_guarda_el_offset_resuelto_y_no_relee_el_historial(tmp_path):
+    log = tmp_path / "senales.bin"
+    resultados = tmp_path / "resultados.csv"
+    # La señal del minuto 0 vence enseguida; la del minuto 1, 30 velas después
+    escribir(log, [fila(0), fila(1, duracion=30), fila(2)])
+
+    descargas = []
+
+    def fetch(*args, **kwargs):
+        descargas.append(args)
+        return velas_1m(*args, **kwargs)
+
+    r = SignalResolver(str(log), str(resultados), fetch_fn=fetch)
+    assert len(r.resolver(ahora=T0 + 10 * 60)) == 2
+
+    estado = json.loads((tmp_path / "resultados.csv.estado").read_text())
+    pendiente = int(next(iter(r._pendientes)).split("-")[1], 16)
+    # Todo lo anterior a la pendiente está resuelto; se guardan solo los ids posteriores
+    assert estado["offset"] == pendiente
+    assert len(estado["resueltas"]) == 1
+
+    # Al reiniciar se sigue desde el offset guardado sin repetir resultados
+    r2 = SignalResolver(str(log), str(resultados), fetch_fn=fetch)
+    assert r2.resolver(ahora=T0 + 10 * 60) == []
+    assert list(r2._pendientes) == list(r._pendientes)
+    assert len(r2.resolver(ahora=T0 + 40 * 60)) == 1
+    assert len(resultados.read_text().splitlines()) == 1 + 3
+
+
+def test_cache_de_resultados_acotado(tmp_path):
+    path = tmp_path / "resultados.csv"
+    lineas = ["id,result"] + [f"s-{i:x},WIN" for i in range(50)]
+    path.write_text("\n".join(lineas) + "\n")
+
+    cache = ResultCache(str(path), maxlen=10, block_size=64)
+    cache.refresh()
+    assert cache.get("s-31")["result"] == "WIN"
+    assert cache.get("s-27") is None
+    assert len(cache._por_id) == 10
+
+    with open(path, "a") as f:
+        f.write("s-32,LOSS\n")
+    cache.refresh()
+    assert cache.get("s-32")["result"] == "LOSS"
+    assert cache.get("s-28") is None and cache.get("s-29") is not None
+
+
+def test_senal_emitida_antes_del_cierre_entra_en_ese_cierre():
+    # Cierre de la vela de 3m en T0 + 180: strategy.py emite 5 s antes, boot.py justo después
+    cierre = T0 + 180
+    for emitida in (cierre - 5, cierre, cierre + 2):
+        row = dict(fila(0), timeframe="3m", duration_candles=2,
+                   timestamp=time.strftime(signal_log.TS_FMT, time.gmtime(emitida)))
+        assert vencimiento(row) == cierre + 2 * 180
+
+
+def test_las_importadas_del_csv_no_se_resuelven(tmp_path):
+    csv_path = tmp_path / "senales.csv"
+    csv_path.write_text(
+        ",".join(signal_log.COLUMNAS) + "\n"
+        + "2025-11-01 10:00:00,BTCUSDT,1m,CALL,MEDIA,0.7,MEDIA (70%),4,,,LATERAL,100.0,1,1,True\n"
+        + "2025-11-01 10:05:00,ETHUSDT,1m,PUT,ALTA,0.8,ALTA (80%),5,,,BAJISTA,100.0,1,1,True\n",
+        encoding="utf-8",
+    )
+    log = tmp_path / "senales.bin"
+    resultados = tmp_path / "resultados.csv"
+    w = SignalLogWriter(str(log), csv_path=str(csv_path))
+    desde = w.fin_importacion
+    w.close()
+
+    SignalResolver(str(log), str(resultados), fetch_fn=velas_1m, desde=desde)
+    escribir(log, [fila(0)])
+    # Reinicio antes del primer ciclo: el punto de partida ya está guardado
+    r = SignalResolver(str(log), str(resultados), fetch_fn=velas_1m)
+    resueltas = r.resolver(ahora=T0 + 10 * 60)
+    assert [(f["symbol"], f["result"]) for f in resueltas] == [("BTCUSDT", "WIN")]
+    assert r._pendientes == {}
@@ -0,0 +1,57 @@
+import pytest
+
+from scheduler import CandleScheduler
+
+T = 1_763_137_800  # múltiplo de 900: cierran a la vez las velas de 3m y 5m
+
+
+class Reloj:
+    """Reloj falso: `dormir` avanza el tiempo lo pedido más un retraso fijo."""
+
+    def __init__(self, t, retraso=0.0):
+        self.t = t
+        self.retraso = retraso
+        self.siestas = []
+
+    def __call__(self):
+        return self.t
+
+    def dormir(self, segundos):
+        self.siestas.append(segundos)
+        self.t += segundos + self.retraso
+
+
+def programador(reloj, offset=0.0):
+    return CandleScheduler(["3m", "5m"], offset=offset, reloj=reloj, dormir=reloj.dormir)
+
+
+@pytest.mark.parametrize("ahora, esperado", [
+    (T + 100, (T + 180, ["3m"], T + 180)),
+    (T + 180, (T + 300, ["5m"], T + 300)),  # justo en un cierre: el siguiente
+    (T + 899.5, (T + 900, ["3m", "5m"], T + 900)),
+])
+def test_proximo_alineado_al_epoch(ahora, esperado):
+    assert programador(Reloj(ahora)).proximo() == esperado
+
+
+def test_offset_negativo_despierta_antes_sin_repetir_cierre():
+    reloj = Reloj(T + 170)
+    s = programador(reloj, offset=-5)
+    assert s.proximo() == (T + 175, ["3m"], T + 180)
+
+    tfs, cierre, _ = s.esperar()
+    assert (tfs, cierre, reloj.t) == (["3m"], T + 180, T + 175)
+    # Ya dentro de la ventana del cierre: el siguiente es el de 5m
+    assert s.proximo() == (T + 295, ["5m"], T + 300)
+
+
+def test_esperar_registra_el_desfase():
+    reloj = Reloj(T + 10, retraso=0.25)
+    s = programador(reloj)
+
+    cierres = []
+    s.run(lambda tfs, cierre: cierres.append((tfs, cierre)), iteraciones=4)
+    assert cierres == [(["3m"], T + 180), (["5m"], T + 300),
+                       (["3m"], T + 360), (["3m"], T + 540)]
+    assert reloj.siestas[0] == 170
+    assert list(s.desfases) == pytest.approx([0.25] * 4)
@@ -0,0 +1,34 @@
+import pytest
+
+import script
+from simulator import Simulador
+
+
+class ClienteCaido:
+    def get_klines(self, **kwargs):
+        raise ConnectionError("sin red")
+
+
+@pytest.fixture
+def sin_binance(monkeypatch):
+    monkeypatch.setattr(script, "OFFLINE", False)
+    monkeypatch.setattr(script, "client", ClienteCaido())
+
+
+def test_sin_velas_reales_no_hay_senales(sin_binance, monkeypatch):
+    monkeypatch.setattr(script, "DEMO", False)
+    monkeypatch.setattr(script, "ACTIVOS", ["BTCUSDT"])
+    construidas = []
+    monkeypatch.setattr(script, "construir_senal", lambda *a: construidas.append(a))
+
+    assert script.safe_get_klines("EURUSD", "3m", 50).empty
+    script.update_signals(["3m", "5m"])
+    assert construidas == []
+
+
+def test_demo_usa_el_simulador(sin_binance, monkeypatch):
+    monkeypatch.setattr(script, "DEMO", True)
+    monkeypatch.setattr(script, "simulador", Simulador(seed=3, reloj=lambda: 1_763_137_800))
+    df = script.safe_get_klines("BTCUSDT", "3m", 50)
+    assert len(df) == 50
+    assert df.equals(script.simulador.klines("BTCUSDT", "3m", 50))
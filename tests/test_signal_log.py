@@ -0,0 +1,142 @@
+import os
+import time
+
+import signal_log
+from signal_log import SignalLogWriter, leer_registros
+
+FILA = {
+    "timestamp": "2025-11-14 16:28:45", "symbol": "BTCUSDT", "timeframe": "3m",
+    "direction": "CALL", "confidence_label": "MEDIA", "confidence_pct": 0.7,
+    "confidence_display": "MEDIA (70%)", "score": 4, "patterns": "", "divergences": "",
+    "trend": "LATERAL", "price": 97122.26, "duration_candles": 2, "duration_minutes": 6,
+    "mtf_ok": True,
+}
+
+
+def leer(path):
+    with open(path, "rb") as f:
+        assert f.read(len(signal_log.MAGIC)) == signal_log.MAGIC
+        data = f.read()
+    return leer_registros(data, len(signal_log.MAGIC)), data
+
+
+def test_log_nuevo_importa_el_csv_una_vez(tmp_path):
+    csv_path = tmp_path / "senales.csv"
+    csv_path.write_text(
+        ",".join(signal_log.COLUMNAS) + "\n"
+        + "2025-11-14 16:28:45,BTCUSDT,3m,CALL,MEDIA,0.7,MEDIA (70%),4,,,LATERAL,97122.26,2,6,True\n"
+        + "fila,rota\n"
+        + "2025-11-14 16:28:45,ETHUSDT,5m,PUT,ALTA,0.8,ALTA (80%),5,,,BAJISTA,3100.5,4,20,True\n",
+        encoding="utf-8",
+    )
+    path = tmp_path / "senales.bin"
+
+    w = SignalLogWriter(str(path), csv_path=str(csv_path))
+    w.append(dict(FILA, symbol="SOLUSDT"))
+    w.flush()
+    w.close()
+    # Al reabrir un log existente no se vuelve a importar
+    SignalLogWriter(str(path), csv_path=str(csv_path)).close()
+
+    (filas, _), _ = leer(path)
+    assert [row["symbol"] for _, row in filas] == ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+    assert filas[1][1]["score"] == 5 and filas[1][1]["mtf_ok"] is True
+
+
+def test_registro_corrupto_se_salta_y_se_avisa(tmp_path, capsys):
+    registros = [signal_log.encode_record(dict(FILA, score=i)) for i in range(3)]
+    data = bytearray(b"".join(registros))
+    # Cola del primer registro distinta de su largo
+    fin = len(registros[0])
+    data[fin - signal_log.COLA.size:fin] = b"\xff" * signal_log.COLA.size
+
+    filas, usados = leer_registros(bytes(data), 1000)
+    assert [row["score"] for _, row in filas] == [1, 2]
+    assert usados == len(data)
+    assert "corrupto en offset 1000" in capsys.readouterr().out
+
+    # Sin registros íntegros detrás: se detiene en el corrupto
+    filas, usados = leer_registros(bytes(data[:fin]), 5000)
+    assert filas == [] and usados == 0
+
+
+class EscrituraFallida:
+    """Archivo que, en la primera escritura, deja medio lote en disco y falla."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, data):
+        self.f.write(data[:len(data) // 2])
+        self.f.flush()
+        raise OSError(28, "No space left on device")
+
+    def __getattr__(self, nombre):
+        return getattr(self.f, nombre)
+
+
+def test_escritura_fallida_se_deshace_y_reintenta(tmp_path, monkeypatch):
+    monkeypatch.setattr(signal_log, "REINTENTO_INICIAL", 0.01)
+    path = tmp_path / "senales.bin"
+    w = SignalLogWriter(str(path), max_delay=0)
+    w.append(dict(FILA, score=0))
+    assert w.flush(timeout=2)
+
+    w._f = EscrituraFallida(w._f)
+    for i in (1, 2):
+        w.append(dict(FILA, score=i))
+    assert w.flush(timeout=2)
+    w.close()
+
+    (filas, usados), data = leer(path)
+    assert [row["score"] for _, row in filas] == [0, 1, 2]
+    assert usados == len(data)
+
+
+def test_fsync_fallido_no_cuenta_ni_duplica(tmp_path, monkeypatch):
+    monkeypatch.setattr(signal_log, "REINTENTO_INICIAL", 0.01)
+    path = tmp_path / "senales.bin"
+    w = SignalLogWriter(str(path), max_delay=0)
+
+    fsync = os.fsync
+    fallos = []
+
+    def fsync_fallido(fd):
+        if not fallos:
+            fallos.append(fd)
+            raise OSError(5, "Input/output error")
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync_fallido)
+    w.append(FILA)
+    assert w.flush(timeout=2)
+    assert fallos and w._escritas == 1
+    w.close()
+
+    (filas, usados), data = leer(path)
+    assert len(filas) == 1 and usados == len(data)
+
+
+def test_disco_caido_al_cerrar_descarta_sin_colgarse(tmp_path, monkeypatch):
+    monkeypatch.setattr(signal_log, "REINTENTO_INICIAL", 0.01)
+    w = SignalLogWriter(str(tmp_path / "senales.bin"), max_delay=0)
+
+    def fsync_fallido(fd):
+        raise OSError(5, "Input/output error")
+
+    monkeypatch.setattr(os, "fsync", fsync_fallido)
+    w.append(FILA)
+    assert not w.flush(timeout=0.2)
+    w.close()
+    assert w._escritas == 0 and w._descartadas == 1
+
+
+def test_resincronizar_salta_basura_larga():
+    basura = bytes(range(256)) * 32768  # 8 MB sin ningún registro
+    registro = signal_log.encode_record(FILA)
+
+    t0 = time.perf_counter()
+    filas, usados = leer_registros(b"\x05\x00\x00\x00" + basura + registro, 0)
+    assert time.perf_counter() - t0 < 1.0
+    assert [pos for pos, _ in filas] == [4 + len(basura)]
+    assert usados == 4 + len(basura) + len(registro)
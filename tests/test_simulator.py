@@ -0,0 +1,66 @@
+import os
+import sys
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import RAIZ
+from simulator import BLOQUE, ORIGEN, Simulador
+
+AHORA = 1_763_137_200 + 90
+DESDE = ORIGEN + 400 * 86400
+
+
+def velas(seed, symbol="BTCUSDT", interval="3m", limit=500):
+    return Simulador(seed, reloj=lambda: AHORA).klines(symbol, interval, limit)
+
+
+@pytest.mark.parametrize("symbol", ["BTCUSDT", "frxEURUSD"])
+def test_misma_semilla_mismas_velas(symbol):
+    pd.testing.assert_frame_equal(velas(3, symbol), velas(3, symbol))
+    assert not np.allclose(velas(3, symbol)["close"], velas(4, symbol)["close"])
+
+
+def test_el_orden_de_las_consultas_no_cambia_la_serie():
+    minutos = 3 * BLOQUE + 17
+    de_una = Simulador(9).klines("ETHUSDT", "1m", minutos, start=DESDE)
+
+    # Otra instancia, por trozos que cruzan bloques y del final al principio
+    sim = Simulador(9)
+    trozos = [sim.klines("ETHUSDT", "1m", 100, start=DESDE + i * 60)
+              for i in reversed(range(0, minutos, 100))]
+    por_trozos = pd.concat(trozos[::-1], ignore_index=True).head(minutos)
+    pd.testing.assert_frame_equal(de_una, por_trozos)
+
+    # Continuidad: sin huecos y cada vela abre en el cierre anterior salvo gaps
+    assert (de_una["timestamp"].diff().iloc[1:] == pd.Timedelta(minutes=1)).all()
+    continuas = np.isclose(de_una["open"].iloc[1:].to_numpy(), de_una["close"].iloc[:-1].to_numpy())
+    assert continuas.mean() > 0.95
+
+
+def test_timeframes_agregados_de_la_misma_serie():
+    sim = Simulador(2)
+    m1 = sim.klines("SOLUSDT", "1m", 30, start=DESDE)
+    m5 = sim.klines("SOLUSDT", "5m", 6, start=DESDE)
+    grupos = m1.groupby(np.arange(30) // 5)
+    np.testing.assert_allclose(m5["open"], grupos["open"].first())
+    np.testing.assert_allclose(m5["high"], grupos["high"].max())
+    np.testing.assert_allclose(m5["low"], grupos["low"].min())
+    np.testing.assert_allclose(m5["close"], grupos["close"].last())
+
+
+def test_binarias_seed_fija_el_mercado_del_productor(tmp_path):
+    codigo = (
+        "import sys; sys.path.insert(0, 'core'); import boot; "
+        f"df = boot.simulador.klines('BTCUSDT', '3m', 50, start={DESDE}); "
+        "print(boot.simulador.seed, repr(float(df['close'].sum())))"
+    )
+    env = dict(os.environ, BINARIAS_SEED="42", BINARIAS_OFFLINE="1", BINARIAS_DATA_DIR=str(tmp_path))
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, env=env,
+                            capture_output=True, text=True, timeout=60, check=True)
+    seed, suma = salida.stdout.split()[-2:]
+
+    esperado = Simulador(42).klines("BTCUSDT", "3m", 50, start=DESDE)["close"].sum()
+    assert int(seed) == 42 and float(suma) == esperado
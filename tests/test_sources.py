@@ -0,0 +1,231 @@
+import pandas as pd
+import pytest
+
+from conftest import esperar
+from deriv_client import DerivClient
+from sources import AgregadorTicks, BinanceKlineStream, DerivTickStream
+
+T0 = 1_763_137_200  # apertura de una vela de 1m (epoch múltiplo de 60)
+T15 = 1_763_137_800  # apertura de una vela de 1m, 3m, 5m y 15m
+
+
+class RespaldoFalso:
+    """Fuente REST de prueba: `n` velas de 1m hasta T0 (incluida) y cuenta las llamadas."""
+
+    def __init__(self, n=5):
+        self.n = n
+        self.llamadas = 0
+
+    def velas(self, symbol, interval, limit):
+        self.llamadas += 1
+        epochs = [T0 - 60 * i for i in reversed(range(self.n))]
+        return pd.DataFrame({
+            "timestamp": pd.to_datetime(epochs, unit="s"),
+            "open": 100.0, "high": 101.0, "low": 99.0, "close": 100.0, "volume": 10.0,
+        }).tail(limit)
+
+    def ventana(self, symbol, interval):
+        return None
+
+
+def kline(apertura, close, cerrada=False, symbol="BTCUSDT", interval="1m"):
+    return {
+        "stream": f"{symbol.lower()}@kline_{interval}",
+        "data": {"e": "kline", "k": {
+            "t": apertura * 1000, "s": symbol, "i": interval, "o": "100", "h": str(max(close, 101)),
+            "l": "99", "c": str(close), "v": "12", "x": cerrada,
+        }},
+    }
+
+
+@pytest.fixture
+def stream():
+    creados = []
+
+    def crear(url, respaldo, **kwargs):
+        kwargs.setdefault("timeout", 2)
+        s = BinanceKlineStream([("BTCUSDT", "1m")], respaldo, url=url, **kwargs)
+        creados.append(s)
+        return s
+
+    yield crear
+    for s in creados:
+        s.close()
+
+
+def conectar(srv, s):
+    """Abre el stream y siembra la ventana con la primera llamada a `velas`."""
+    s.iniciar()
+    assert esperar(lambda: srv.conexiones and s._ws is not None)
+    s.velas("BTCUSDT", "1m", 5)
+    assert ("BTCUSDT", "1m") not in s._sembrar
+
+
+def test_vela_abierta_se_actualiza_sin_rest(servidor_ws, stream):
+    srv = servidor_ws()
+    respaldo = RespaldoFalso()
+    s = stream(srv.url, respaldo)
+    conectar(srv, s)
+    llamadas = respaldo.llamadas
+
+    srv.enviar(srv.conexiones[-1], kline(T0 + 60, 100.5))
+    srv.enviar(srv.conexiones[-1], kline(T0 + 60, 102.0))
+    assert esperar(lambda: s._ventanas[("BTCUSDT", "1m")].get(T0 + 60, (0,) * 5)[4] == 102.0)
+
+    df = s.velas("BTCUSDT", "1m", 3)
+    assert respaldo.llamadas == llamadas
+    assert list(df["timestamp"]) == list(pd.to_datetime([T0 - 60, T0, T0 + 60], unit="s"))
+    assert df["close"].iloc[-1] == 102.0 and df["high"].iloc[-1] == 102.0
+
+
+def test_vela_cerrada_reemplaza_a_la_abierta(servidor_ws, stream):
+    srv = servidor_ws()
+    s = stream(srv.url, RespaldoFalso())
+    conectar(srv, s)
+
+    srv.enviar(srv.conexiones[-1], kline(T0 + 60, 100.5))
+    assert not s.esperar_cierre(["1m"], T0 + 120, timeout=0.1)
+    srv.enviar(srv.conexiones[-1], kline(T0 + 60, 99.5, cerrada=True))
+    assert s.esperar_cierre(["1m"], T0 + 120, timeout=2)
+
+    df = s.velas("BTCUSDT", "1m", 10)
+    assert (df["timestamp"] == pd.Timestamp(T0 + 60, unit="s")).sum() == 1
+    assert df["close"].iloc[-1] == 99.5
+
+    srv.enviar(srv.conexiones[-1], kline(T0 + 120, 99.8))
+    assert esperar(lambda: len(s.velas("BTCUSDT", "1m", 10)) == 7)
+
+
+def test_sin_stream_se_usa_rest(servidor_ws, stream):
+    srv = servidor_ws()
+    respaldo = RespaldoFalso()
+    s = stream(srv.url, respaldo, backoff_inicial=5)
+    conectar(srv, s)
+    srv.enviar(srv.conexiones[-1], kline(T0 + 60, 100.5))
+    assert esperar(lambda: s._vivo(("BTCUSDT", "1m")))
+
+    # Servidor caído: la reconexión falla y queda en backoff
+    srv.cerrar()
+    assert esperar(lambda: s._ws is None)
+    llamadas = respaldo.llamadas
+    df = s.velas("BTCUSDT", "1m", 5)
+    assert respaldo.llamadas == llamadas + 1
+    assert df["timestamp"].iloc[-1] == pd.Timestamp(T0, unit="s")
+    assert not s.esperar_cierre(["1m"], T0 + 120, timeout=0.1)
+
+
+def test_par_fuera_del_stream_va_al_respaldo(servidor_ws, stream):
+    srv = servidor_ws()
+    respaldo = RespaldoFalso()
+    s = stream(srv.url, respaldo)
+
+    s.velas("ETHUSDT", "1m", 5)
+    assert respaldo.llamadas == 1
+    # Un par que no está en el stream no abre la conexión
+    assert s._hilo is None and srv.conexiones == []
+
+
+# ---------------- TICKS ----------------
+def velas(agg, tf, limit=10):
+    df = agg.df(tf, limit)
+    epochs = ((df["timestamp"] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).tolist()
+    return dict(zip(epochs, df[["open", "high", "low", "close"]].itertuples(index=False, name=None)))
+
+
+def test_tick_en_el_limite_abre_la_vela_siguiente():
+    agg = AgregadorTicks(["1m", "3m", "5m"])
+    agg.tick(T15 - 1, 1.0)
+    agg.tick(T15, 2.0)
+
+    for tf, sec in (("1m", 60), ("3m", 180), ("5m", 300)):
+        assert velas(agg, tf) == {T15 - sec: (1.0, 1.0, 1.0, 1.0), T15: (2.0, 2.0, 2.0, 2.0)}
+
+
+def test_ticks_tardios_y_desordenados():
+    agg = AgregadorTicks(["1m"], limit=5)
+    agg.tick(T15 + 10, 1.0)
+    agg.tick(T15 + 30, 3.0)
+    agg.tick(T15 + 20, 5.0)  # tardío: máximo, pero no cierre
+    agg.tick(T15 + 5, 0.5)   # anterior al primero: nueva apertura
+    assert velas(agg, "1m")[T15] == (0.5, 5.0, 0.5, 3.0)
+
+    agg.tick(T15 + 65, 4.0)
+    agg.tick(T15 + 59, 2.5)  # de la vela anterior, posterior a su último tick
+    assert velas(agg, "1m") == {T15: (0.5, 5.0, 0.5, 2.5), T15 + 60: (4.0, 4.0, 4.0, 4.0)}
+    assert agg.tardios == 3
+
+    # Más antiguo que la ventana: se descarta
+    agg.tick(T15 - 60 * 10, 9.0)
+    assert list(velas(agg, "1m")) == [T15, T15 + 60]
+
+
+def test_minutos_sin_ticks_no_inventan_velas():
+    agg = AgregadorTicks(["1m", "3m"])
+    agg.tick(T15 + 1, 1.0)
+    agg.tick(T15 + 181, 2.0)
+
+    assert list(velas(agg, "1m")) == [T15, T15 + 180]
+    assert velas(agg, "3m") == {T15: (1.0, 1.0, 1.0, 1.0), T15 + 180: (2.0, 2.0, 2.0, 2.0)}
+
+
+def responder_ticks(conexion, msg):
+    """Deriv: la suscripción a ticks contesta con el primer tick."""
+    req_id = msg.get("req_id")
+    if "ticks" in msg:
+        return {"tick": {"symbol": msg["ticks"], "epoch": T0 + 1, "quote": 100.0},
+                "subscription": {"id": f"sub-{msg['ticks']}"}, "req_id": req_id}
+    if "ping" in msg:
+        return {"ping": "pong", "req_id": req_id}
+    if "forget" in msg:
+        return {"forget": 1, "req_id": req_id}
+    return None
+
+
+@pytest.fixture
+def ticks(servidor_ws):
+    srv = servidor_ws(responder_ticks)
+    cliente = DerivClient(url=srv.url, timeout=2, ping_interval=0.1, backoff_inicial=0.1)
+    respaldo = RespaldoFalso()
+    s = DerivTickStream(["frxEURUSD"], ["1m"], cliente, respaldo)
+    yield srv, cliente, respaldo, s
+    s.close()
+    cliente.close()
+
+
+def suscripciones(srv):
+    return [m for m in srv.recibidos if m.get("ticks") == "frxEURUSD"]
+
+
+def test_stream_de_ticks_siembra_y_agrega(ticks):
+    srv, cliente, respaldo, s = ticks
+
+    # Primera llamada: suscribe y siembra con el respaldo
+    assert len(s.velas("frxEURUSD", "1m", 5)) == 5
+    assert respaldo.llamadas == 1 and len(suscripciones(srv)) == 1
+
+    req_id = suscripciones(srv)[-1]["req_id"]
+    srv.enviar(srv.conexiones[-1], {"tick": {"symbol": "frxEURUSD", "epoch": T0 + 65,
+                                             "quote": 100.7}, "req_id": req_id})
+    assert esperar(lambda: s._agregadores["frxEURUSD"].ultimo_tick == T0 + 65)
+
+    df = s.velas("frxEURUSD", "1m", 3)
+    assert respaldo.llamadas == 1
+    assert list(df["timestamp"]) == list(pd.to_datetime([T0 - 60, T0, T0 + 60], unit="s"))
+    assert df["close"].iloc[-1] == 100.7
+
+
+def test_stream_de_ticks_resuscribe_y_resiembra_al_reconectar(ticks):
+    srv, cliente, respaldo, s = ticks
+    s.velas("frxEURUSD", "1m", 5)
+    s.velas("frxEURUSD", "1m", 5)
+    assert respaldo.llamadas == 1
+
+    srv.cortar()
+    assert esperar(lambda: cliente.conexiones == 2 and len(suscripciones(srv)) == 2)
+    assert esperar(lambda: s._vivo("frxEURUSD", "1m") is False)
+
+    # Los ticks perdidos sin conexión no llegan: se vuelve a sembrar una vez
+    s.velas("frxEURUSD", "1m", 5)
+    s.velas("frxEURUSD", "1m", 5)
+    assert respaldo.llamadas == 2
+    assert s._vivo("frxEURUSD", "1m")
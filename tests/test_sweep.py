@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+
+import backtest as bt
+import sweep
+
+datos = {"BTCUSDT": bt.historia_sintetica("BTCUSDT", dias=3, seed=4)}
+
+
+def bloques_shm():
+    return {n for n in os.listdir("/dev/shm") if n.startswith("psm_")}
+
+
+def test_barrido_en_paralelo_igual_que_el_backtest(monkeypatch):
+    grid = {k: (v,) for k, v in bt.PESOS.items()}
+    grid.update(ema=(0, 1), divergencia=(1, 2))
+    monkeypatch.setattr(sweep, "GRID", grid)
+    antes = bloques_shm()
+
+    resultados = sweep.sweep(datos, workers=2, chunksize=1)
+    assert bloques_shm() == antes  # la memoria compartida se libera
+
+    assert sorted(v for v, _, _ in resultados) == [
+        (ema, 1, div, 0, 1, 1, 1, 1) for ema in (0, 1) for div in (1, 2)
+    ]
+    for valores, ganadas, perdidas in resultados:
+        senales = bt.backtest(datos, pesos=dict(zip(grid, valores)))
+        for r, cuenta in ((1, ganadas), (-1, perdidas)):
+            esperado = np.bincount(senales["score"][senales["resultado"] == r],
+                                   minlength=len(cuenta))
+            np.testing.assert_array_equal(cuenta, esperado, err_msg=str(valores))
+
+    rep = sweep.ranking(resultados, min_senales=1)
+    assert not rep.empty and (rep["senales_alta"] >= 1).all()
+    assert rep["win_rate_alta"].is_monotonic_decreasing
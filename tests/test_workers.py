@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from workers import AnilloHash
+
+
+def test_anillo_mueve_solo_los_simbolos_del_que_sale():
+    anillo = AnilloHash()
+    for nodo in range(4):
+        anillo.agregar(nodo)
+    simbolos = [f"SYM{i}USDT" for i in range(200)]
+    antes = {s: anillo.nodo(s) for s in simbolos}
+
+    anillo.quitar(2)
+    despues = {s: anillo.nodo(s) for s in simbolos}
+    movidos = [s for s in simbolos if antes[s] != despues[s]]
+    assert movidos and all(antes[s] == 2 for s in movidos)
+    assert set(anillo.repartir(simbolos)) == {0, 1, 3}
+
+
+@pytest.fixture
+def coordinador(boot):
+    from workers import Coordinador
+
+    c = Coordinador(2, ["BTCUSDT", "ETHUSDT", "SOLUSDT"])
+    yield c
+    c.close()
+
+
+@pytest.mark.skipif(os.environ.get("BINARIAS_OFFLINE") != "1", reason="necesita modo OFFLINE")
+def test_resolver_del_coordinador_usa_las_velas_de_los_workers(coordinador):
+    coordinador.ciclo(["3m", "5m"])
+    resolver = coordinador.boot.resolver
+
+    df = resolver.velas_fn("ETHUSDT", "3m")
+    assert df is not None and len(df) > 2
+    # Señal que vence al cerrar la penúltima vela de la ventana
+    apertura = int(df["timestamp"].iloc[-2].timestamp())
+    row = {"timeframe": "3m", "expiry": apertura + 180}
+    precios = resolver._desde_cache("ETHUSDT", [("id", row)])
+    assert precios == {"id": df["close"].iloc[-2]}